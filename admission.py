@@ -0,0 +1,295 @@
+import os
+import math
+import time
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """
+    Requisição recusada pelo controle de admissão
+
+    status: código HTTP da resposta; retry_after: segundos até tentar de novo
+    """
+    status = 503
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimited(AdmissionRejected):
+    """
+    Cliente acima da taxa permitida
+    """
+    status = 429
+
+
+class Overloaded(AdmissionRejected):
+    """
+    Capacidade esgotada: fila de espera cheia ou prazo de espera vencido
+    """
+    status = 503
+
+
+class ConcurrencyLimiter:
+    """
+    Limite de execuções simultâneas com fila de espera limitada e prazo
+
+    Até max_concurrent execuções ao mesmo tempo; as excedentes esperam, no
+    máximo max_waiting de cada vez e por até timeout segundos. Fila cheia ou
+    prazo vencido levantam Overloaded, em vez de a requisição ficar parada
+    até o timeout do gunicorn segurando o contrato em memória.
+    max_concurrent 0 desliga o limite.
+
+    Threads esperam com acquire() e corrotinas com acquire_async(); a vaga
+    liberada vai primeiro para a corrotina mais antiga na fila (FIFO), sem
+    que o event loop precise consultar o limite periodicamente.
+    """
+
+    def __init__(self, name, max_concurrent=0, max_waiting=0, timeout=10.0, metrics=None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.metrics = metrics
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._rejected = 0
+        # (loop, future) de cada corrotina na fila, em ordem de chegada
+        self._async_waiters = deque()
+
+    def _reject(self, reason, message):
+        self._rejected += 1
+        if self.metrics is not None:
+            self.metrics.inc('contract_admission_rejected_total', limit=self.name, reason=reason)
+        logger.warning(f"Admissão recusada ({self.name}): {message}")
+        return Overloaded(message, retry_after=min(self.timeout, 5))
+
+    def acquire(self):
+        """
+        Ocupa uma vaga, esperando na fila até o prazo; levanta Overloaded
+        """
+        if not self.max_concurrent:
+            return
+        with self._cond:
+            # Quem já está na fila tem a vez antes de quem acabou de chegar
+            if self._active < self.max_concurrent and not self._waiting:
+                self._active += 1
+                return
+            if self._waiting >= self.max_waiting:
+                raise self._reject('queue_full', f"{self._active} em andamento e {self._waiting} na fila")
+            self._waiting += 1
+            prazo = time.monotonic() + self.timeout
+            try:
+                while self._active >= self.max_concurrent:
+                    restante = prazo - time.monotonic()
+                    if restante <= 0:
+                        raise self._reject('timeout', f"sem vaga em {self.timeout:g}s")
+                    self._cond.wait(restante)
+            finally:
+                self._waiting -= 1
+            self._active += 1
+
+    async def acquire_async(self):
+        """
+        Como acquire(), mas esperando a vaga sem bloquear o event loop
+
+        A corrotina dorme em um future resolvido por release(); o prazo é o
+        de asyncio.wait_for
+        """
+        # Import local: só o modo ASGI usa asyncio
+        import asyncio
+
+        if not self.max_concurrent:
+            return
+        with self._cond:
+            if self._active < self.max_concurrent and not self._waiting:
+                self._active += 1
+                return
+            if self._waiting >= self.max_waiting:
+                raise self._reject('queue_full', f"{self._active} em andamento e {self._waiting} na fila")
+            self._waiting += 1
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._async_waiters.append(waiter)
+        future = waiter[1]
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except BaseException as e:
+            with self._cond:
+                try:
+                    self._async_waiters.remove(waiter)
+                    self._waiting -= 1
+                    granted = False
+                except ValueError:
+                    granted = True
+            # Vaga entregue junto com o prazo/cancelamento: devolve. Se o
+            # future já foi cancelado, quem devolve é o _grant agendado
+            if granted and future.done() and not future.cancelled():
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                with self._cond:
+                    raise self._reject('timeout', f"sem vaga em {self.timeout:g}s")
+            raise
+
+    def _grant(self, future):
+        # No event loop da corrotina: a vaga já é dela, a menos que tenha desistido
+        if future.done():
+            self.release()
+        else:
+            future.set_result(True)
+
+    def release(self):
+        if not self.max_concurrent:
+            return
+        with self._cond:
+            if self._async_waiters:
+                # A vaga passa direto para a corrotina mais antiga (_active não muda)
+                loop, future = self._async_waiters.popleft()
+                self._waiting -= 1
+            else:
+                self._active -= 1
+                self._cond.notify()
+                return
+        try:
+            loop.call_soon_threadsafe(self._grant, future)
+        except RuntimeError:
+            # Loop já encerrado: ninguém vai usar a vaga, passa adiante
+            self.release()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_waiting': self.max_waiting,
+                'timeout': self.timeout,
+                'active': self._active,
+                'waiting': self._waiting,
+                'rejected': self._rejected
+            }
+
+
+class ClientRateLimiter:
+    """
+    Token bucket por cliente: rate requisições por segundo, com rajadas de até burst
+
+    Os buckets ficam em um LRU limitado a max_clients; um cliente descartado
+    volta com o bucket cheio, o que só o favorece. rate 0 desliga o limite.
+    """
+
+    def __init__(self, rate=0.0, burst=None, max_clients=10000, metrics=None):
+        self.rate = rate
+        self.burst = burst or max(1, math.ceil(rate))
+        self.max_clients = max_clients
+        self.metrics = metrics
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    def check(self, client):
+        """
+        Consome uma ficha do cliente; levanta RateLimited se não houver
+        """
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self._rejected += 1
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        if not allowed:
+            if self.metrics is not None:
+                self.metrics.inc('contract_admission_rejected_total', limit='client', reason='rate')
+            raise RateLimited(
+                f"Limite de {self.rate:g} requisições/s excedido",
+                retry_after=(1 - tokens) / self.rate
+            )
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'clients': len(self._buckets),
+                'rejected': self._rejected
+            }
+
+
+class AdmissionControl:
+    """
+    Limites de admissão do serviço: renderizações simultâneas, contratos em
+    andamento (gerados e ainda não entregues) e taxa por cliente
+
+    Cada contrato em andamento mantém o DOCX e o base64 em memória até a
+    resposta do webhook, então o limite de contratos em andamento é também o
+    limite de memória; o de renderizações protege a CPU.
+    """
+
+    def __init__(self, renders, deliveries, rate_limiter, client_header=''):
+        self.renders = renders
+        self.deliveries = deliveries
+        self.rate_limiter = rate_limiter
+        self.client_header = client_header
+
+    @classmethod
+    def from_env(cls, metrics=None):
+        """
+        Cria os limites a partir de ADMISSION_* e RATE_LIMIT_*
+        """
+        queue_size = int(os.getenv('ADMISSION_QUEUE_SIZE', 32))
+        queue_timeout = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 10))
+        rate = float(os.getenv('RATE_LIMIT_PER_SECOND', 0))
+        return cls(
+            renders=ConcurrencyLimiter(
+                'render', int(os.getenv('ADMISSION_MAX_RENDERS', 0)), queue_size, queue_timeout, metrics
+            ),
+            deliveries=ConcurrencyLimiter(
+                'inflight', int(os.getenv('ADMISSION_MAX_INFLIGHT', 64)), queue_size, queue_timeout, metrics
+            ),
+            rate_limiter=ClientRateLimiter(
+                rate, int(os.getenv('RATE_LIMIT_BURST', 0)) or None, metrics=metrics
+            ),
+            client_header=os.getenv('RATE_LIMIT_CLIENT_HEADER', '')
+        )
+
+    def client_key(self, headers, remote_addr):
+        """
+        Identifica o cliente: cabeçalho configurado (ex.: X-Api-Key) ou IP
+        """
+        if self.client_header:
+            valor = headers.get(self.client_header)
+            if valor:
+                return valor
+        return remote_addr or 'unknown'
+
+    def check_client(self, client):
+        self.rate_limiter.check(client)
+
+    def stats(self):
+        return {
+            'renders': self.renders.stats(),
+            'inflight': self.deliveries.stats(),
+            'rate_limit': self.rate_limiter.stats(),
+            'client_header': self.client_header or None
+        }
@@ -0,0 +1,120 @@
+import os
+
+# Versão exibida em /health e /api-docs
+API_VERSION = '2.0.0'
+
+
+def api_docs(endpoints=None):
+    """
+    Documentação básica da API
+
+    endpoints: rotas servidas (ex.: {'GET /health'}); padrão: todas
+    """
+    docs = {
+        'title': 'API Gerador de Contratos Casa da Ana',
+        'version': API_VERSION,
+        'endpoints': {
+            'POST /generate-contract': {
+                'description': 'Gera e envia contrato via WhatsApp',
+                'required_fields': [
+                    'nome_do_locatario',
+                    'estado_civil',
+                    'nacionalidade',
+                    'profissao',
+                    'numero_do_rg',
+                    'numero_do_cpf',
+                    'telefone_celular',
+                    'email',
+                    'endereco',
+                    'qtd_noites',
+                    'dia_inicio',
+                    'dia_fim',
+                    'valor_locacao'
+                ],
+                'optional_fields': [
+                    'template_id'
+                ],
+                'example': {
+                    'nome_do_locatario': 'João Silva',
+                    'estado_civil': 'Solteiro',
+                    'nacionalidade': 'Brasileira',
+                    'profissao': 'Engenheiro',
+                    'numero_do_rg': '12.345.678-9',
+                    'numero_do_cpf': '123.456.789-00',
+                    'telefone_celular': '(61) 99999-9999',
+                    'email': 'joao@email.com',
+                    'endereco': 'Rua das Flores, 123, Brasília-DF',
+                    'qtd_noites': 7,
+                    'dia_inicio': '15/01/2024',
+                    'dia_fim': '22/01/2024',
+                    'valor_locacao': 'R$ 2.100,00'
+                }
+            },
+            'POST /generate-contracts/batch': {
+                'description': 'Gera e envia uma lista de contratos; resposta NDJSON com um resultado por item e um resumo final'
+            },
+            'POST /render-contract': {
+                'description': 'Gera o contrato e devolve o DOCX binário na resposta (mesmos campos de /generate-contract, sem webhook)'
+            },
+            'GET /contracts/<contract_id>': {
+                'description': 'Baixa de novo um contrato de /render-contract ou do arquivo (ETag/If-None-Match e Range)'
+            },
+            'GET /jobs/<job_id>': {
+                'description': 'Status do envio quando ASYNC_DELIVERY=true (POST /generate-contract retorna 202 com job_id)'
+            },
+            'GET /admin/spool': {
+                'description': 'Lista entregas aguardando reenvio (header X-Admin-Token)'
+            },
+            'POST /admin/spool/drain': {
+                'description': 'Reenvia agora as entregas do spool (header X-Admin-Token, ?include_dead=true)'
+            },
+            'GET /admin/archive': {
+                'description': 'Estatísticas e contratos arquivados (header X-Admin-Token, ?locatario=, ?limit=)'
+            },
+            'POST /admin/archive/<contract_id>/resend': {
+                'description': 'Reenvia um contrato arquivado aos destinos, sem gerar de novo (header X-Admin-Token)'
+            },
+            'POST /admin/archive/compact': {
+                'description': 'Aplica a retenção e remove objetos sem referência do arquivo (header X-Admin-Token)'
+            },
+            'GET /health': {
+                'description': 'Health check do serviço'
+            },
+            'GET /ready': {
+                'description': 'Prontidão: 503 até os templates estarem compilados, depois 200'
+            },
+            'GET /config': {
+                'description': 'Verifica configurações do serviço'
+            },
+            'GET /metrics': {
+                'description': 'Tempos por etapa e contadores no formato do Prometheus'
+            }
+        }
+    }
+    if endpoints is not None:
+        docs['endpoints'] = {
+            endpoint: info for endpoint, info in docs['endpoints'].items() if endpoint in endpoints
+        }
+    return docs
+
+
+def service_config(contract_service, async_delivery, server='wsgi', http_pool=None):
+    """
+    Configurações do serviço (sem expor dados sensíveis)
+
+    http_pool: pool do webhook usado pelo servidor (padrão: o do serviço)
+    """
+    return {
+        'webhook_url_configured': bool(os.getenv('WEBHOOK_URL')),
+        'template_exists': os.path.exists(contract_service.template_path),
+        'templates': contract_service.template_registry.stats(),
+        'service_type': 'webhook',
+        'server': server,
+        'async_delivery': async_delivery,
+        'output': dict(contract_service.output_optimizer.stats(), webhook_gzip=contract_service.webhook_gzip),
+        'webhook_pool': (http_pool or contract_service.http_pool).stats(),
+        'admission': contract_service.admission.stats(),
+        'delivery': contract_service.delivery.stats(),
+        'rendered_store': contract_service.rendered_store.stats(),
+        'archive': contract_service.archive.stats() if contract_service.archive is not None else None
+    }
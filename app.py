@@ -1,14 +1,22 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from contract_service import ContractService
+from delivery_queue import DeliveryQueueFull
+from admission import AdmissionRejected
+from rendered_store import DOCX_MIMETYPE
+from idempotency import IdempotencyConflict, IdempotencyInFlight
+from logging_config import setup_logging
+import api_info
+import io
 import os
+import json
 from dotenv import load_dotenv
 import logging
 
 # Carrega variáveis de ambiente
 load_dotenv()
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+# Configurar logging (nível, formato e fila via LOG_LEVEL, LOG_FORMAT, LOG_QUEUE)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Inicializa Flask
@@ -17,6 +25,27 @@ app = Flask(__name__)
 # Inicializa o serviço de contrato
 contract_service = ContractService()
 
+# Pré-carrega templates (ids separados por vírgula ou '*') para a primeira
+# requisição não pagar a compilação; com preload_app do gunicorn roda uma vez
+# no processo mestre e os workers herdam tudo pronto (GET /ready)
+contract_service.warmup(os.getenv('TEMPLATE_WARMUP', 'default'))
+
+# Limites do endpoint de lote
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+BATCH_RENDER_WORKERS = int(os.getenv('BATCH_RENDER_WORKERS', 4))
+BATCH_DELIVERY_WORKERS = int(os.getenv('BATCH_DELIVERY_WORKERS', 4))
+
+# Token exigido pelos endpoints administrativos (desabilitados se vazio)
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+# Modo assíncrono: responde 202 assim que o contrato é gerado e envia em segundo plano
+ASYNC_DELIVERY = os.getenv('ASYNC_DELIVERY', 'False').lower() == 'true'
+
+@app.before_request
+def ensure_background_workers():
+    # Threads não sobrevivem ao fork dos workers do gunicorn
+    contract_service.start_background_workers()
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
@@ -25,9 +54,20 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'service': 'Gerador de Contratos Casa da Ana',
-        'version': '2.0.0'
+        'version': api_info.API_VERSION
     }), 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Endpoint de prontidão: 200 só depois do aquecimento do serviço
+    """
+    # Aquecimento falhou na inicialização (ex.: template ainda não montado):
+    # nova tentativa em segundo plano, e o probe só lê o estado
+    contract_service.retry_warmup(os.getenv('TEMPLATE_WARMUP', 'default'))
+    ready, estado = contract_service.readiness()
+    return jsonify(estado), 200 if ready else 503
+
 @app.route('/generate-contract', methods=['POST'])
 def generate_contract():
     """
@@ -48,6 +88,10 @@ def generate_contract():
     - dia_fim: string (obrigatório) - formato: DD/MM/AAAA
     - valor_locacao: string (obrigatório) - formato: R$ 1.000,00
     """
+    limited = _rate_limited()
+    if limited:
+        return limited
+    
     try:
         # Verifica se o request tem JSON
         if not request.is_json:
@@ -61,24 +105,61 @@ def generate_contract():
         # Log da requisição recebida (sem dados sensíveis)
         logger.info(f"Nova requisição de contrato recebida para: {dados.get('nome_do_locatario', 'N/A')}")
         
+        idempotency_key = request.headers.get('Idempotency-Key')
+        
+        if ASYNC_DELIVERY:
+            return _generate_contract_async(dados, idempotency_key)
+        
         # Processa o contrato
-        resultado = contract_service.process_contract(dados)
+        resultado = contract_service.process_contract(dados, idempotency_key=idempotency_key)
+        
+        if resultado.get('spooled'):
+            # Contrato já gerado e guardado: o cliente não deve reenviar
+            logger.warning(f"Envio agendado para nova tentativa: {dados.get('nome_do_locatario')}")
+            return _with_replay_header(jsonify({
+                'success': True,
+                'spooled': True,
+                'message': resultado['message'],
+                'filename': resultado['filename'],
+                'locatario': dados.get('nome_do_locatario'),
+                'deliveries': resultado['deliveries']
+            }), resultado), 202
         
         if resultado['success']:
             logger.info(f"Contrato processado com sucesso para: {dados.get('nome_do_locatario')}")
-            return jsonify({
+            return _with_replay_header(jsonify({
                 'success': True,
                 'message': resultado['message'],
                 'filename': resultado['filename'],
-                'locatario': dados.get('nome_do_locatario')
-            }), 200
+                'locatario': dados.get('nome_do_locatario'),
+                'deliveries': resultado['deliveries']
+            }), resultado), 200
         else:
             logger.error(f"Erro ao processar contrato: {resultado['message']}")
             return jsonify({
                 'success': False,
-                'error': resultado['message']
+                'error': resultado['message'],
+                'deliveries': resultado.get('deliveries')
             }), 400
             
+    except IdempotencyConflict as e:
+        logger.error(f"Conflito de idempotência: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 422
+        
+    except IdempotencyInFlight as e:
+        response = jsonify({
+            'success': False,
+            'error': str(e)
+        })
+        response.headers['Retry-After'] = '5'
+        return response, 409
+        
+    except AdmissionRejected as e:
+        return _admission_response(e)
+        
     except ValueError as e:
         # Erro de validação
         logger.error(f"Erro de validação: {str(e)}")
@@ -95,68 +176,368 @@ def generate_contract():
             'error': 'Erro interno do servidor'
         }), 500
 
+def _with_replay_header(response, resultado):
+    """
+    Sinaliza respostas reaproveitadas do cache de idempotência
+    """
+    if resultado.get('replayed'):
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def _rate_limited():
+    """
+    Aplica o limite de taxa por cliente; retorna a resposta 429 ou None
+    """
+    admission = contract_service.admission
+    try:
+        admission.check_client(admission.client_key(request.headers, request.remote_addr))
+    except AdmissionRejected as e:
+        return _admission_response(e)
+    return None
+
+def _admission_response(error):
+    """
+    Resposta rápida (429/503 com Retry-After) quando a admissão é recusada
+    """
+    response = jsonify({
+        'success': False,
+        'error': str(error)
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status
+
+def _generate_contract_async(dados, idempotency_key=None):
+    """
+    Gera o contrato e enfileira o envio, respondendo 202 com o id do job
+    """
+    try:
+        resultado = contract_service.process_contract_async(dados, idempotency_key=idempotency_key)
+    except DeliveryQueueFull as e:
+        logger.warning(f"Fila de entregas cheia: {str(e)}")
+        response = jsonify({
+            'success': False,
+            'error': str(e)
+        })
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    if resultado['success']:
+        logger.info(f"Contrato gerado para: {dados.get('nome_do_locatario')} (job {resultado['job_id']})")
+        return _with_replay_header(jsonify({
+            'success': True,
+            'message': resultado['message'],
+            'job_id': resultado['job_id'],
+            'status_url': f"/jobs/{resultado['job_id']}",
+            'filename': resultado['filename'],
+            'locatario': dados.get('nome_do_locatario')
+        }), resultado), 202
+    else:
+        logger.error(f"Erro ao processar contrato: {resultado['message']}")
+        return jsonify({
+            'success': False,
+            'error': resultado['message']
+        }), 400
+
+@app.route('/generate-contracts/batch', methods=['POST'])
+def generate_contracts_batch():
+    """
+    Gera e envia vários contratos em uma requisição
+
+    Espera uma lista JSON de registros (mesmos campos de /generate-contract)
+    ou um objeto {"contratos": [...]}. Todos são validados antes de qualquer
+    geração; a resposta é NDJSON, uma linha por contrato à medida que cada um
+    termina, seguida de uma linha de resumo.
+    """
+    limited = _rate_limited()
+    if limited:
+        return limited
+    
+    if not request.is_json:
+        return jsonify({
+            'success': False,
+            'error': 'Content-Type deve ser application/json'
+        }), 400
+    
+    registros = request.get_json()
+    if isinstance(registros, dict):
+        registros = registros.get('contratos')
+    if not isinstance(registros, list) or not registros:
+        return jsonify({
+            'success': False,
+            'error': 'Envie uma lista de contratos não vazia'
+        }), 400
+    if len(registros) > BATCH_MAX_ITEMS:
+        return jsonify({
+            'success': False,
+            'error': f'Lote excede o limite de {BATCH_MAX_ITEMS} contratos'
+        }), 413
+    
+    registros, erros = contract_service.normalize_batch(registros)
+    if erros:
+        logger.error(f"Lote rejeitado: {len(erros)} registros inválidos")
+        return jsonify({
+            'success': False,
+            'error': 'Registros inválidos no lote',
+            'errors': erros
+        }), 400
+    
+    logger.info(f"Novo lote de {len(registros)} contratos recebido")
+    
+    def gerar():
+        resumo = {'total': len(registros), 'delivered': 0, 'spooled': 0, 'failed': 0}
+        for item in contract_service.process_batch(
+            registros, render_workers=BATCH_RENDER_WORKERS, delivery_workers=BATCH_DELIVERY_WORKERS
+        ):
+            resumo[item['status']] += 1
+            yield json.dumps(item, ensure_ascii=False) + '\n'
+        logger.info(f"Lote concluído: {resumo}")
+        yield json.dumps({'summary': resumo}, ensure_ascii=False) + '\n'
+    
+    return Response(stream_with_context(gerar()), mimetype='application/x-ndjson'), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Status de uma entrega assíncrona (queued, sending, delivered, failed)
+    """
+    job = contract_service.delivery_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job não encontrado'
+        }), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/render-contract', methods=['POST'])
+def render_contract():
+    """
+    Gera o contrato e devolve o DOCX direto na resposta, sem webhook
+
+    Mesmos campos de /generate-contract. O corpo é o DOCX binário (sem
+    base64); ETag e Content-Location apontam para GET /contracts/<id>, onde o
+    mesmo arquivo pode ser baixado de novo com requisições condicionais e
+    por faixa (Range).
+    """
+    limited = _rate_limited()
+    if limited:
+        return limited
+    
+    if not request.is_json:
+        return jsonify({
+            'success': False,
+            'error': 'Content-Type deve ser application/json'
+        }), 400
+    
+    try:
+        contract_id, filename, contract_bytes = contract_service.render_for_download(request.get_json())
+    except AdmissionRejected as e:
+        return _admission_response(e)
+    except ValueError as e:
+        logger.error(f"Erro de validação: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Erro interno: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Erro interno do servidor'
+        }), 500
+    
+    response = _docx_response(contract_id, filename, contract_bytes)
+    response.headers['Content-Location'] = f"/contracts/{contract_id}"
+    return response
+
+@app.route('/contracts/<contract_id>', methods=['GET'])
+def get_contract(contract_id):
+    """
+    Baixa um contrato gerado por POST /render-contract (If-None-Match, Range)
+
+    Expirado do cache em memória, o contrato ainda é servido do arquivo
+    (CONTRACT_ARCHIVE_DIR), direto do disco.
+    """
+    contrato = contract_service.rendered_store.get(contract_id)
+    if contrato is not None:
+        filename, contract_bytes = contrato
+        return _docx_response(contract_id, filename, contract_bytes)
+    arquivado = contract_service.archive.get(contract_id) if contract_service.archive is not None else None
+    if arquivado is not None:
+        return _docx_response(contract_id, arquivado['filename'], arquivado['path'])
+    return jsonify({
+        'success': False,
+        'error': 'Contrato não encontrado ou expirado'
+    }), 404
+
+def _docx_response(contract_id, filename, contract):
+    """
+    DOCX com ETag (o id do conteúdo), do buffer da renderização ou do arquivo
+
+    contract: bytes do DOCX ou caminho do objeto arquivado (enviado pelo
+    werkzeug sem carregar na memória). Em GET/HEAD o werkzeug responde 304
+    para If-None-Match, 206 para Range e 416 para faixas inválidas.
+    """
+    response = send_file(
+        io.BytesIO(contract) if isinstance(contract, bytes) else contract,
+        mimetype=DOCX_MIMETYPE,
+        as_attachment=True,
+        download_name=filename,
+        etag=contract_id,
+        conditional=True,
+        last_modified=None,
+        max_age=None
+    )
+    # Dados pessoais: só o navegador guarda, e sempre revalida pelo ETag
+    response.cache_control.private = True
+    response.cache_control.public = False
+    return response
+
+def _admin_forbidden():
+    """
+    Retorna a resposta de erro se o token administrativo for inválido
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({
+            'success': False,
+            'error': 'Endpoints administrativos desabilitados (ADMIN_TOKEN não configurado)'
+        }), 403
+    if request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({
+            'success': False,
+            'error': 'Token administrativo inválido'
+        }), 401
+    return None
+
+@app.route('/admin/spool', methods=['GET'])
+def admin_spool():
+    """
+    Lista as entregas guardadas no spool de reenvio
+    """
+    forbidden = _admin_forbidden()
+    if forbidden:
+        return forbidden
+    spool = contract_service.retry_spool
+    if spool is None:
+        return jsonify({
+            'success': False,
+            'error': 'Spool de reenvio desabilitado (RETRY_SPOOL_PATH não configurado)'
+        }), 404
+    return jsonify({
+        'success': True,
+        'stats': spool.stats(),
+        'deliveries': spool.list(status=request.args.get('status'), limit=int(request.args.get('limit', 100)))
+    }), 200
+
+@app.route('/admin/spool/drain', methods=['POST'])
+def admin_spool_drain():
+    """
+    Reenvia agora todas as entregas pendentes do spool
+    """
+    forbidden = _admin_forbidden()
+    if forbidden:
+        return forbidden
+    spool = contract_service.retry_spool
+    if spool is None:
+        return jsonify({
+            'success': False,
+            'error': 'Spool de reenvio desabilitado (RETRY_SPOOL_PATH não configurado)'
+        }), 404
+    include_dead = request.args.get('include_dead', 'false').lower() == 'true'
+    resultado = spool.drain(include_dead=include_dead)
+    logger.info(f"Spool drenado: {resultado}")
+    return jsonify({
+        'success': True,
+        'result': resultado,
+        'stats': spool.stats()
+    }), 200
+
+@app.route('/admin/archive', methods=['GET'])
+def admin_archive():
+    """
+    Estatísticas e contratos arquivados, filtráveis por locatário
+    """
+    forbidden = _admin_forbidden()
+    if forbidden:
+        return forbidden
+    archive = contract_service.archive
+    if archive is None:
+        return _archive_disabled()
+    return jsonify({
+        'success': True,
+        'stats': archive.stats(),
+        'contracts': archive.list(locatario=request.args.get('locatario'), limit=int(request.args.get('limit', 100)))
+    }), 200
+
+@app.route('/admin/archive/<contract_id>/resend', methods=['POST'])
+def admin_archive_resend(contract_id):
+    """
+    Reenvia um contrato arquivado aos destinos, sem gerar de novo
+    """
+    forbidden = _admin_forbidden()
+    if forbidden:
+        return forbidden
+    if contract_service.archive is None:
+        return _archive_disabled()
+    try:
+        resultado = contract_service.resend_archived(contract_id)
+    except AdmissionRejected as e:
+        return _admission_response(e)
+    if resultado is None:
+        return jsonify({
+            'success': False,
+            'error': 'Contrato não encontrado no arquivo'
+        }), 404
+    if resultado['success']:
+        return jsonify(resultado), 200
+    return jsonify(resultado), 202 if resultado.get('spooled') else 502
+
+@app.route('/admin/archive/compact', methods=['POST'])
+def admin_archive_compact():
+    """
+    Aplica agora a retenção e remove os objetos sem referência
+    """
+    forbidden = _admin_forbidden()
+    if forbidden:
+        return forbidden
+    archive = contract_service.archive
+    if archive is None:
+        return _archive_disabled()
+    resultado = archive.compact()
+    return jsonify({
+        'success': True,
+        'result': resultado,
+        'stats': archive.stats()
+    }), 200
+
+def _archive_disabled():
+    return jsonify({
+        'success': False,
+        'error': 'Arquivo de contratos desabilitado (CONTRACT_ARCHIVE_DIR não configurado)'
+    }), 404
+
 @app.route('/config', methods=['GET'])
 def get_config():
     """
     Endpoint para verificar configurações (sem expor dados sensíveis)
     """
-    return jsonify({
-        'webhook_url_configured': bool(os.getenv('WEBHOOK_URL')),
-        'template_exists': os.path.exists('CONTRATO Casa da Ana.docx'),
-        'service_type': 'webhook'
-    }), 200
+    return jsonify(api_info.service_config(contract_service, ASYNC_DELIVERY)), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Métricas no formato do Prometheus, somadas entre os workers (METRICS_DIR)
+    """
+    return Response(
+        contract_service.metrics.render(),
+        mimetype='text/plain; version=0.0.4'
+    )
 
 @app.route('/api-docs', methods=['GET'])
 def api_docs():
     """
     Documentação básica da API
     """
-    docs = {
-        'title': 'API Gerador de Contratos Casa da Ana',
-        'version': '2.0.0',
-        'endpoints': {
-            'POST /generate-contract': {
-                'description': 'Gera e envia contrato via WhatsApp',
-                'required_fields': [
-                    'nome_do_locatario',
-                    'estado_civil',
-                    'nacionalidade',
-                    'profissao',
-                    'numero_do_rg',
-                    'numero_do_cpf',
-                    'telefone_celular',
-                    'email',
-                    'endereco',
-                    'qtd_noites',
-                    'dia_inicio',
-                    'dia_fim',
-                    'valor_locacao'
-                ],
-                'example': {
-                    'nome_do_locatario': 'João Silva',
-                    'estado_civil': 'Solteiro',
-                    'nacionalidade': 'Brasileira',
-                    'profissao': 'Engenheiro',
-                    'numero_do_rg': '12.345.678-9',
-                    'numero_do_cpf': '123.456.789-00',
-                    'telefone_celular': '(61) 99999-9999',
-                    'email': 'joao@email.com',
-                    'endereco': 'Rua das Flores, 123, Brasília-DF',
-                    'qtd_noites': 7,
-                    'dia_inicio': '15/01/2024',
-                    'dia_fim': '22/01/2024',
-                    'valor_locacao': 'R$ 2.100,00'
-                }
-            },
-            'GET /health': {
-                'description': 'Health check do serviço'
-            },
-            'GET /config': {
-                'description': 'Verifica configurações do serviço'
-            }
-        }
-    }
-    return jsonify(docs), 200
+    return jsonify(api_info.api_docs()), 200
 
 @app.errorhandler(404)
 def not_found(error):
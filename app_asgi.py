@@ -0,0 +1,234 @@
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from contract_service import ContractService
+from async_service import AsyncContractService
+from idempotency import IdempotencyConflict, IdempotencyInFlight
+from admission import AdmissionRejected
+from logging_config import setup_logging
+import api_info
+import os
+import json
+from dotenv import load_dotenv
+import logging
+
+# Carrega variáveis de ambiente
+load_dotenv()
+
+# Configurar logging (nível, formato e fila via LOG_LEVEL, LOG_FORMAT, LOG_QUEUE)
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Mesmo serviço do modo WSGI; a renderização vai para threads ou processos
+# (RENDER_EXECUTOR=inline vira thread) e o webhook usa o cliente assíncrono
+contract_service = ContractService()
+async_service = AsyncContractService(contract_service)
+
+# Pré-carrega templates para a primeira requisição não pagar a compilação
+contract_service.warmup(os.getenv('TEMPLATE_WARMUP', 'default'))
+
+# Endpoints servidos neste modo (lote, jobs e admin continuam no app.py)
+ENDPOINTS = {
+    'POST /generate-contract', 'GET /health', 'GET /ready',
+    'GET /config', 'GET /metrics', 'GET /api-docs'
+}
+
+
+def _json(corpo, status_code=200, headers=None):
+    return JSONResponse(corpo, status_code=status_code, headers=headers)
+
+
+def _replay_headers(resultado):
+    """
+    Sinaliza respostas reaproveitadas do cache de idempotência
+    """
+    return {'Idempotent-Replayed': 'true'} if resultado.get('replayed') else None
+
+
+async def health_check(request):
+    """
+    Endpoint de health check
+    """
+    return _json({
+        'status': 'healthy',
+        'service': 'Gerador de Contratos Casa da Ana',
+        'version': api_info.API_VERSION
+    })
+
+
+async def readiness_check(request):
+    """
+    Endpoint de prontidão: 200 só depois do aquecimento do serviço
+    """
+    # Nova tentativa de aquecimento em segundo plano; o probe só lê o estado
+    contract_service.retry_warmup(os.getenv('TEMPLATE_WARMUP', 'default'))
+    ready, estado = contract_service.readiness()
+    return _json(estado, 200 if ready else 503)
+
+
+async def generate_contract(request):
+    """
+    Endpoint principal para geração e envio de contratos (mesmo contrato do app.py)
+    """
+    try:
+        admission = contract_service.admission
+        client = request.client.host if request.client else None
+        admission.check_client(admission.client_key(request.headers, client))
+
+        content_type = request.headers.get('content-type', '').split(';')[0].strip()
+        if content_type != 'application/json' and not content_type.endswith('+json'):
+            return _json({
+                'success': False,
+                'error': 'Content-Type deve ser application/json'
+            }, 400)
+
+        try:
+            dados = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return _json({
+                'success': False,
+                'error': 'JSON inválido'
+            }, 400)
+
+        # Log da requisição recebida (sem dados sensíveis)
+        nome = dados.get('nome_do_locatario') if isinstance(dados, dict) else None
+        logger.info(f"Nova requisição de contrato recebida para: {nome or 'N/A'}")
+
+        resultado = await async_service.process_contract(
+            dados, idempotency_key=request.headers.get('Idempotency-Key')
+        )
+
+        if resultado.get('spooled'):
+            # Contrato já gerado e guardado: o cliente não deve reenviar
+            logger.warning(f"Envio agendado para nova tentativa: {nome}")
+            return _json({
+                'success': True,
+                'spooled': True,
+                'message': resultado['message'],
+                'filename': resultado['filename'],
+                'locatario': nome,
+                'deliveries': resultado['deliveries']
+            }, 202, _replay_headers(resultado))
+
+        if resultado['success']:
+            logger.info(f"Contrato processado com sucesso para: {nome}")
+            return _json({
+                'success': True,
+                'message': resultado['message'],
+                'filename': resultado['filename'],
+                'locatario': nome,
+                'deliveries': resultado['deliveries']
+            }, 200, _replay_headers(resultado))
+
+        logger.error(f"Erro ao processar contrato: {resultado['message']}")
+        return _json({
+            'success': False,
+            'error': resultado['message'],
+            'deliveries': resultado.get('deliveries')
+        }, 400)
+
+    except IdempotencyConflict as e:
+        logger.error(f"Conflito de idempotência: {str(e)}")
+        return _json({
+            'success': False,
+            'error': str(e)
+        }, 422)
+
+    except IdempotencyInFlight as e:
+        return _json({
+            'success': False,
+            'error': str(e)
+        }, 409, {'Retry-After': '5'})
+
+    except AdmissionRejected as e:
+        # Resposta rápida (429/503 com Retry-After) quando a admissão é recusada
+        return _json({
+            'success': False,
+            'error': str(e)
+        }, e.status, {'Retry-After': str(e.retry_after)})
+
+    except ValueError as e:
+        # Erro de validação
+        logger.error(f"Erro de validação: {str(e)}")
+        return _json({
+            'success': False,
+            'error': str(e)
+        }, 400)
+
+    except Exception as e:
+        # Erro interno
+        logger.error(f"Erro interno: {str(e)}")
+        return _json({
+            'success': False,
+            'error': 'Erro interno do servidor'
+        }, 500)
+
+
+async def get_config(request):
+    """
+    Endpoint para verificar configurações (sem expor dados sensíveis)
+    """
+    return _json(api_info.service_config(
+        contract_service, False, server='asgi', http_pool=async_service.http_pool
+    ))
+
+
+async def metrics(request):
+    """
+    Métricas no formato do Prometheus
+    """
+    return Response(
+        contract_service.metrics.render(),
+        media_type='text/plain; version=0.0.4'
+    )
+
+
+async def api_docs(request):
+    """
+    Documentação básica da API (só os endpoints deste modo)
+    """
+    return _json(api_info.api_docs(ENDPOINTS))
+
+
+async def not_found(request, exc):
+    return _json({
+        'success': False,
+        'error': 'Endpoint não encontrado',
+        'message': 'Consulte /api-docs para ver endpoints disponíveis'
+    }, 404)
+
+
+async def internal_error(request, exc):
+    return _json({
+        'success': False,
+        'error': 'Erro interno do servidor'
+    }, 500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    contract_service.start_background_workers()
+    yield
+    await async_service.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health_check, methods=['GET']),
+        Route('/ready', readiness_check, methods=['GET']),
+        Route('/generate-contract', generate_contract, methods=['POST']),
+        Route('/config', get_config, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+        Route('/api-docs', api_docs, methods=['GET'])
+    ],
+    exception_handlers={404: not_found, 500: internal_error},
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('PORT', 5000))
+    logger.info(f"Iniciando servidor ASGI na porta {port}")
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,80 @@
+import os
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def request_error_reason(error):
+    """
+    Como http_pool.request_error_reason, para as exceções do httpx
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}"
+    if isinstance(error, httpx.TimeoutException):
+        return 'timeout'
+    if isinstance(error, httpx.ConnectError):
+        return 'connection refused' if 'refused' in str(error).lower() else 'connection error'
+    return type(error).__name__
+
+
+class AsyncWebhookHttpPool:
+    """
+    Cliente HTTP assíncrono (httpx) com pool de conexões keep-alive
+
+    Equivalente ao WebhookHttpPool para o modo ASGI: todas as entregas em
+    andamento no processo compartilham o cliente, e cada uma só ocupa uma
+    conexão enquanto espera o webhook, sem ocupar uma thread.
+    """
+
+    def __init__(self, max_connections=200, connect_timeout=5.0, read_timeout=30.0):
+        self.max_connections = max_connections
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = None
+        self._requests = 0
+        self._errors = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Cria o pool a partir de ASGI_WEBHOOK_MAX_CONNECTIONS, WEBHOOK_CONNECT_TIMEOUT e WEBHOOK_READ_TIMEOUT
+        """
+        return cls(
+            max_connections=int(os.getenv('ASGI_WEBHOOK_MAX_CONNECTIONS', 200)),
+            connect_timeout=float(os.getenv('WEBHOOK_CONNECT_TIMEOUT', 5)),
+            read_timeout=float(os.getenv('WEBHOOK_READ_TIMEOUT', 30))
+        )
+
+    @property
+    def client(self):
+        # Criado dentro do event loop que vai usá-lo
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self._limits)
+        return self._client
+
+    async def post(self, url, **kwargs):
+        """
+        POST pelo pool; content= aceita bytes ou um iterável assíncrono de pedaços
+        """
+        self._requests += 1
+        try:
+            return await self.client.post(url, **kwargs)
+        except httpx.HTTPError:
+            self._errors += 1
+            raise
+
+    def stats(self):
+        return {
+            'client': 'httpx',
+            'max_connections': self.max_connections,
+            'connect_timeout': self.timeout.connect,
+            'read_timeout': self.timeout.read,
+            'requests': self._requests,
+            'errors': self._errors
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,201 @@
+import os
+import time
+import asyncio
+import httpx
+from async_http_pool import AsyncWebhookHttpPool, request_error_reason
+from admission import AdmissionRejected
+from contract_service import WebhookDeliveryError
+from delivery_sinks import SinkResult
+from render_executor import create_render_executor
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def _iter_async(chunks):
+    # O httpx assíncrono só aceita corpos em fluxo como iteráveis assíncronos
+    for chunk in chunks:
+        yield chunk
+
+
+class AsyncContractService:
+    """
+    Geração e envio de contratos para o modo ASGI, sobre um ContractService
+
+    A renderização (CPU) roda no executor de renderização do serviço, em
+    threads ou processos, nunca no event loop; a entrega usa o cliente httpx
+    assíncrono, então um processo mantém centenas de envios em andamento
+    enquanto espera o webhook. Validação, templates, spool, idempotência e
+    métricas são os do ContractService.
+    """
+
+    def __init__(self, service, http_pool=None):
+        self.service = service
+        self.http_pool = http_pool or AsyncWebhookHttpPool.from_env()
+        if service.render_executor.name == 'inline':
+            # Inline bloquearia o event loop durante cada renderização
+            service.render_executor = create_render_executor(
+                'thread', service, workers=int(os.getenv('RENDER_WORKERS', 0)) or None
+            )
+
+    async def render(self, dados_locatario):
+        """
+        Gera o contrato no executor de renderização; retorna (nome, bytes)
+        """
+        service = self.service
+        contract_filename, contract_bytes = await asyncio.wrap_future(
+            service.render_executor.submit(dados_locatario)
+        )
+        if service.archive is not None:
+            await asyncio.to_thread(service._archive_if_enabled, contract_filename, contract_bytes, dados_locatario)
+        return contract_filename, contract_bytes
+
+    async def send(self, contract_bytes, nome_locatario, filename, encoded=None, timeout=None):
+        """
+        Envia o contrato ao webhook sem bloquear o event loop
+
+        encoded e timeout como em ContractService.send_contract_via_webhook.
+        Retorna True/False; deliver levanta o motivo da falha
+        """
+        try:
+            await self.deliver(contract_bytes, nome_locatario, filename, encoded, timeout)
+            return True
+        except WebhookDeliveryError:
+            return False
+
+    async def deliver(self, contract_bytes, nome_locatario, filename, encoded=None, timeout=None):
+        """
+        Como send, mas levanta WebhookDeliveryError com o status HTTP ou o erro da requisição
+        """
+        service = self.service
+        logger.info(f"Enviando contrato via webhook para: {nome_locatario}")
+        inicio = time.perf_counter()
+        if service.webhook_streaming:
+            # Cada pedaço é codificado quando o httpx o pede
+            request = service._webhook_request(contract_bytes, filename, nome_locatario, encoded)
+        else:
+            # Corpo inteiro (base64 e gzip) montado de uma vez: fora do event loop
+            request = await asyncio.to_thread(
+                service._webhook_request, contract_bytes, filename, nome_locatario, encoded
+            )
+        body = request.body if isinstance(request.body, bytes) else _iter_async(request.body)
+        kwargs = {'timeout': httpx.Timeout(timeout, connect=self.http_pool.timeout.connect)} if timeout else {}
+        try:
+            response = await self.http_pool.post(service.webhook_url, headers=request.headers, content=body, **kwargs)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            # A mensagem completa (com a URL do webhook) fica só no log
+            logger.error(f"Erro na requisição para o webhook: {type(e).__name__}: {e}")
+            raise WebhookDeliveryError(request_error_reason(e))
+        finally:
+            service._record_webhook_request(request, time.perf_counter() - inicio)
+
+        logger.info(f"Resposta do webhook - Status: {response.status_code}")
+        if response.status_code not in [200, 201]:
+            logger.error(f"Falha ao enviar contrato via webhook. Status: {response.status_code}")
+            raise WebhookDeliveryError(f"HTTP {response.status_code}")
+        logger.info("Contrato enviado com sucesso via webhook!")
+
+    async def _send_primary(self, payload):
+        """
+        Entrega ao destino principal com as novas tentativas dele
+        """
+        sink = self.service.delivery.primary
+        if sink.kind != 'webhook':
+            # Evolution API e arquivo usam o cliente síncrono, em uma thread
+            return await asyncio.to_thread(sink.send, payload)
+        inicio = time.perf_counter()
+        encoded = payload.encoded() if payload.shared_encoding else None
+        for tentativa in range(1, sink.retries + 2):
+            try:
+                await self.deliver(payload.contract_bytes, payload.locatario, payload.filename, encoded, sink.timeout)
+                return SinkResult(sink.name, True, tentativa, time.perf_counter() - inicio)
+            except WebhookDeliveryError as e:
+                erro = str(e)
+            logger.warning(f"Falha na entrega para {sink.name} (tentativa {tentativa}): {erro}")
+            if tentativa <= sink.retries:
+                await asyncio.sleep(sink.backoff * 2 ** (tentativa - 1))
+        return SinkResult(sink.name, False, sink.retries + 1, time.perf_counter() - inicio, erro)
+
+    async def deliver_or_spool(self, contract_filename, contract_bytes, nome_locatario):
+        """
+        Entrega o contrato a todos os destinos; se o principal falhar e o
+        spool estiver habilitado, agenda o reenvio
+
+        Retorna (status, resultados por destino), como no ContractService
+        """
+        service = self.service
+        payload = service.delivery.payload(contract_filename, contract_bytes, nome_locatario)
+        # Destinos secundários no pool de threads do fanout, em paralelo
+        pending = service.delivery.dispatch(payload)
+        if service._circuit_open():
+            primary = SinkResult(service.delivery.primary.name, False, error='Circuito aberto')
+            success = None
+        else:
+            primary = await self._send_primary(payload)
+            success = primary.success
+        if success or service.retry_spool is None:
+            status = service._delivery_result(contract_filename, contract_bytes, nome_locatario, success)
+        else:
+            # Gravação no spool (SQLite) fora do event loop
+            status = await asyncio.to_thread(
+                service._delivery_result, contract_filename, contract_bytes, nome_locatario, success, primary.error
+            )
+        secondary = await asyncio.gather(*(self._collect_secondary(delivery) for delivery in pending))
+        return status, service._sink_results(payload, [primary, *secondary])
+
+    async def _collect_secondary(self, delivery):
+        # Como DeliveryFanout.collect: espera até o deadline do destino
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(delivery.future), delivery.remaining())
+        except asyncio.TimeoutError:
+            return delivery.timed_out()
+
+    async def process_contract(self, dados_locatario, idempotency_key=None):
+        """
+        Processo completo: gera e envia o contrato (ver ContractService.process_contract)
+        """
+        service = self.service
+        if service.idempotency_cache is None or not isinstance(dados_locatario, dict):
+            resultado, _ = await self._process_contract(dados_locatario)
+            return resultado
+
+        async def executar(anterior):
+            resultado, rendered = await self._process_contract(dados_locatario, anterior[1] if anterior else None)
+            final = resultado['success'] or resultado.get('spooled', False)
+            return (resultado, rendered), final
+
+        # A chave normaliza os dados e consulta o manifesto (pode compilar o
+        # template): fora do event loop
+        chave, conteudo = await asyncio.to_thread(service._idempotency_key, 'sync', dados_locatario, idempotency_key)
+        (resultado, _), replayed = await service.idempotency_cache.run_async(chave, executar, conteudo)
+        if replayed:
+            logger.info(f"Requisição repetida, resultado reaproveitado: {dados_locatario.get('nome_do_locatario')}")
+            resultado = dict(resultado, replayed=True)
+        return resultado
+
+    async def _process_contract(self, dados_locatario, rendered=None):
+        admission = self.service.admission
+        await admission.deliveries.acquire_async()
+        try:
+            if rendered is None:
+                await admission.renders.acquire_async()
+                try:
+                    rendered = await self.render(dados_locatario)
+                finally:
+                    admission.renders.release()
+            contract_filename, contract_bytes = rendered
+            status, deliveries = await self.deliver_or_spool(
+                contract_filename, contract_bytes, dados_locatario['nome_do_locatario']
+            )
+            return self.service._contract_result(status, contract_filename, deliveries), rendered
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            return self.service._contract_error(e), None
+        finally:
+            admission.deliveries.release()
+
+    async def close(self):
+        await self.http_pool.close()
+        self.service.render_executor.shutdown()
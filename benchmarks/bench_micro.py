@@ -0,0 +1,97 @@
+"""
+Microbenchmarks das etapas do ContractService
+
+Uso: python benchmarks/bench_micro.py [--iterations 50] [--backend docx|stream] [--save-baseline]
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+from common import ROOT_DIR, dados_exemplo, summarize, peak_rss_mb, report, add_baseline_arguments
+from stub_webhook import start_in_thread
+
+from contract_service import ContractService
+from template_registry import TemplateRegistry
+
+
+def measure(func, iterations, warmup=3):
+    """
+    Executa func repetidamente; retorna o resumo das latências
+    """
+    for i in range(warmup):
+        func(i)
+    latencias = []
+    inicio = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        func(i)
+        latencias.append(time.perf_counter() - t0)
+    return summarize(latencias, time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks do gerador de contratos')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--backend', default=os.getenv('RENDER_BACKEND', 'docx'),
+                        help='Backend de renderização (docx ou stream)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latência do webhook stub')
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    # Os logs INFO por substituição distorceriam as medições
+    logging.disable(logging.CRITICAL)
+
+    stub, webhook_url = start_in_thread(latency_ms=args.latency_ms)
+    workdir = tempfile.mkdtemp(prefix='bench-contratos-')
+    os.chdir(workdir)
+    try:
+        service = ContractService(webhook_url=webhook_url, render_backend=args.backend)
+        # O benchmark roda em um diretório temporário: template por caminho absoluto
+        service.template_path = os.path.join(ROOT_DIR, service.template_path)
+        service.template_registry = TemplateRegistry(service.template_path)
+        service.template_cache = service.template_registry.default_cache
+        service.idempotency_cache = None
+
+        dados_template, output_filename, template = service._prepare_contract(dados_exemplo())
+        _, contract_bytes = service.render_contract(dados_exemplo())
+        fill = service._fill_contract_stream if args.backend == 'stream' else service._fill_contract_template
+
+        def generate(i):
+            os.remove(service.generate_contract(dados_exemplo(i)))
+
+        def fill_template(i):
+            fill(dados_template, output_filename, devnull, template)
+
+        def half_value(i):
+            # Entrada válida (R$ 1.000,50 a R$ 999.999,50): o caminho de erro não entra na medição
+            if service._calculate_half_value(f"R$ {1 + i % 999}.{i % 1000:03d},50") == 'R$ 0,00':
+                raise RuntimeError('Valor de entrada rejeitado por parse_brl')
+
+        def send(i):
+            if not service.send_contract_via_webhook(contract_bytes, f"Locatário {i}", output_filename):
+                raise RuntimeError('Webhook stub recusou o envio')
+
+        # Aberto uma vez: a medição é só da renderização
+        with open(os.devnull, 'wb') as devnull:
+            resultados = {
+                f'generate_contract[{args.backend}]': measure(generate, args.iterations),
+                f'_fill_contract_template[{args.backend}]': measure(fill_template, args.iterations),
+                '_calculate_half_value': measure(half_value, args.iterations * 100),
+                'send_contract_via_webhook': measure(send, args.iterations),
+                'process': {'peak_rss_mb': peak_rss_mb()}
+            }
+    finally:
+        stub.shutdown()
+        os.chdir(ROOT_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return report('micro', resultados, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Utilitários compartilhados pelos benchmarks
+"""
+
+import os
+import sys
+import json
+import resource
+import platform
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+DADOS_EXEMPLO = {
+    'nome_do_locatario': 'João Silva',
+    'estado_civil': 'Solteiro',
+    'nacionalidade': 'Brasileira',
+    'profissao': 'Engenheiro',
+    'numero_do_rg': '12.345.678-9',
+    'numero_do_cpf': '123.456.789-00',
+    'telefone_celular': '(61) 99999-9999',
+    'email': 'joao@email.com',
+    'endereco': 'Rua das Flores, 123, Brasília-DF',
+    'qtd_noites': 7,
+    'dia_inicio': '15/01/2024',
+    'dia_fim': '22/01/2024',
+    'valor_locacao': 'R$ 2.100,00'
+}
+
+
+def dados_exemplo(i=0):
+    """
+    Dados válidos com nome único (evita o cache de idempotência)
+    """
+    dados = dict(DADOS_EXEMPLO)
+    dados['nome_do_locatario'] = f"Locatário Benchmark {i}"
+    return dados
+
+
+def percentile(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    baixo = int(k)
+    alto = min(baixo + 1, len(ordenados) - 1)
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (k - baixo)
+
+
+def summarize(latencias, duracao):
+    """
+    Resumo de latências (em segundos) convertido para milissegundos
+    """
+    return {
+        'count': len(latencias),
+        'p50_ms': round(percentile(latencias, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencias, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencias, 99) * 1000, 3),
+        'throughput_per_s': round(len(latencias) / duracao, 2) if duracao else 0.0
+    }
+
+
+def peak_rss_mb(pid=None):
+    """
+    Pico de memória residente do processo atual ou de um pid (Linux /proc)
+    """
+    if pid is None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss é KB no Linux e bytes no macOS
+        return round(rss / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 2)
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for linha in status:
+                if linha.startswith('VmHWM:'):
+                    return round(int(linha.split()[1]) / 1024, 2)
+    except OSError:
+        pass
+    return 0.0
+
+
+def load_baseline(nome):
+    path = os.path.join(BASELINE_DIR, f'{nome}.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(nome, resultados):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = os.path.join(BASELINE_DIR, f'{nome}.json')
+    with open(path, 'w') as baseline_file:
+        json.dump(resultados, baseline_file, indent=2, ensure_ascii=False, sort_keys=True)
+        baseline_file.write('\n')
+    print(f"Baseline salvo em {path}")
+
+
+def compare_baseline(nome, resultados, tolerancia, min_delta_ms=0.05):
+    """
+    Compara com o baseline salvo; retorna a lista de regressões (None se
+    não houver baseline)
+
+    Latências (p50/p95/p99) e memória regridem se subirem mais que a
+    tolerância; throughput regride se cair mais que a tolerância. Latências
+    (e o tempo por operação do throughput) só contam se a diferença passar
+    também de min_delta_ms: em casos de microssegundos, 25% é ruído.
+    Os baselines só valem na máquina que os gerou.
+    """
+    baseline = load_baseline(nome)
+    if baseline is None:
+        print(f"Sem baseline '{nome}' para comparar (use --save-baseline)")
+        return None
+    print(f"Comparando com benchmarks/baselines/{nome}.json (válido só na máquina que o gerou)")
+
+    regressoes = []
+    for caso, metricas in resultados.items():
+        anterior = baseline.get(caso)
+        if not isinstance(metricas, dict) or not isinstance(anterior, dict):
+            continue
+        for metrica, valor in metricas.items():
+            base = anterior.get(metrica)
+            if not isinstance(base, (int, float)) or not base or metrica == 'count':
+                continue
+            if metrica.startswith('throughput'):
+                piorou = valor < base * (1 - tolerancia) and (
+                    not valor or 1000 / valor - 1000 / base >= min_delta_ms)
+            else:
+                piorou = valor > base * (1 + tolerancia)
+                if metrica.endswith('_ms'):
+                    piorou = piorou and valor - base >= min_delta_ms
+            if piorou:
+                regressoes.append(f"{caso}.{metrica}: {base} → {valor}")
+    return regressoes
+
+
+def report(nome, resultados, args):
+    """
+    Imprime, salva baseline e compara conforme os argumentos da linha de comando
+    """
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+    if args.save_baseline:
+        save_baseline(nome, resultados)
+        return 0
+    regressoes = compare_baseline(nome, resultados, args.tolerance, args.min_delta_ms)
+    if regressoes is None:
+        return 0
+    if regressoes:
+        print("❌ Regressões detectadas:")
+        for regressao in regressoes:
+            print(f"  • {regressao}")
+        return 1
+    print("✅ Sem regressões em relação ao baseline")
+    return 0
+
+
+def add_baseline_arguments(parser):
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Grava os resultados como novo baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Variação aceita em relação ao baseline (padrão: 0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help='Diferença absoluta de latência ignorada, em ms (padrão: 0.05)')
@@ -0,0 +1,175 @@
+"""
+Teste de carga do app.py sob gunicorn contra o webhook stub
+
+Sobe o stub e o gunicorn localmente (ou usa --url de um servidor já no ar),
+dispara POST /generate-contract com a concorrência pedida e relata
+p50/p95/p99, throughput, taxa de erro e pico de RSS dos processos do gunicorn.
+
+Uso: python benchmarks/load_test.py --concurrency 8 --requests 400 --workers 2 \\
+        --webhook-latency-ms 50 --webhook-error-rate 0.02 [--save-baseline]
+"""
+
+import os
+import sys
+import time
+import socket
+import signal
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import requests
+
+from common import ROOT_DIR, dados_exemplo, summarize, peak_rss_mb, report, add_baseline_arguments
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Servidor não respondeu em {url}")
+
+
+def process_tree(pid):
+    """
+    O pid e todos os seus descendentes (Linux /proc)
+    """
+    pids = [pid]
+    for atual in pids:
+        try:
+            with open(f'/proc/{atual}/task/{atual}/children') as children:
+                pids.extend(int(filho) for filho in children.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def stop(proc):
+    if proc is not None and proc.poll() is None:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def run_load(base_url, concurrency, total, timeout):
+    """
+    Dispara total requisições com concurrency threads; retorna (latências, erros, duração)
+    """
+    latencias = []
+    erros = {}
+    lock = threading.Lock()
+    contador = iter(range(total))
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                i = next(contador, None)
+            if i is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                response = session.post(f"{base_url}/generate-contract", json=dados_exemplo(i), timeout=timeout)
+                status = response.status_code
+            except requests.exceptions.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencias.append(elapsed)
+                if status not in (200, 202):
+                    erros[str(status)] = erros.get(str(status), 0) + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencias, erros, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga do gerador de contratos')
+    parser.add_argument('--url', help='Servidor já em execução (não sobe stub nem gunicorn)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=2, help='Workers do gunicorn')
+    parser.add_argument('--threads', type=int, default=1, help='Threads por worker do gunicorn')
+    parser.add_argument('--webhook-latency-ms', type=float, default=0.0)
+    parser.add_argument('--webhook-jitter-ms', type=float, default=0.0)
+    parser.add_argument('--webhook-error-rate', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=60.0, help='Timeout por requisição')
+    parser.add_argument('--name', default='load', help='Nome do baseline')
+    parser.add_argument('--server-log', default=os.path.join(tempfile.gettempdir(), 'contrato-load-test.log'),
+                        help='Arquivo que recebe a saída do gunicorn')
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    stub = server = server_log = None
+    base_url = args.url.rstrip('/') if args.url else None
+    try:
+        if base_url is None:
+            stub_port = free_port()
+            stub = subprocess.Popen([
+                sys.executable, os.path.join(BENCH_DIR, 'stub_webhook.py'), '--port', str(stub_port),
+                '--latency-ms', str(args.webhook_latency_ms), '--jitter-ms', str(args.webhook_jitter_ms),
+                '--error-rate', str(args.webhook_error_rate)
+            ], stdout=subprocess.DEVNULL)
+            wait_until_up(f"http://127.0.0.1:{stub_port}/")
+
+            app_port = free_port()
+            server_log = open(args.server_log, 'wb')
+            logging.info(f"Saída do gunicorn em {args.server_log}")
+            env = dict(os.environ, WEBHOOK_URL=f"http://127.0.0.1:{stub_port}/webhook",
+                       IDEMPOTENCY_TTL='0', RETRY_SPOOL_PATH='')
+            server = subprocess.Popen([
+                sys.executable, '-m', 'gunicorn', '--bind', f"127.0.0.1:{app_port}",
+                '--workers', str(args.workers), '--threads', str(args.threads),
+                '--timeout', '120', '--log-level', 'warning', 'app:app'
+            ], cwd=ROOT_DIR, env=env, stdout=server_log, stderr=subprocess.STDOUT)
+            base_url = f"http://127.0.0.1:{app_port}"
+            wait_until_up(f"{base_url}/ready")
+
+        # Aquecimento: cada worker carrega o template na primeira requisição
+        run_load(base_url, args.concurrency, args.concurrency * 2, args.timeout)
+
+        logging.info(f"Disparando {args.requests} requisições com concorrência {args.concurrency}")
+        latencias, erros, duracao = run_load(base_url, args.concurrency, args.requests, args.timeout)
+
+        resultado = summarize(latencias, duracao)
+        resultado['error_rate'] = round(sum(erros.values()) / len(latencias), 4) if latencias else 0.0
+        if server is not None:
+            resultado['peak_rss_mb'] = round(sum(peak_rss_mb(pid) for pid in process_tree(server.pid)), 2)
+        resultados = {
+            f"generate-contract[c={args.concurrency},w={args.workers},t={args.threads}]": resultado,
+            'errors': erros
+        }
+    finally:
+        stop(server)
+        stop(stub)
+        if server_log is not None:
+            server_log.close()
+
+    return report(args.name, resultados, args)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Webhook local para benchmarks, com latência e erros configuráveis
+
+Uso: python benchmarks/stub_webhook.py --port 8765 --latency-ms 50 --error-rate 0.05
+"""
+
+import sys
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubWebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalhos e corpo saem em escritas separadas; sem isso o Nagle + ACK
+    # atrasado do cliente somam ~40 ms a cada resposta
+    disable_nagle_algorithm = True
+
+    def _read_body(self):
+        # Aceita Content-Length e Transfer-Encoding: chunked (envio em streaming)
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            total = 0
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return total
+                total += len(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get('Content-Length') or 0)
+        return len(self.rfile.read(length))
+
+    def do_POST(self):
+        size = self._read_body()
+        server = self.server
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+
+        failed = random.random() < server.error_rate
+        status = server.error_status if failed else 200
+        body = b'{"status": "error"}' if failed else b'{"status": "ok"}'
+        with server.lock:
+            server.requests += 1
+            server.errors += failed
+            server.bytes_received += size
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Contadores do stub, úteis para conferir o que o harness enviou
+        server = self.server
+        with server.lock:
+            body = (f'{{"requests": {server.requests}, "errors": {server.errors}, '
+                    f'"bytes_received": {server.bytes_received}}}').encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubWebhookServer(ThreadingHTTPServer):
+    # Fila de conexões grande: o modo ASGI abre centenas de conexões de uma vez
+    request_queue_size = 1024
+
+
+def create_server(host='127.0.0.1', port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=500):
+    """
+    Cria o servidor stub (port=0 escolhe uma porta livre)
+    """
+    server = StubWebhookServer((host, port), StubWebhookHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.jitter = jitter_ms / 1000
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.errors = 0
+    server.bytes_received = 0
+    return server
+
+
+def start_in_thread(**kwargs):
+    """
+    Inicia o stub em uma thread; retorna (server, url)
+    """
+    server = create_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, name='stub-webhook', daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/webhook"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Webhook stub para benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latência fixa por requisição')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Latência aleatória adicional (0..jitter)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de respostas com erro (0..1)')
+    parser.add_argument('--error-status', type=int, default=500, help='Status HTTP das respostas com erro')
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency_ms, args.jitter_ms,
+                           args.error_rate, args.error_status)
+    print(f"Stub webhook em http://{args.host}:{server.server_address[1]}/webhook", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,292 @@
+import os
+import re
+import glob
+import mmap
+import time
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from rendered_store import contract_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Metadados indexados de cada contrato arquivado
+INDEX_FIELDS = ('locatario', 'dia_inicio', 'dia_fim', 'template_id', 'template_version', 'data_fingerprint')
+
+# Formato de contract_id; qualquer outro valor vindo da URL é recusado
+_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+
+class ContractArchive:
+    """
+    Arquivo de contratos endereçado por conteúdo, com índice em SQLite
+
+    Cada DOCX é gravado uma única vez em objects/<2 primeiros>/<id>.docx,
+    onde id é o hash do conteúdo (o mesmo de GET /contracts/<id>); gerar de
+    novo o mesmo contrato só acrescenta uma linha ao índice. O índice guarda
+    locatário, datas da reserva e versão do template de cada geração.
+    Objetos a partir de uma página (mmap_min_bytes) são lidos por mmap, sem
+    copiar o arquivo para a memória do processo; abaixo disso o mapeamento
+    custa mais que a leitura. A compactação apaga do índice as gerações mais antigas que
+    a retenção e os objetos que ficaram sem nenhuma referência.
+    """
+
+    def __init__(self, directory, retention_days=0, compact_interval=3600.0, mmap_min_bytes=mmap.PAGESIZE,
+                 orphan_grace=3600.0):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, 'objects')
+        self.index_path = os.path.join(directory, 'index.sqlite3')
+        self.retention_days = retention_days
+        self.compact_interval = compact_interval
+        self.mmap_min_bytes = mmap_min_bytes
+        # Objetos sem referência só são apagados depois deste tempo sem uso
+        self.orphan_grace = orphan_grace
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS objects (
+                    id TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS contracts (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    object_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    locatario TEXT,
+                    dia_inicio TEXT,
+                    dia_fim TEXT,
+                    template_id TEXT,
+                    template_version TEXT,
+                    data_fingerprint TEXT,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_contracts_object ON contracts (object_id, filename)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_contracts_locatario ON contracts (locatario)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_contracts_created ON contracts (created_at)')
+
+    @classmethod
+    def from_env(cls, directory):
+        """
+        Cria o arquivo a partir de ARCHIVE_RETENTION_DAYS, ARCHIVE_COMPACT_INTERVAL e ARCHIVE_MMAP_MIN_BYTES
+        """
+        return cls(
+            directory,
+            retention_days=float(os.getenv('ARCHIVE_RETENTION_DAYS', 0)),
+            compact_interval=float(os.getenv('ARCHIVE_COMPACT_INTERVAL', 3600)),
+            mmap_min_bytes=int(os.getenv('ARCHIVE_MMAP_MIN_BYTES', mmap.PAGESIZE))
+        )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _object_path(self, object_id):
+        return os.path.join(self.objects_dir, object_id[:2], f"{object_id}.docx")
+
+    def _write_object(self, path, contract_bytes):
+        # Escrita atômica: outro worker nunca lê um objeto pela metade
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(contract_bytes)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def put(self, filename, contract_bytes, **metadata):
+        """
+        Arquiva o contrato e indexa a geração (metadados em INDEX_FIELDS)
+
+        Retorna (id, deduplicado): deduplicado indica que o conteúdo já
+        estava arquivado e nada foi gravado além do índice.
+        """
+        object_id = contract_id(contract_bytes)
+        path = self._object_path(object_id)
+        now = time.time()
+        # A linha do objeto é escrita antes do arquivo: a compactação apaga
+        # objeto e arquivo na mesma transação, então depois deste ponto o
+        # arquivo só pode faltar se ainda precisar ser gravado
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO objects (id, size, created_at, last_used_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET last_used_at = excluded.last_used_at',
+                (object_id, len(contract_bytes), now, now)
+            )
+        deduplicated = os.path.exists(path)
+        if not deduplicated:
+            self._write_object(path, contract_bytes)
+        campos = {field: metadata.get(field) for field in INDEX_FIELDS}
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR IGNORE INTO contracts (object_id, filename, {', '.join(INDEX_FIELDS)}, created_at) "
+                f"VALUES (?, ?, {', '.join('?' * len(INDEX_FIELDS))}, ?)",
+                (object_id, filename, *campos.values(), now)
+            )
+        logger.info(f"Contrato arquivado: {filename} ({object_id[:12]}{', deduplicado' if deduplicated else ''})")
+        self.start()
+        return object_id, deduplicated
+
+    def get(self, object_id):
+        """
+        Metadados da geração mais recente do objeto, ou None se não arquivado
+        """
+        if not _ID_RE.fullmatch(object_id):
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT c.filename, c.locatario, o.size FROM contracts c JOIN objects o ON o.id = c.object_id '
+                'WHERE c.object_id = ? ORDER BY c.seq DESC LIMIT 1',
+                (object_id,)
+            ).fetchone()
+        if row is None or not os.path.exists(self._object_path(object_id)):
+            return None
+        return {
+            'id': object_id,
+            'filename': row[0],
+            'locatario': row[1],
+            'size': row[2],
+            'path': self._object_path(object_id)
+        }
+
+    def read(self, object_id):
+        """
+        Conteúdo do objeto (somente leitura) ou None se não existir
+
+        Objetos a partir de mmap_min_bytes voltam como mmap: as páginas vêm
+        do cache do sistema de arquivos, sob demanda, sem cópia para o heap.
+        """
+        if not _ID_RE.fullmatch(object_id):
+            return None
+        try:
+            with open(self._object_path(object_id), 'rb') as object_file:
+                size = os.fstat(object_file.fileno()).st_size
+                if size and size >= self.mmap_min_bytes:
+                    return mmap.mmap(object_file.fileno(), 0, access=mmap.ACCESS_READ)
+                return object_file.read()
+        except FileNotFoundError:
+            return None
+
+    def list(self, locatario=None, limit=100):
+        """
+        Gerações arquivadas, da mais recente para a mais antiga
+        """
+        query = (f"SELECT c.object_id, c.filename, {', '.join('c.' + field for field in INDEX_FIELDS)}, "
+                 "c.created_at, o.size FROM contracts c JOIN objects o ON o.id = c.object_id")
+        params = []
+        if locatario:
+            query += ' WHERE c.locatario = ?'
+            params.append(locatario)
+        query += ' ORDER BY c.seq DESC LIMIT ?'
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [{
+            'id': row[0],
+            'filename': row[1],
+            **dict(zip(INDEX_FIELDS, row[2:2 + len(INDEX_FIELDS)])),
+            'created_at': datetime.fromtimestamp(row[-2]).isoformat(timespec='seconds'),
+            'size': row[-1]
+        } for row in rows]
+
+    def compact(self):
+        """
+        Aplica a retenção e apaga objetos sem referência e temporários órfãos
+
+        Retorna as contagens de gerações e objetos removidos e os bytes liberados
+        """
+        now = time.time()
+        result = {'contracts_removed': 0, 'objects_removed': 0, 'bytes_freed': 0}
+        with self._connect() as conn:
+            # Trava de escrita desde a leitura: um put() concorrente do mesmo
+            # objeto espera e, em seguida, regrava o arquivo removido
+            conn.execute('BEGIN IMMEDIATE')
+            if self.retention_days > 0:
+                result['contracts_removed'] = conn.execute(
+                    'DELETE FROM contracts WHERE created_at < ?', (now - self.retention_days * 86400,)
+                ).rowcount
+            orphans = conn.execute(
+                'SELECT id, size FROM objects WHERE last_used_at < ? '
+                'AND id NOT IN (SELECT object_id FROM contracts)',
+                (now - self.orphan_grace,)
+            ).fetchall()
+            for object_id, size in orphans:
+                try:
+                    os.remove(self._object_path(object_id))
+                except FileNotFoundError:
+                    pass
+                conn.execute('DELETE FROM objects WHERE id = ?', (object_id,))
+                result['objects_removed'] += 1
+                result['bytes_freed'] += size
+        for tmp_path in glob.glob(os.path.join(self.objects_dir, '*', '*.tmp')):
+            try:
+                if os.path.getmtime(tmp_path) < now - self.orphan_grace:
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+        if result['contracts_removed'] or result['objects_removed']:
+            # VACUUM não roda dentro de transação
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            try:
+                conn.execute('VACUUM')
+            finally:
+                conn.close()
+            logger.info(f"Arquivo compactado: {result}")
+        return result
+
+    def stats(self):
+        with self._connect() as conn:
+            objects, total_bytes = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects').fetchone()
+            contracts = conn.execute('SELECT COUNT(*) FROM contracts').fetchone()[0]
+        return {
+            'contracts': contracts,
+            'objects': objects,
+            'bytes': total_bytes,
+            'deduplicated': max(contracts - objects, 0),
+            'retention_days': self.retention_days,
+            'compact_interval': self.compact_interval
+        }
+
+    def start(self):
+        """
+        Inicia a thread de compactação neste processo (idempotente, seguro após fork)
+        """
+        if self.compact_interval <= 0 or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='archive-compact', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.compact_interval)
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Erro na compactação do arquivo: {str(e)}")
@@ -1,7 +1,23 @@
+import io
 import os
-import base64
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import requests
-from docx import Document
+from template_registry import TemplateRegistry, DEFAULT_TEMPLATE_ID
+from substitution import SubstitutionEngine
+from delivery_queue import DeliveryQueue, DeliveryQueueFull
+from http_pool import WebhookHttpPool, request_error_reason
+from streaming_payload import Base64Field, GzipBody, iter_json_body, DEFAULT_CHUNK_SIZE
+from output_optimizer import OutputOptimizer
+from render_executor import create_render_executor
+from idempotency import IdempotencyCache, fingerprint
+from admission import AdmissionControl, AdmissionRejected
+from delivery_sinks import DeliveryFanout, SinkResult
+from rendered_store import RenderedContractStore
+from metrics import MetricsRegistry
+from normalization import normalize_record, normalize_records, parse_brl, format_brl, parse_date
 from datetime import datetime
 import logging
 
@@ -9,100 +25,224 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class WebhookDeliveryError(Exception):
+    """
+    Envio ao webhook que falhou; a mensagem é o status HTTP ou o erro de conexão
+    """
+
+
+class WebhookRequest:
+    """
+    Headers e corpo de um envio ao webhook, com os medidores de codificação
+    """
+    __slots__ = ('headers', 'body', 'base64_field', 'gzip_body')
+
+    def __init__(self, headers, body, base64_field, gzip_body=None):
+        self.headers = headers
+        self.body = body
+        self.base64_field = base64_field
+        self.gzip_body = gzip_body
+
+    @property
+    def encode_seconds(self):
+        seconds = self.base64_field.encode_seconds
+        if self.gzip_body is not None:
+            seconds += self.gzip_body.encode_seconds
+        return seconds
+
+
 class ContractService:
-    def __init__(self, webhook_url=None):
+    RENDER_BACKENDS = ('docx', 'stream')
+    # Campos do template padrão, usados quando o manifesto não está disponível
+    REQUIRED_FIELDS = (
+        'nome_do_locatario',
+        'estado_civil',
+        'nacionalidade',
+        'profissao',
+        'numero_do_rg',
+        'numero_do_cpf',
+        'telefone_celular',
+        'email',
+        'endereco',
+        'qtd_noites',
+        'dia_inicio',
+        'dia_fim',
+        'valor_locacao'
+    )
+
+    def __init__(self, webhook_url=None, render_backend=None, archive_dir=None, http_pool=None,
+                 render_executor=None, metrics=None):
         """
         Inicializa o serviço de contrato com configurações do webhook
+
+        render_backend: 'docx' (python-docx, padrão) ou 'stream' (escreve o
+        ZIP direto, sem montar o documento); também via RENDER_BACKEND
+        archive_dir: arquiva cada contrato, deduplicado e indexado (CONTRACT_ARCHIVE_DIR)
+        http_pool: WebhookHttpPool compartilhado (padrão: configurado pelo ambiente)
+        render_executor: 'inline', 'thread' ou 'process' (RENDER_EXECUTOR)
+        metrics: MetricsRegistry das etapas (padrão: configurado pelo ambiente)
         """
         self.webhook_url = webhook_url or os.getenv('WEBHOOK_URL', 'https://webh.criativamaisdigital.com.br/webhook/c1d01bf8-6d34-44ee-9100-2923b5fb7876')
         self.template_path = "CONTRATO Casa da Ana.docx"
+        # Fração dos contratos com log detalhado por substituição (0 = nenhum)
+        self.render_log_sample_rate = float(os.getenv('RENDER_LOG_SAMPLE_RATE', 0))
+        # Tempos por etapa e contadores expostos em GET /metrics
+        self.metrics = metrics or MetricsRegistry.from_env()
+        # Conexões keep-alive reaproveitadas entre requisições e threads
+        self.http_pool = http_pool or WebhookHttpPool.from_env()
+        # Corpo do webhook gerado em pedaços (chunked) em vez de montado inteiro
+        self.webhook_streaming = os.getenv('WEBHOOK_STREAMING', 'True').lower() == 'true'
+        self.webhook_chunk_size = int(os.getenv('WEBHOOK_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+        # Corpo do webhook com Content-Encoding: gzip (o receptor precisa aceitar)
+        self.webhook_gzip = os.getenv('WEBHOOK_GZIP', 'False').lower() == 'true'
+        # Escrita do DOCX: nível de compressão e partes não usadas removidas
+        self.output_optimizer = OutputOptimizer.from_env()
+        # Template compilado uma vez por worker e recarregado se o arquivo mudar
+        # Templates por template_id (TEMPLATES_DIR), compilados sob demanda em
+        # um LRU limitado; template_cache é o do template padrão
+        self.template_registry = TemplateRegistry.from_env(self.template_path, self.output_optimizer)
+        self.template_cache = self.template_registry.default_cache
+        # Diretório opcional para guardar uma cópia de cada contrato gerado
+        self.archive_dir = archive_dir or os.getenv('CONTRACT_ARCHIVE_DIR') or None
+        # Arquivo endereçado por conteúdo (objetos deduplicados + índice SQLite)
+        self.archive = None
+        if self.archive_dir:
+            # Import local, como o do spool: sqlite3 só quando o arquivo está habilitado
+            from contract_archive import ContractArchive
+            self.archive = ContractArchive.from_env(self.archive_dir)
+        # Spool opcional (SQLite) para reenviar entregas que falharam
+        self.retry_spool = None
+        spool_path = os.getenv('RETRY_SPOOL_PATH')
+        if spool_path:
+            # Import local: sqlite3 só é carregado quando o spool está habilitado
+            from retry_spool import RetrySpool, CircuitBreaker
+            self.retry_spool = RetrySpool(
+                spool_path,
+                self._redeliver,
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5)),
+                    reset_timeout=float(os.getenv('CIRCUIT_RESET_TIMEOUT', 60))
+                ),
+                max_attempts=int(os.getenv('RETRY_MAX_ATTEMPTS', 10)),
+                base_delay=float(os.getenv('RETRY_BASE_DELAY', 30)),
+                max_delay=float(os.getenv('RETRY_MAX_DELAY', 3600)),
+                lease_timeout=float(os.getenv('RETRY_LEASE_TIMEOUT', 300))
+            )
+        # Cache de idempotência: repetições não geram nem enviam de novo
+        self.idempotency_cache = None
+        idempotency_ttl = float(os.getenv('IDEMPOTENCY_TTL', 3600))
+        if idempotency_ttl > 0:
+            self.idempotency_cache = IdempotencyCache(
+                max_entries=int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', 256)),
+                ttl=idempotency_ttl,
+                wait_timeout=float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 60))
+            )
+        # Controle de admissão: renderizações e contratos em andamento
+        # simultâneos, com fila de espera limitada, e taxa por cliente
+        self.admission = AdmissionControl.from_env(self.metrics)
+        # Destinos de entrega (DELIVERY_SINKS): o contrato renderizado uma vez
+        # vai em paralelo ao webhook, à Evolution API e/ou ao arquivo
+        self.delivery = DeliveryFanout.from_env(self)
+        # Contratos gerados por POST /render-contract, baixados em GET /contracts/<id>
+        self.rendered_store = RenderedContractStore.from_env()
+        self._delivery_queue = None
+        self._delivery_queue_lock = threading.Lock()
+        # Resultado do aquecimento (warmup); None até a primeira execução
+        self.warmup_result = None
+        self.warmup_error = None
+        # Nova tentativa de aquecimento pelo /ready: em segundo plano, no
+        # máximo uma a cada WARMUP_RETRY_INTERVAL segundos
+        self.warmup_retry_interval = float(os.getenv('WARMUP_RETRY_INTERVAL', 10))
+        self._warmup_started = None
+        self._warmup_thread = None
+        self._warmup_lock = threading.Lock()
+        self.render_backend = (render_backend or os.getenv('RENDER_BACKEND', 'docx')).lower()
+        if self.render_backend not in self.RENDER_BACKENDS:
+            raise ValueError(f"RENDER_BACKEND inválido: '{self.render_backend}' "
+                             f"(opções: {', '.join(self.RENDER_BACKENDS)})")
+        # Onde a renderização roda: inline (padrão), thread ou process
+        self.render_executor = create_render_executor(
+            render_executor or os.getenv('RENDER_EXECUTOR', 'inline'), self,
+            workers=int(os.getenv('RENDER_WORKERS', 0)) or None
+        )
+    
+    def required_fields(self, template_id=None):
+        """
+        Campos de entrada exigidos: o nome do locatário (usado no arquivo e no
+        envio) mais os campos que o template realmente usa, segundo o manifesto
+        """
+        try:
+            manifest = self.template_registry.get(template_id).manifest
+        except FileNotFoundError:
+            # Sem template não há manifesto; o erro aparece ao gerar o contrato
+            return list(self.REQUIRED_FIELDS)
+        return ['nome_do_locatario'] + [field for field in manifest.fields if field != 'nome_do_locatario']
     
     def validate_contract_data(self, dados):
         """
         Valida se todos os dados obrigatórios foram fornecidos
         """
-        required_fields = [
-            'nome_do_locatario',
-            'estado_civil',
-            'nacionalidade',
-            'profissao',
-            'numero_do_rg',
-            'numero_do_cpf',
-            'telefone_celular',
-            'email',
-            'endereco',
-            'qtd_noites',
-            'dia_inicio',
-            'dia_fim',
-            'valor_locacao'
-        ]
+        self.normalize_contract_data(dados)
+        return True
+    
+    def normalize_contract_data(self, dados):
+        """
+        Valida os dados e retorna o registro normalizado
+
+        Valor, datas e noites são convertidos e conferidos entre si (ver
+        normalization); qtd_noites pode ser omitida quando o período é
+        informado. Levanta ValueError se os dados forem inválidos.
+        """
+        return self._check_required(normalize_record(dados))
+    
+    def _check_required(self, dados):
+        template_id = dados.get('template_id')
+        if template_id is not None and not isinstance(template_id, str):
+            raise ValueError("template_id deve ser uma string")
         
         missing_fields = []
-        for field in required_fields:
+        for field in self.required_fields(template_id):
             if not dados.get(field):
                 missing_fields.append(field)
         
         if missing_fields:
             raise ValueError(f"Campos obrigatórios não fornecidos: {', '.join(missing_fields)}")
         
-        return True
+        return dados
     
     def generate_contract(self, dados_locatario):
         """
         Gera o contrato preenchendo o template com os dados fornecidos
         """
         try:
-            self.validate_contract_data(dados_locatario)
+            dados_template, output_filename, template = self._prepare_contract(dados_locatario)
             
-            # Verifica se o template existe
-            if not os.path.exists(self.template_path):
-                raise FileNotFoundError(f"Template '{self.template_path}' não encontrado")
+            # Preenche o contrato
+            success = self._render(dados_template, output_filename, template=template)
             
-            # Converte os dados para o formato esperado pelo template
-            dados_template = {
-                # Variáveis originais
-                '{{ nome do locatário }}': dados_locatario['nome_do_locatario'],
-                '{{ estado civil }}': dados_locatario['estado_civil'],
-                '{{ nacionalidade }}': dados_locatario['nacionalidade'],
-                '{{ profissao }}': dados_locatario['profissao'],
-                '{{ numero do rg }}': dados_locatario['numero_do_rg'],
-                '{{ numero do cpf }}': dados_locatario['numero_do_cpf'],
-                '{{ telefone celular }}': dados_locatario['telefone_celular'],
-                '{{ e-mail }}': dados_locatario['email'],
-                '{{ endereco }}': dados_locatario['endereco'],
-                
-                # Novas variáveis - testando diferentes formatos
-                '{{ qtd_noites }}': str(dados_locatario['qtd_noites']),
-                '{{qtd_noites}}': str(dados_locatario['qtd_noites']),  # Sem espaços
-                '{{ qtd noites }}': str(dados_locatario['qtd_noites']),  # Com espaço
-                
-                '{{ dia_inicio }}': dados_locatario['dia_inicio'],
-                '{{dia_inicio}}': dados_locatario['dia_inicio'],  # Sem espaços
-                '{{ dia inicio }}': dados_locatario['dia_inicio'],  # Com espaço
-                
-                '{{ dia_fim }}': dados_locatario['dia_fim'],
-                '{{dia_fim}}': dados_locatario['dia_fim'],  # Sem espaços
-                '{{ dia fim }}': dados_locatario['dia_fim'],  # Com espaço
-                
-                '{{ valor_locacao }}': dados_locatario['valor_locacao'],
-                '{{valor_locacao}}': dados_locatario['valor_locacao'],  # Sem espaços
-                '{{ valor locacao }}': dados_locatario['valor_locacao'],  # Com espaço
+            if success:
+                return output_filename
+            else:
+                raise Exception("Falha ao preencher o template do contrato")
                 
-                '{{ valor_locacao/2 }}': self._calculate_half_value(dados_locatario['valor_locacao']),
-                '{{valor_locacao/2}}': self._calculate_half_value(dados_locatario['valor_locacao']),  # Sem espaços
-                '{{ valor locacao/2 }}': self._calculate_half_value(dados_locatario['valor_locacao']),  # Com espaço
-            }
-            
-            # Gera nome do arquivo
-            nome_sanitizado = self._sanitize_filename(dados_locatario['nome_do_locatario'])
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"CONTRATO_{nome_sanitizado}_{timestamp}.docx"
+        except Exception as e:
+            logger.error(f"Erro ao gerar contrato: {str(e)}")
+            raise
+    
+    def render_contract(self, dados_locatario):
+        """
+        Gera o contrato em memória, sem gravar arquivo em disco
+
+        Retorna (nome do arquivo, bytes do DOCX)
+        """
+        try:
+            dados_template, output_filename, template = self._prepare_contract(dados_locatario)
             
-            # Preenche o contrato
-            success = self._fill_contract_template(dados_template, output_filename)
+            buffer = io.BytesIO()
+            success = self._render(dados_template, output_filename, buffer, template)
             
             if success:
-                return output_filename
+                return output_filename, buffer.getvalue()
             else:
                 raise Exception("Falha ao preencher o template do contrato")
                 
@@ -110,6 +250,81 @@ class ContractService:
             logger.error(f"Erro ao gerar contrato: {str(e)}")
             raise
     
+    def _prepare_contract(self, dados_locatario):
+        """
+        Valida os dados e monta as variáveis do template e o nome do arquivo
+
+        Retorna (variáveis, nome do arquivo, template compilado escolhido por template_id)
+        """
+        with self.metrics.stage('validation'):
+            dados_locatario = self.normalize_contract_data(dados_locatario)
+            
+            # Verifica se o template existe
+            template_path = self.template_registry.cache_for(dados_locatario.get('template_id')).template_path
+            if not os.path.exists(template_path):
+                raise FileNotFoundError(f"Template '{template_path}' não encontrado")
+        
+        template = self.template_registry.get(dados_locatario.get('template_id'))
+        
+        # Converte os dados para as variáveis do template (por nome canônico)
+        # segundo o manifesto: cada variável sabe de qual campo vem e se é
+        # derivada, como '{{ valor_locacao/2 }}' (já calculada na normalização)
+        dados_template = template.manifest.build_values(dados_locatario, {
+            'half_value': self._calculate_half_value
+        })
+        
+        # Gera nome do arquivo
+        nome_sanitizado = self._sanitize_filename(dados_locatario['nome_do_locatario'])
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_filename = f"CONTRATO_{nome_sanitizado}_{timestamp}.docx"
+        
+        return dados_template, output_filename, template
+    
+    def _render(self, dados_template, output_filename, output=None, template=None):
+        """
+        Preenche o template com o backend configurado
+
+        Grava em output (arquivo aberto/buffer) ou, se omitido, em output_filename;
+        template é o CompiledTemplate a usar (padrão: o template padrão)
+        """
+        if self.render_backend == 'stream':
+            success = self._fill_contract_stream(dados_template, output_filename, output, template)
+        else:
+            success = self._fill_contract_template(dados_template, output_filename, output, template)
+        self.metrics.inc('contract_renders_total', backend=self.render_backend,
+                         result='success' if success else 'error')
+        return success
+    
+    def _archive_contract(self, contract_filename, contract_bytes, dados_locatario=None):
+        """
+        Guarda o contrato no arquivo (CONTRACT_ARCHIVE_DIR), indexado pelos dados
+
+        O conteúdo é gravado uma única vez; gerações repetidas só são
+        indexadas. Retorna o id do contrato (o mesmo de GET /contracts/<id>)
+        """
+        metadata = self._archive_metadata(dados_locatario) if dados_locatario is not None else {}
+        object_id, deduplicated = self.archive.put(contract_filename, contract_bytes, **metadata)
+        self.metrics.inc('contract_archive_writes_total', result='deduplicated' if deduplicated else 'stored')
+        return object_id
+    
+    def _archive_metadata(self, dados_locatario):
+        """
+        Locatário, período, template (id e versão do conteúdo) e hash dos dados
+        """
+        dados = normalize_record(dados_locatario)
+        template_id = dados.get('template_id') or DEFAULT_TEMPLATE_ID
+        periodo = {
+            field: parse_date(dados[field]).isoformat() if dados.get(field) else None
+            for field in ('dia_inicio', 'dia_fim')
+        }
+        return {
+            'locatario': dados.get('nome_do_locatario'),
+            **periodo,
+            'template_id': template_id,
+            'template_version': self.template_registry.get(template_id).digest[:12],
+            'data_fingerprint': fingerprint(dados)
+        }
+    
     def _sanitize_filename(self, nome):
         """
         Sanitiza o nome para uso em nome de arquivo
@@ -122,169 +337,718 @@ class ContractService:
         Calcula metade do valor da locação, tratando diferentes formatos
         """
         try:
-            # Remove símbolos e converte para float
-            valor_limpo = valor_string
-            if isinstance(valor_limpo, str):
-                # Remove R$, pontos de milhares e converte vírgula para ponto
-                valor_limpo = valor_limpo.replace('R$', '').replace(' ', '').strip()
-                # Se tem vírgula, trata como separador decimal brasileiro
-                if ',' in valor_limpo:
-                    if valor_limpo.count('.') > 0 and valor_limpo.count(',') == 1:
-                        # Formato: 1.000,50 (brasileiro)
-                        valor_limpo = valor_limpo.replace('.', '').replace(',', '.')
-                    else:
-                        # Formato: 1000,50
-                        valor_limpo = valor_limpo.replace(',', '.')
-                
-                valor_float = float(valor_limpo)
-            else:
-                valor_float = float(valor_string)
-            
-            metade = valor_float / 2
-            
-            # Formata de volta para o padrão brasileiro
-            return f"R$ {metade:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            
-        except (ValueError, AttributeError) as e:
+            return format_brl(parse_brl(valor_string) / 2)
+        except ValueError as e:
             logger.warning(f"Erro ao calcular metade do valor '{valor_string}': {e}")
             return "R$ 0,00"
     
-    def _fill_contract_template(self, dados_template, output_filename):
+    def _render_detail_level(self):
+        """
+        Nível dos logs por parágrafo/substituição deste contrato, ou None
+
+        Em DEBUG todos os contratos são detalhados; fora dele, só a fração
+        amostrada por RENDER_LOG_SAMPLE_RATE (em INFO), para depurar o
+        template em produção sem pagar o custo em toda requisição
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            return logging.DEBUG
+        if self.render_log_sample_rate and random.random() < self.render_log_sample_rate:
+            return logging.INFO
+        return None
+    
+    def _log_render_summary(self, output_filename, substitutions, missing, unused, timings, size=None, saved=None):
+        """
+        Um único registro por contrato, com contagens e tempos (ms)
+        """
+        level = logging.WARNING if missing or unused else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+        total_ms = sum(timings.values()) * 1000
+        message = "Contrato gerado: %s (%d substituições, %.1f ms, %d bytes, %d economizados)"
+        args = [output_filename, substitutions, total_ms, size or 0, saved or 0]
+        if unused:
+            message += "; variáveis não encontradas no template: %s"
+            args.append(unused)
+        if missing:
+            message += "; variáveis do template sem valor: %s"
+            args.append(missing)
+        logger.log(level, message, *args, extra={
+            'contract': output_filename,
+            'backend': self.render_backend,
+            'substitutions': substitutions,
+            'missing': missing,
+            'unused': unused,
+            'size_bytes': size,
+            'bytes_saved': saved,
+            'timings_ms': {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+        })
+    
+    def _record_output(self, streaming, size):
+        """
+        Contabiliza o tamanho do DOCX e os bytes economizados pelo otimizador
+        """
+        self.metrics.inc('contract_output_bytes_total', size)
+        self.metrics.inc('contract_output_bytes_saved_total', max(streaming.bytes_saved, 0))
+        return max(streaming.bytes_saved, 0)
+    
+    def _fill_contract_template(self, dados_template, output_filename, output=None, template=None):
         """
         Preenche o template DOCX com os dados fornecidos
         """
+        metrics = self.metrics
+        detail_level = self._render_detail_level()
         try:
-            document = Document(self.template_path)
-            substituicoes_realizadas = {}
-
-            # Itera sobre todos os parágrafos do documento
-            for paragraph in document.paragraphs:
-                original_text = paragraph.text
-                if '{{' in original_text:
-                    logger.info(f"Parágrafo com variáveis encontrado: {original_text}")
-                    
-                    for key, value in dados_template.items():
-                        if key in paragraph.text:
-                            # Substituição mais robusta - reconstrói o parágrafo
-                            full_text = paragraph.text
-                            if key in full_text:
-                                new_text = full_text.replace(key, str(value))
-                                if new_text != full_text:
-                                    # Limpa o parágrafo e adiciona o novo texto
-                                    paragraph.clear()
-                                    run = paragraph.add_run(new_text)
-                                    substituicoes_realizadas[key] = value
-                                    logger.info(f"Substituído: '{key}' → '{value}'")
-            
-            # Itera sobre todas as tabelas do documento (se houver)
-            for table in document.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for paragraph in cell.paragraphs:
-                            original_text = paragraph.text
-                            if '{{' in original_text:
-                                logger.info(f"Célula com variáveis encontrada: {original_text}")
-                                
-                                for key, value in dados_template.items():
-                                    if key in paragraph.text:
-                                        # Substituição mais robusta - reconstrói o parágrafo
-                                        full_text = paragraph.text
-                                        if key in full_text:
-                                            new_text = full_text.replace(key, str(value))
-                                            if new_text != full_text:
-                                                # Limpa o parágrafo e adiciona o novo texto
-                                                paragraph.clear()
-                                                run = paragraph.add_run(new_text)
-                                                substituicoes_realizadas[key] = value
-                                                logger.info(f"Substituído em tabela: '{key}' → '{value}'")
-            
-            document.save(output_filename)
-            logger.info(f"Contrato gerado: {output_filename}")
-            logger.info(f"Total de substituições realizadas: {len(substituicoes_realizadas)}")
-            
-            # Log das variáveis que não foram substituídas
-            variaveis_nao_substituidas = []
-            for key in dados_template.keys():
-                if key not in substituicoes_realizadas and key.startswith('{{') and key.endswith('}}'):
-                    variaveis_nao_substituidas.append(key)
-            
-            if variaveis_nao_substituidas:
-                logger.warning(f"Variáveis não encontradas no template: {variaveis_nao_substituidas}")
+            with metrics.stage('template_load') as load:
+                compiled = template or self.template_registry.get()
+                document = compiled.new_document()
+            engine = SubstitutionEngine(dados_template)
+
+            # Visita apenas os parágrafos (do corpo e de tabelas) que a análise
+            # do template identificou como contendo variáveis
+            with metrics.stage('substitution') as substitution:
+                for location, paragraph in compiled.resolve_locations(document):
+                    if detail_level is None:
+                        engine.substitute(paragraph)
+                        continue
+
+                    logger.log(detail_level, "%s com variáveis encontrado: %s", location.describe(), paragraph.text)
+                    for key, value in engine.substitute(paragraph):
+                        logger.log(detail_level, "Substituído: '%s' → '%s'", key, value)
+
+            # Só o document.xml é serializado e comprimido; as demais partes
+            # saem do template já comprimidas (OutputOptimizer)
+            with metrics.stage('serialization') as serialization:
+                streaming = compiled.streaming()
+                document_xml = document.part.blob
+                if output is not None:
+                    _, size = streaming.write_document(document_xml, output)
+                else:
+                    with open(output_filename, 'wb') as output_file:
+                        _, size = streaming.write_document(document_xml, output_file)
+
+            substitutions = sum(engine.substituted.values())
+            metrics.inc('contract_substitutions_total', substitutions)
+            metrics.inc('contract_missing_variables_total', len(engine.missing))
+            saved = self._record_output(streaming, size)
+            self._log_render_summary(output_filename, substitutions, sorted(engine.missing), engine.unused, {
+                'template_load': load.seconds,
+                'substitution': substitution.seconds,
+                'serialization': serialization.seconds
+            }, size, saved)
             
             return True
             
         except Exception as e:
-            logger.error(f"Erro ao preencher template: {str(e)}")
+            logger.error("Erro ao preencher template: %s", e)
+            return False
+    
+    def _fill_contract_stream(self, dados_template, output_filename, output=None, template=None):
+        """
+        Preenche o template escrevendo o ZIP diretamente, sem python-docx
+        """
+        metrics = self.metrics
+        detail_level = self._render_detail_level()
+        try:
+            with metrics.stage('template_load') as load:
+                streaming = (template or self.template_registry.get()).streaming()
+            # Substituição e escrita do ZIP acontecem na mesma passada
+            with metrics.stage('serialization') as serialization:
+                if output is not None:
+                    _, missing, size = streaming.render(dados_template, output)
+                else:
+                    with open(output_filename, 'wb') as output_file:
+                        _, missing, size = streaming.render(dados_template, output_file)
+            substitutions = streaming.slot_count - len(missing)
+            missing = sorted(set(missing))
+            metrics.inc('contract_substitutions_total', substitutions)
+            metrics.inc('contract_missing_variables_total', len(missing))
+
+            values = SubstitutionEngine(dados_template).values
+            if detail_level is not None:
+                for key in sorted(streaming.slots & values.keys()):
+                    logger.log(detail_level, "Substituído: '%s' → '%s'", key, values[key])
+            unused = [key for key in values if key not in streaming.slots]
+            saved = self._record_output(streaming, size)
+            self._log_render_summary(output_filename, substitutions, missing, unused, {
+                'template_load': load.seconds,
+                'serialization': serialization.seconds
+            }, size, saved)
+
+            return True
+
+        except Exception as e:
+            logger.error("Erro ao preencher template: %s", e)
             return False
     
-    def send_contract_via_webhook(self, contract_filename, nome_locatario):
+    def send_contract_via_webhook(self, contract, nome_locatario, filename=None, encoded=None, timeout=None):
         """
         Envia o contrato via webhook
+
+        contract: caminho do arquivo gerado ou os bytes do DOCX em memória
+        (nesse caso filename é o nome enviado no payload)
+        encoded: base64 já calculado, compartilhado com outros destinos
+        timeout: timeout de leitura em segundos (padrão: o do pool)
+
+        Retorna True/False; deliver_via_webhook levanta o motivo da falha
         """
         try:
-            # Lê e codifica o arquivo
-            with open(contract_filename, "rb") as docx_file:
-                encoded_string = base64.b64encode(docx_file.read()).decode('utf-8')
-            
-            headers = {
-                'Content-Type': 'application/json'
-            }
+            self.deliver_via_webhook(contract, nome_locatario, filename, encoded, timeout)
+            return True
+        except WebhookDeliveryError:
+            return False
+        except Exception as e:
+            logger.error(f"Erro inesperado ao enviar contrato: {str(e)}")
+            return False
+    
+    def deliver_via_webhook(self, contract, nome_locatario, filename=None, encoded=None, timeout=None):
+        """
+        Como send_contract_via_webhook, mas levanta WebhookDeliveryError com
+        o status HTTP ou o erro da requisição quando o envio falha
+        """
+        docx_file = None
+        try:
+            if isinstance(contract, (bytes, bytearray, memoryview)):
+                contract_filename = filename
+                from_disk = False
+                source = contract
+            else:
+                contract_filename = contract
+                from_disk = True
+                docx_file = open(contract_filename, "rb")
+                source = docx_file
             
-            payload = {
-                "filename": contract_filename,
-                "base64": encoded_string,
-                "locatario": nome_locatario,
-                "caption": f"Contrato Casa da Ana x {nome_locatario}",
-                "mimetype": "document/docx"
-            }
-
             logger.info(f"Enviando contrato via webhook para: {nome_locatario}")
-            response = requests.post(self.webhook_url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
+            inicio = time.perf_counter()
+            request = self._webhook_request(source, contract_filename, nome_locatario, encoded)
+            kwargs = {'timeout': (self.http_pool.timeout[0], timeout)} if timeout else {}
+            try:
+                response = self.http_pool.post(self.webhook_url, headers=request.headers, data=request.body, **kwargs)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                # A mensagem completa (com a URL do webhook) fica só no log
+                logger.error(f"Erro na requisição para o webhook: {str(e)}")
+                raise WebhookDeliveryError(request_error_reason(e))
+            finally:
+                self._record_webhook_request(request, time.perf_counter() - inicio)
             
             logger.info(f"Resposta do webhook - Status: {response.status_code}")
             
-            if response.status_code in [200, 201]:
-                logger.info("Contrato enviado com sucesso via webhook!")
-                # Remove o arquivo após envio bem-sucedido
-                try:
-                    os.remove(contract_filename)
-                    logger.info(f"Arquivo temporário {contract_filename} removido")
-                except Exception as e:
-                    logger.warning(f"Não foi possível remover arquivo temporário: {e}")
-                return True
-            else:
+            if response.status_code not in [200, 201]:
                 logger.error(f"Falha ao enviar contrato via webhook. Status: {response.status_code}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Erro na requisição para o webhook: {str(e)}")
-            return False
-        except Exception as e:
-            logger.error(f"Erro inesperado ao enviar contrato: {str(e)}")
+                raise WebhookDeliveryError(f"HTTP {response.status_code}")
+            
+            logger.info("Contrato enviado com sucesso via webhook!")
+            # Remove o arquivo após envio bem-sucedido
+            if from_disk:
+                with self.metrics.stage('cleanup'):
+                    docx_file.close()
+                    try:
+                        os.remove(contract_filename)
+                        logger.info(f"Arquivo temporário {contract_filename} removido")
+                    except Exception as e:
+                        logger.warning(f"Não foi possível remover arquivo temporário: {e}")
+        finally:
+            if docx_file is not None:
+                docx_file.close()
+    
+    def _webhook_request(self, source, contract_filename, nome_locatario, encoded=None):
+        """
+        Monta os headers e o corpo JSON do webhook a partir do DOCX
+
+        Com WEBHOOK_STREAMING o corpo é um iterável de pedaços, enviado com
+        Transfer-Encoding: chunked (só um pedaço do base64 em memória por
+        vez); sem ele, os bytes do corpo inteiro. Usado pelos modos WSGI e ASGI.
+        """
+        base64_field = Base64Field(source, self.webhook_chunk_size, encoded=encoded)
+        payload = {
+            "filename": contract_filename,
+            "base64": base64_field,
+            "locatario": nome_locatario,
+            "caption": f"Contrato Casa da Ana x {nome_locatario}",
+            "mimetype": "document/docx"
+        }
+        request = WebhookRequest({'Content-Type': 'application/json'}, iter_json_body(payload), base64_field)
+        if self.webhook_gzip:
+            request.headers['Content-Encoding'] = 'gzip'
+            request.body = request.gzip_body = GzipBody(request.body)
+        if not self.webhook_streaming:
+            request.body = b''.join(request.body)
+        return request
+    
+    def _record_webhook_request(self, request, seconds):
+        """
+        Registra os tempos de codificação e de HTTP de um envio
+        """
+        # A codificação é intercalada com o envio: desconta do tempo de HTTP
+        encode_seconds = request.encode_seconds
+        self.metrics.observe_stage('encode', encode_seconds)
+        self.metrics.observe_stage('http_delivery', seconds - encode_seconds)
+        gzip_body = request.gzip_body
+        if gzip_body is not None:
+            self.metrics.inc('webhook_body_bytes_saved_total', max(gzip_body.raw_size - gzip_body.size, 0))
+            logger.debug("Corpo do webhook comprimido: %d → %d bytes", gzip_body.raw_size, gzip_body.size)
+    
+    def warmup(self, template_ids='default'):
+        """
+        Deixa o serviço pronto para a primeira requisição
+
+        Compila os templates indicados (ids separados por vírgula ou '*') e
+        as estruturas do backend de renderização. Executado antes do fork dos
+        workers (preload_app), o resultado é compartilhado entre eles.
+        """
+        self._warmup_started = time.monotonic()
+        inicio = time.perf_counter()
+        try:
+            loaded = self.template_registry.warmup(template_ids)
+            if not loaded:
+                raise FileNotFoundError(f"Nenhum template pré-carregado ({template_ids or 'default'})")
+            for template_id in loaded:
+                compiled = self.template_registry.get(template_id)
+                # Os dois backends escrevem o ZIP pelo StreamingTemplate
+                compiled.streaming()
+                if self.render_backend == 'docx':
+                    # Primeira cópia do documento mestre monta as estruturas lazy do lxml
+                    compiled.new_document()
+        except (OSError, ValueError) as e:
+            self.warmup_error = str(e)
+            logger.error(f"Falha no aquecimento do serviço: {self.warmup_error}")
+            return None
+        self.warmup_error = None
+        self.warmup_result = {
+            'templates': loaded,
+            'render_backend': self.render_backend,
+            'seconds': round(time.perf_counter() - inicio, 4)
+        }
+        logger.info(f"Serviço aquecido em {self.warmup_result['seconds'] * 1000:.0f} ms: "
+                    f"templates {', '.join(loaded)} ({self.render_backend})")
+        return self.warmup_result
+
+    def retry_warmup(self, template_ids='default'):
+        """
+        Refaz o aquecimento que falhou, em segundo plano
+
+        Chamado a cada GET /ready: probes frequentes não recompilam o
+        template a cada chamada nem prendem a requisição. Retorna True se
+        uma nova tentativa foi iniciada.
+        """
+        if self.warmup_result is not None:
             return False
+        with self._warmup_lock:
+            if self._warmup_thread is not None and self._warmup_thread.is_alive():
+                return False
+            if (self._warmup_started is not None
+                    and time.monotonic() - self._warmup_started < self.warmup_retry_interval):
+                return False
+            self._warmup_started = time.monotonic()
+            self._warmup_thread = threading.Thread(
+                target=self.warmup, args=(template_ids,), name='warmup-retry', daemon=True
+            )
+            self._warmup_thread.start()
+        return True
+
+    def readiness(self):
+        """
+        Estado de prontidão: aquecido e com o template padrão disponível
+        """
+        if self.warmup_result is None:
+            return False, {'status': 'starting', 'error': self.warmup_error}
+        try:
+            # Só um stat enquanto o arquivo não mudar
+            self.template_cache.get()
+        except OSError as e:
+            return False, {'status': 'unavailable', 'error': str(e)}
+        return True, {'status': 'ready', 'pid': os.getpid(), **self.warmup_result}
+
+    def start_background_workers(self):
+        """
+        Garante as threads de segundo plano neste processo (seguro após fork)
+        """
+        if self.retry_spool is not None:
+            self.retry_spool.start()
+        if self.archive is not None:
+            self.archive.start()
+    
+    def _deliver_or_spool(self, contract_filename, contract_bytes, nome_locatario):
+        """
+        Entrega o contrato a todos os destinos; se o principal falhar e o
+        spool estiver habilitado, agenda o reenvio para ele
+
+        Retorna (status, resultados por destino); status é 'delivered',
+        'spooled' ou 'failed', decidido pelo destino principal
+        """
+        payload = self.delivery.payload(contract_filename, contract_bytes, nome_locatario)
+        pending = self.delivery.dispatch(payload)
+        if self._circuit_open():
+            # Destino principal fora do ar: nem tenta, vai direto para o spool
+            primary = SinkResult(self.delivery.primary.name, False, error='Circuito aberto')
+            status = self._delivery_result(contract_filename, contract_bytes, nome_locatario, None)
+        else:
+            primary = self.delivery.primary.send(payload)
+            status = self._delivery_result(contract_filename, contract_bytes, nome_locatario, primary.success,
+                                           primary.error)
+        return status, self._sink_results(payload, [primary] + self.delivery.collect(pending))
+    
+    def _redeliver(self, contract_filename, contract_bytes, nome_locatario):
+        """
+        Reenvio do spool ao destino principal; a falha vira exceção para o
+        spool guardar o motivo em last_error
+        """
+        result = self.delivery.primary.send(self.delivery.payload(contract_filename, contract_bytes, nome_locatario))
+        if not result.success:
+            raise WebhookDeliveryError(result.error)
+        return True
+    
+    def _sink_results(self, payload, results):
+        """
+        Registra os resultados por destino; retorna a lista para a resposta
+        """
+        if payload.encode_seconds:
+            self.metrics.observe_stage('encode', payload.encode_seconds)
+        for result in results:
+            self.metrics.inc('contract_sink_deliveries_total', sink=result.sink,
+                             result='delivered' if result.success else 'failed')
+        return [result.to_dict() for result in results]
+    
+    def _circuit_open(self):
+        spool = self.retry_spool
+        return spool is not None and not spool.breaker.allow()
+    
+    def _delivery_result(self, contract_filename, contract_bytes, nome_locatario, success, error=None):
+        """
+        Atualiza o circuit breaker e o spool com o resultado de um envio
+
+        success None indica que o envio nem foi tentado (circuito aberto);
+        error é o motivo da falha, guardado no spool. Retorna 'delivered',
+        'spooled' ou 'failed'
+        """
+        spool = self.retry_spool
+        if success is None:
+            spool.add(contract_filename, contract_bytes, nome_locatario, error='Circuito do webhook aberto')
+            status = 'spooled'
+        elif spool is None:
+            status = 'delivered' if success else 'failed'
+        elif success:
+            spool.breaker.record_success()
+            status = 'delivered'
+        else:
+            spool.breaker.record_failure()
+            spool.add(contract_filename, contract_bytes, nome_locatario, error=error or 'Erro ao enviar contrato')
+            status = 'spooled'
+        
+        self.metrics.inc('contract_deliveries_total', result=status)
+        return status
+    
+    def _render_for_delivery(self, dados_locatario):
+        """
+        Gera o contrato em memória e arquiva uma cópia se habilitado
+        """
+        contract_filename, contract_bytes = self.render_executor.render(dados_locatario)
+        self._archive_if_enabled(contract_filename, contract_bytes, dados_locatario)
+        return contract_filename, contract_bytes
+    
+    def render_for_download(self, dados_locatario):
+        """
+        Gera o contrato para download direto, sem entrega nem base64
+
+        Retorna (id, nome do arquivo, bytes); o contrato fica disponível em
+        GET /contracts/<id>. Levanta ValueError para dados inválidos e
+        AdmissionRejected se não houver vaga de renderização
+        """
+        with self.admission.renders.slot():
+            contract_filename, contract_bytes = self._render_for_delivery(dados_locatario)
+        return self.rendered_store.put(contract_filename, contract_bytes), contract_filename, contract_bytes
+    
+    def _archive_if_enabled(self, contract_filename, contract_bytes, dados_locatario=None):
+        # Arquiva já na renderização, com os metadados; o destino 'archive',
+        # se configurado, encontra o objeto pronto e só confirma a entrega
+        if self.archive is not None:
+            try:
+                self._archive_contract(contract_filename, contract_bytes, dados_locatario)
+            except Exception as e:
+                # Falha no arquivo não impede a entrega
+                logger.warning(f"Não foi possível arquivar o contrato: {e}")
+    
+    def resend_archived(self, object_id):
+        """
+        Reenvia um contrato arquivado a todos os destinos, sem renderizar de novo
+
+        Os bytes vêm do arquivo; objetos grandes são entregues direto do mmap,
+        sem cópia. Retorna o resultado como process_contract, ou None se o id
+        não estiver arquivado
+        """
+        if self.archive is None:
+            return None
+        entry = self.archive.get(object_id)
+        contract = self.archive.read(object_id) if entry is not None else None
+        if contract is None:
+            return None
+        # O mmap é fechado pelo coletor quando a última fatia em uso é liberada
+        with self.admission.deliveries.slot():
+            status, deliveries = self._deliver_or_spool(entry['filename'], memoryview(contract), entry['locatario'])
+        self.metrics.inc('contract_archive_resends_total', result=status)
+        return dict(self._contract_result(status, entry['filename'], deliveries), id=object_id)
     
-    def process_contract(self, dados_locatario):
+    def _idempotency_key(self, escopo, dados_locatario, idempotency_key=None):
+        """
+        Chave do cache: Idempotency-Key do cliente ou hash do conteúdo dos dados
+
+        O hash é do registro normalizado: 7 e "7", "R$ 2.100,00" e "2100" são
+        o mesmo contrato. Dados inválidos usam o hash bruto (o erro não é
+        guardado como final). Retorna (chave, fingerprint esperado para a
+        chave do cliente)
+        """
+        try:
+            conteudo = fingerprint(self.normalize_contract_data(dados_locatario))
+        except ValueError:
+            conteudo = fingerprint(dados_locatario)
+        if idempotency_key:
+            return f"{escopo}:key:{idempotency_key}", conteudo
+        return f"{escopo}:hash:{conteudo}", None
+    
+    def _run_idempotent(self, escopo, dados_locatario, idempotency_key, executar):
+        """
+        Executa uma vez por chave; repetições recebem o resultado guardado
+        """
+        chave, conteudo = self._idempotency_key(escopo, dados_locatario, idempotency_key)
+        (resultado, _), replayed = self.idempotency_cache.run(chave, executar, conteudo)
+        if replayed:
+            logger.info(f"Requisição repetida, resultado reaproveitado: {dados_locatario.get('nome_do_locatario')}")
+            resultado = dict(resultado, replayed=True)
+        return resultado
+    
+    def process_contract(self, dados_locatario, idempotency_key=None):
         """
         Processo completo: gera e envia o contrato
+
+        Com o cache de idempotência habilitado, a mesma requisição (mesma
+        Idempotency-Key ou mesmos dados) não é gerada nem enviada de novo: o
+        resultado guardado é devolvido, e duplicatas simultâneas esperam a
+        primeira. Se o envio anterior falhou, os bytes guardados são reenviados
+        sem nova renderização.
+
+        Levanta AdmissionRejected se os limites de admissão estiverem esgotados
+        """
+        if self.idempotency_cache is None or not isinstance(dados_locatario, dict):
+            resultado, _ = self._process_contract(dados_locatario)
+            return resultado
+        
+        def executar(anterior):
+            resultado, rendered = self._process_contract(dados_locatario, anterior[1] if anterior else None)
+            final = resultado['success'] or resultado.get('spooled', False)
+            return (resultado, rendered), final
+        
+        return self._run_idempotent('sync', dados_locatario, idempotency_key, executar)
+    
+    def _process_contract(self, dados_locatario, rendered=None):
+        """
+        Gera (ou reaproveita) e envia o contrato
+
+        Retorna (resultado, (nome do arquivo, bytes) ou None)
+        """
+        # A vaga vale até a resposta do webhook: é quando o DOCX e o base64
+        # deixam a memória
+        with self.admission.deliveries.slot():
+            try:
+                if rendered is None:
+                    with self.admission.renders.slot():
+                        rendered = self._render_for_delivery(dados_locatario)
+                contract_filename, contract_bytes = rendered
+                
+                # Envia via webhook
+                status, deliveries = self._deliver_or_spool(
+                    contract_filename, contract_bytes, dados_locatario['nome_do_locatario']
+                )
+                return self._contract_result(status, contract_filename, deliveries), rendered
+                
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                return self._contract_error(e), None
+    
+    def _contract_result(self, status, contract_filename, deliveries=None):
+        """
+        Resultado de process_contract para o status da entrega
+
+        deliveries: resultado de cada destino de entrega
+        """
+        if status == 'spooled':
+            return {
+                'success': False,
+                'spooled': True,
+                'filename': contract_filename,
+                'message': 'Contrato gerado; envio falhou e será tentado novamente',
+                'deliveries': deliveries
+            }
+        
+        success = status == 'delivered'
+        return {
+            'success': success,
+            'filename': contract_filename if success else None,
+            'message': 'Contrato gerado e enviado com sucesso!' if success else 'Erro ao enviar contrato',
+            'deliveries': deliveries
+        }
+    
+    def _contract_error(self, error):
+        logger.error(f"Erro no processamento do contrato: {str(error)}")
+        return {
+            'success': False,
+            'filename': None,
+            'message': f'Erro: {str(error)}'
+        }
+    
+    @property
+    def delivery_queue(self):
         """
+        Fila de entregas em segundo plano, criada na primeira utilização
+        """
+        if self._delivery_queue is None:
+            with self._delivery_queue_lock:
+                if self._delivery_queue is None:
+                    self._delivery_queue = DeliveryQueue(
+                        self._deliver_job,
+                        workers=int(os.getenv('DELIVERY_WORKERS', 2)),
+                        maxsize=int(os.getenv('DELIVERY_QUEUE_SIZE', 100))
+                    )
+        return self._delivery_queue
+    
+    def _deliver_job(self, job):
+        status, job.deliveries = self._deliver_or_spool(job.filename, job.contract_bytes, job.locatario)
+        return status
+    
+    def process_contract_async(self, dados_locatario, idempotency_key=None):
+        """
+        Gera o contrato e enfileira o envio, sem aguardar o webhook
+
+        Levanta DeliveryQueueFull se a fila de entregas estiver cheia e
+        AdmissionRejected se não houver vaga de renderização
+        """
+        if self.idempotency_cache is None or not isinstance(dados_locatario, dict):
+            return self._process_contract_async(dados_locatario)
+        
+        def executar(anterior):
+            resultado = self._process_contract_async(dados_locatario)
+            return (resultado, None), resultado['success']
+        
+        return self._run_idempotent('async', dados_locatario, idempotency_key, executar)
+    
+    def _process_contract_async(self, dados_locatario):
         try:
-            # Gera o contrato
-            contract_filename = self.generate_contract(dados_locatario)
+            with self.admission.renders.slot():
+                contract_filename, contract_bytes = self._render_for_delivery(dados_locatario)
             
-            # Envia via webhook
-            success = self.send_contract_via_webhook(contract_filename, dados_locatario['nome_do_locatario'])
+            job = self.delivery_queue.submit(contract_filename, contract_bytes, dados_locatario['nome_do_locatario'])
             
             return {
-                'success': success,
-                'filename': contract_filename if success else None,
-                'message': 'Contrato gerado e enviado com sucesso!' if success else 'Erro ao enviar contrato'
+                'success': True,
+                'job_id': job.id,
+                'filename': contract_filename,
+                'message': 'Contrato gerado, envio em andamento'
             }
             
+        except (DeliveryQueueFull, AdmissionRejected):
+            raise
         except Exception as e:
             logger.error(f"Erro no processamento do contrato: {str(e)}")
             return {
                 'success': False,
+                'job_id': None,
                 'filename': None,
                 'message': f'Erro: {str(e)}'
-            } 
+            }
+    
+    def validate_batch(self, registros):
+        """
+        Valida todos os registros de um lote antes de gerar qualquer contrato
+
+        Retorna a lista de erros [{'index': i, 'error': mensagem}] (vazia se ok)
+        """
+        return self.normalize_batch(registros)[1]
+    
+    def normalize_batch(self, registros):
+        """
+        Normaliza e valida um lote inteiro, campo por campo
+
+        Retorna (registros normalizados, com None nos inválidos, e a lista de
+        erros); os registros normalizados não são convertidos de novo na
+        renderização
+        """
+        normalizados, erros = normalize_records(registros)
+        for index, dados in enumerate(normalizados):
+            if dados is None:
+                continue
+            try:
+                self._check_required(dados)
+            except ValueError as e:
+                normalizados[index] = None
+                erros.append({'index': index, 'error': str(e)})
+        erros.sort(key=lambda erro: erro['index'])
+        return normalizados, erros
+    
+    def process_batch(self, registros, render_workers=4, delivery_workers=4):
+        """
+        Gera e envia um lote de contratos, produzindo um resultado por item
+
+        A renderização roda em paralelo contra o mesmo template em cache e o
+        envio tem concorrência limitada. No máximo render_workers +
+        delivery_workers contratos ficam em memória ao mesmo tempo; os
+        resultados saem na ordem em que terminam (use 'index' para casar).
+        """
+        window = render_workers + delivery_workers
+        registros = iter(enumerate(registros))
+        in_flight = {}
+        
+        with ThreadPoolExecutor(render_workers, thread_name_prefix='batch-render') as renders, \
+                ThreadPoolExecutor(delivery_workers, thread_name_prefix='batch-delivery') as deliveries:
+            
+            def fill():
+                while len(in_flight) < window:
+                    try:
+                        index, dados = next(registros)
+                    except StopIteration:
+                        return
+                    future = renders.submit(self._render_for_delivery, dados)
+                    in_flight[future] = ('render', index, dados, None)
+            
+            fill()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    etapa, index, dados, contract_filename = in_flight.pop(future)
+                    nome = dados['nome_do_locatario']
+                    
+                    if etapa == 'render':
+                        try:
+                            contract_filename, contract_bytes = future.result()
+                        except Exception as e:
+                            logger.error(f"Erro ao gerar contrato {index} do lote: {str(e)}")
+                            yield {
+                                'index': index,
+                                'locatario': nome,
+                                'success': False,
+                                'status': 'failed',
+                                'filename': None,
+                                'message': f'Erro: {str(e)}'
+                            }
+                            continue
+                        delivery = deliveries.submit(self._deliver_or_spool, contract_filename, contract_bytes, nome)
+                        in_flight[delivery] = ('deliver', index, dados, contract_filename)
+                        continue
+                    
+                    try:
+                        status, sink_results = future.result()
+                    except Exception as e:
+                        logger.error(f"Erro ao enviar contrato {index} do lote: {str(e)}")
+                        status, sink_results = 'failed', None
+                    yield {
+                        'index': index,
+                        'locatario': nome,
+                        'success': status == 'delivered',
+                        'status': status,
+                        'filename': contract_filename if status != 'failed' else None,
+                        'message': {
+                            'delivered': 'Contrato gerado e enviado com sucesso!',
+                            'spooled': 'Contrato gerado; envio falhou e será tentado novamente',
+                        }.get(status, 'Erro ao enviar contrato'),
+                        'deliveries': sink_results
+                    }
+                fill()
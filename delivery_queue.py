@@ -0,0 +1,142 @@
+import os
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryQueueFull(Exception):
+    """
+    Fila de entregas cheia: o cliente deve tentar novamente mais tarde
+    """
+
+
+class DeliveryJob:
+    """
+    Entrega de um contrato já renderizado aguardando envio
+    """
+
+    def __init__(self, filename, contract_bytes, locatario):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.contract_bytes = contract_bytes
+        self.locatario = locatario
+        self.status = 'queued'
+        self.error = None
+        # Resultado de cada destino de entrega, preenchido após o envio
+        self.deliveries = None
+        self.created_at = datetime.now().isoformat(timespec='seconds')
+        self.updated_at = self.created_at
+
+    def _set_status(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.updated_at = datetime.now().isoformat(timespec='seconds')
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'locatario': self.locatario,
+            'error': self.error,
+            'deliveries': self.deliveries,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+
+class DeliveryQueue:
+    """
+    Fila limitada de entregas drenada por um pool de threads
+
+    As threads são criadas no primeiro envio, portanto depois do fork dos
+    workers do gunicorn. O status dos jobs fica em memória no worker que os
+    recebeu; os jobs concluídos mais antigos são descartados acima de max_jobs.
+    """
+
+    def __init__(self, deliver, workers=2, maxsize=100, max_jobs=1000):
+        # deliver(job) -> bool, ou o status final ('delivered', 'spooled', 'failed')
+        self._deliver = deliver
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def _ensure_workers(self):
+        # Threads herdadas de um fork (preload_app) não existem no filho
+        if self._threads and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            self._threads = []
+            self._pid = os.getpid()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"delivery-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, filename, contract_bytes, locatario):
+        """
+        Enfileira a entrega e retorna o job; levanta DeliveryQueueFull se lotada
+        """
+        self._ensure_workers()
+        job = DeliveryJob(filename, contract_bytes, locatario)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise DeliveryQueueFull("Fila de entregas cheia, tente novamente em instantes")
+        logger.info(f"Entrega {job.id} enfileirada para: {locatario}")
+        return job
+
+    def get(self, job_id):
+        """
+        Retorna o job pelo id (ou None se desconhecido/expirado)
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _evict(self):
+        # Descarta os jobs finalizados mais antigos acima do limite
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.status in ('delivered', 'spooled', 'failed')][:excess]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job._set_status('sending')
+                result = self._deliver(job)
+                if result is True or result == 'delivered':
+                    job._set_status('delivered')
+                elif result == 'spooled':
+                    job._set_status('spooled', 'Erro ao enviar contrato; nova tentativa agendada')
+                else:
+                    job._set_status('failed', 'Erro ao enviar contrato')
+            except Exception as e:
+                logger.error(f"Erro inesperado na entrega {job.id}: {str(e)}")
+                job._set_status('failed', str(e))
+            finally:
+                # O documento não é mais necessário depois da tentativa
+                job.contract_bytes = None
+                self._queue.task_done()
@@ -0,0 +1,353 @@
+import os
+import time
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import requests
+from streaming_payload import Base64Field, iter_json_body
+from http_pool import request_error_reason
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Destinos que levam o contrato em base64 no corpo JSON
+ENCODING_SINKS = ('webhook', 'evolution')
+
+
+class DeliveryPayload:
+    """
+    Contrato renderizado uma vez e entregue a todos os destinos
+
+    Com mais de um destino que usa base64, a codificação é feita uma única
+    vez (encoded) e cada destino só fatia o mesmo buffer; com um só, o
+    destino codifica em pedaços durante o envio, como antes.
+    """
+
+    def __init__(self, filename, contract_bytes, locatario, shared_encoding=False):
+        self.filename = filename
+        self.contract_bytes = contract_bytes
+        self.locatario = locatario
+        self.shared_encoding = shared_encoding
+        self.encode_seconds = 0.0
+        self._encoded = None
+        self._lock = threading.Lock()
+
+    @property
+    def caption(self):
+        return f"Contrato Casa da Ana x {self.locatario}"
+
+    def encoded(self):
+        """
+        Base64 do contrato, calculado na primeira chamada
+        """
+        with self._lock:
+            if self._encoded is None:
+                inicio = time.perf_counter()
+                self._encoded = base64.b64encode(self.contract_bytes)
+                self.encode_seconds = time.perf_counter() - inicio
+            return self._encoded
+
+    def base64_field(self, chunk_size):
+        """
+        Campo base64 para iter_json_body: fatia o buffer compartilhado ou codifica em fluxo
+        """
+        if self.shared_encoding:
+            return Base64Field(self.contract_bytes, chunk_size, encoded=self.encoded())
+        return Base64Field(self.contract_bytes, chunk_size)
+
+
+class SinkResult:
+    """
+    Resultado da entrega a um destino
+    """
+    __slots__ = ('sink', 'success', 'attempts', 'seconds', 'error')
+
+    def __init__(self, sink, success, attempts=0, seconds=0.0, error=None):
+        self.sink = sink
+        self.success = success
+        self.attempts = attempts
+        self.seconds = seconds
+        self.error = error
+
+    def to_dict(self):
+        return {
+            'sink': self.sink,
+            'success': self.success,
+            'attempts': self.attempts,
+            'seconds': round(self.seconds, 4),
+            'error': self.error
+        }
+
+
+class DeliverySink:
+    """
+    Destino de entrega com timeout e política de nova tentativa próprios
+
+    Subclasses implementam deliver(payload), que retorna True em caso de
+    sucesso e False ou uma exceção em caso de falha. send() faz até
+    1 + retries tentativas, com espera de backoff * 2^n entre elas.
+    deadline limita a espera pelo destino secundário como um todo: o
+    timeout de leitura vale por leitura do socket, e um servidor que manda
+    bytes aos poucos não o dispara.
+    """
+    kind = None
+
+    def __init__(self, name=None, timeout=None, retries=0, backoff=0.5, deadline=None):
+        self.name = name or self.kind
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+
+    def deliver(self, payload):
+        raise NotImplementedError
+
+    def send(self, payload):
+        """
+        Entrega com novas tentativas; nunca levanta exceção
+        """
+        inicio = time.perf_counter()
+        erro = None
+        for tentativa in range(1, self.retries + 2):
+            try:
+                if self.deliver(payload):
+                    return SinkResult(self.name, True, tentativa, time.perf_counter() - inicio)
+                erro = 'Entrega recusada pelo destino'
+            except Exception as e:
+                erro = str(e) or type(e).__name__
+            logger.warning(f"Falha na entrega para {self.name} (tentativa {tentativa}): {erro}")
+            if tentativa <= self.retries:
+                time.sleep(self.backoff * 2 ** (tentativa - 1))
+        return SinkResult(self.name, False, self.retries + 1, time.perf_counter() - inicio, erro)
+
+    def stats(self):
+        return {
+            'kind': self.kind,
+            'timeout': self.timeout,
+            'retries': self.retries,
+            'deadline': self.deadline
+        }
+
+
+class WebhookSink(DeliverySink):
+    """
+    WEBHOOK_URL, pelo send_contract_via_webhook do serviço (pool, streaming, gzip)
+    """
+    kind = 'webhook'
+
+    def __init__(self, service, **kwargs):
+        super().__init__(**kwargs)
+        self.service = service
+
+    def deliver(self, payload):
+        # Levanta WebhookDeliveryError com o status HTTP ou o erro de conexão
+        self.service.deliver_via_webhook(
+            payload.contract_bytes, payload.locatario, filename=payload.filename,
+            encoded=payload.encoded() if payload.shared_encoding else None,
+            timeout=self.timeout
+        )
+        return True
+
+
+class EvolutionSink(DeliverySink):
+    """
+    WhatsApp do proprietário pelo endpoint sendMedia da Evolution API
+    """
+    kind = 'evolution'
+
+    def __init__(self, url, api_key, number, http_pool, streaming=True, chunk_size=None, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.api_key = api_key
+        self.number = number
+        self.http_pool = http_pool
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+
+    def deliver(self, payload):
+        body = iter_json_body({
+            'number': self.number,
+            'mediatype': 'document',
+            'mimetype': 'document/docx',
+            'fileName': payload.filename,
+            'media': payload.base64_field(self.chunk_size),
+            'caption': payload.caption
+        })
+        if not self.streaming:
+            body = b''.join(body)
+        kwargs = {}
+        if self.timeout:
+            kwargs['timeout'] = (self.http_pool.timeout[0], self.timeout)
+        try:
+            response = self.http_pool.post(
+                self.url,
+                headers={'Content-Type': 'application/json', 'apikey': self.api_key},
+                data=body,
+                **kwargs
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Erro na requisição para a Evolution API: {e}")
+            raise RuntimeError(request_error_reason(e))
+        return response.status_code in (200, 201)
+
+    def stats(self):
+        return dict(super().stats(), number_configured=bool(self.number))
+
+
+class ArchiveSink(DeliverySink):
+    """
+    Contrato no arquivo de CONTRACT_ARCHIVE_DIR (deduplicado pelo conteúdo)
+    """
+    kind = 'archive'
+
+    def __init__(self, service, **kwargs):
+        super().__init__(**kwargs)
+        self.service = service
+
+    def deliver(self, payload):
+        self.service.archive.put(payload.filename, payload.contract_bytes, locatario=payload.locatario)
+        return True
+
+
+def create_sink(name, service):
+    """
+    Cria um destino pelo nome, com SINK_<NOME>_TIMEOUT, _RETRIES e _BACKOFF
+    """
+    prefix = f"SINK_{name.upper()}_"
+    options = {
+        'timeout': float(os.getenv(prefix + 'TIMEOUT', 0)) or None,
+        'retries': int(os.getenv(prefix + 'RETRIES', 0 if name == 'webhook' else 2)),
+        'backoff': float(os.getenv(prefix + 'BACKOFF', 0.5))
+    }
+    # Padrão: todas as tentativas com os timeouts de conexão e leitura, mais as esperas
+    connect_timeout, read_timeout = service.http_pool.timeout
+    options['deadline'] = float(os.getenv(prefix + 'DEADLINE', 0)) or (
+        (connect_timeout + (options['timeout'] or read_timeout)) * (options['retries'] + 1)
+        + options['backoff'] * (2 ** options['retries'] - 1)
+    )
+    if name == 'webhook':
+        return WebhookSink(service, **options)
+    if name == 'evolution':
+        url = os.getenv('EVOLUTION_SEND_MEDIA_URL')
+        api_key = os.getenv('EVOLUTION_API_KEY')
+        number = os.getenv('EVOLUTION_NUMBER')
+        if not (url and api_key and number):
+            raise ValueError("Destino 'evolution' requer EVOLUTION_SEND_MEDIA_URL, EVOLUTION_API_KEY e EVOLUTION_NUMBER")
+        return EvolutionSink(
+            url, api_key, number, service.http_pool,
+            streaming=service.webhook_streaming, chunk_size=service.webhook_chunk_size, **options
+        )
+    if name == 'archive':
+        if service.archive is None:
+            raise ValueError("Destino 'archive' requer CONTRACT_ARCHIVE_DIR")
+        return ArchiveSink(service, **options)
+    raise ValueError(f"Destino de entrega inválido: '{name}' (opções: webhook, evolution, archive)")
+
+
+class PendingDelivery:
+    """
+    Entrega em andamento a um destino secundário, com o prazo dele
+    """
+    __slots__ = ('sink', 'future', 'started', 'deadline')
+
+    def __init__(self, sink, future):
+        self.sink = sink
+        self.future = future
+        self.started = time.monotonic()
+        self.deadline = self.started + sink.deadline if sink.deadline else None
+
+    def remaining(self):
+        # None: sem prazo
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
+    def timed_out(self):
+        """
+        Resultado de falha para o destino que passou do prazo
+        """
+        self.future.cancel()
+        logger.warning(f"Entrega para {self.sink.name} excedeu o prazo de {self.sink.deadline}s")
+        return SinkResult(self.sink.name, False, seconds=time.monotonic() - self.started, error='timeout')
+
+
+class DeliveryFanout:
+    """
+    Entrega cada contrato a N destinos configurados (DELIVERY_SINKS)
+
+    O primeiro destino é o principal: o resultado dele decide o status do
+    contrato e é o que vai para o spool de reenvio. Os demais recebem o
+    mesmo payload em paralelo, cada um com timeout e novas tentativas
+    próprios, e o resultado de todos volta na resposta.
+    """
+
+    def __init__(self, sinks, max_workers=8):
+        if not sinks:
+            raise ValueError("DELIVERY_SINKS precisa de ao menos um destino")
+        self.sinks = sinks
+        self.primary = sinks[0]
+        self.secondary = sinks[1:]
+        self.max_workers = max_workers
+        # Codifica uma vez só quando mais de um destino usa o base64
+        self.shared_encoding = sum(sink.kind in ENCODING_SINKS for sink in sinks) > 1
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, service):
+        """
+        Cria os destinos a partir de DELIVERY_SINKS (padrão: webhook)
+        """
+        names = [name.strip().lower() for name in os.getenv('DELIVERY_SINKS', 'webhook').split(',') if name.strip()]
+        return cls(
+            [create_sink(name, service) for name in names],
+            max_workers=int(os.getenv('DELIVERY_SINK_WORKERS', 8))
+        )
+
+    def has_sink(self, kind):
+        return any(sink.kind == kind for sink in self.sinks)
+
+    def payload(self, filename, contract_bytes, locatario):
+        return DeliveryPayload(filename, contract_bytes, locatario, self.shared_encoding)
+
+    def _get_executor(self):
+        # Threads herdadas de um fork (preload_app) não existem no filho
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='delivery-sink')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def dispatch(self, payload):
+        """
+        Inicia a entrega aos destinos secundários; retorna as PendingDelivery
+        """
+        if not self.secondary:
+            return []
+        executor = self._get_executor()
+        return [PendingDelivery(sink, executor.submit(sink.send, payload)) for sink in self.secondary]
+
+    def collect(self, pending):
+        """
+        Espera os destinos secundários, cada um até o próprio deadline
+
+        O destino que passa do prazo vira um resultado de falha ('timeout');
+        a thread dele termina sozinha quando o socket desistir.
+        """
+        results = []
+        for delivery in pending:
+            try:
+                results.append(delivery.future.result(timeout=delivery.remaining()))
+            except FutureTimeoutError:
+                results.append(delivery.timed_out())
+        return results
+
+    def stats(self):
+        return {
+            'primary': self.primary.name,
+            'shared_encoding': self.shared_encoding,
+            'sinks': {sink.name: sink.stats() for sink in self.sinks}
+        }
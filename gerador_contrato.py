@@ -1,5 +1,8 @@
 import os
 import base64
+import struct
+import zipfile
+from datetime import date
 import requests # Adicionado para chamadas de API
 from docx import Document
 from docx.shared import Pt
@@ -105,6 +108,282 @@ def enviar_contrato_por_api(caminho_arquivo_docx, nome_locatario, nome_arquivo_g
         print(f"Erro inesperado ao enviar contrato via API: {e}")
         return False
 
+COLUNAS_DELIMITADORES = ',;\t'
+
+
+def _valor_celula(valor):
+    """
+    Valor de uma célula XLSX como a normalização espera
+
+    Datas e números seguem como estão (parse_date, parse_nights e parse_brl
+    os aceitam); números inteiros gravados como float (7.0) viram int. Um
+    float não vira texto: str(2.125) seria lido como R$ 2.125,00
+    """
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, (date, int, float)) and not isinstance(valor, bool):
+        return valor
+    return str(valor)
+
+
+def ler_registros(caminho):
+    """
+    Lê os locatários de um CSV, JSONL ou XLSX, um registro por vez
+
+    Gera (número da linha, dicionário de campos); as colunas/chaves são os
+    nomes dos campos da API (nome_do_locatario, estado_civil, ...)
+    """
+    import csv
+    import json
+
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao in ('.jsonl', '.ndjson'):
+        with open(caminho, encoding='utf-8') as arquivo:
+            for linha, texto in enumerate(arquivo, 1):
+                if texto.strip():
+                    yield linha, json.loads(texto)
+    elif extensao == '.xlsx':
+        try:
+            import openpyxl
+        except ImportError:
+            raise SystemExit("Leitura de XLSX requer o pacote openpyxl (pip install openpyxl) "
+                             "ou exporte a planilha como CSV")
+        planilha = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+        linhas = planilha.active.iter_rows(values_only=True)
+        cabecalho = [str(coluna).strip() if coluna is not None else '' for coluna in next(linhas)]
+        for linha, valores in enumerate(linhas, 2):
+            if any(valor is not None for valor in valores):
+                yield linha, {coluna: _valor_celula(valor)
+                              for coluna, valor in zip(cabecalho, valores) if coluna}
+        planilha.close()
+    else:
+        # utf-8-sig: CSV exportado pelo Excel começa com BOM; ';' é comum em planilhas brasileiras
+        with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+            amostra = arquivo.read(4096)
+            arquivo.seek(0)
+            try:
+                dialeto = csv.Sniffer().sniff(amostra, delimiters=COLUNAS_DELIMITADORES)
+            except csv.Error:
+                dialeto = csv.excel
+            for linha, registro in enumerate(csv.DictReader(arquivo, dialect=dialeto), 2):
+                yield linha, {coluna.strip(): (valor or '').strip() for coluna, valor in registro.items() if coluna}
+
+
+def chave_registro(linha, registro):
+    """
+    Identifica o registro para a retomada: linha + hash do conteúdo
+    """
+    import json
+    import hashlib
+
+    conteudo = json.dumps(registro, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{linha}:{hashlib.sha1(conteudo.encode('utf-8')).hexdigest()[:16]}"
+
+
+class SaidaLote:
+    """
+    Destino dos contratos do lote (diretório ou ZIP) com registro de progresso
+
+    O progresso fica em um arquivo ao lado da saída com uma linha
+    "chave<TAB>arquivo" por contrato gravado; ao retomar, os registros já
+    presentes na saída são pulados.
+    """
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.zip = destino.lower().endswith('.zip')
+        self.progresso_path = (destino + '.progresso' if self.zip
+                               else os.path.join(destino, '.lote_progresso'))
+        self.bytes_gravados = 0
+
+        if self.zip:
+            pasta = os.path.dirname(os.path.abspath(destino))
+            os.makedirs(pasta, exist_ok=True)
+            existentes = set()
+            if os.path.exists(destino):
+                if self._zip_fechado(destino):
+                    with zipfile.ZipFile(destino) as arquivo_zip:
+                        existentes = set(arquivo_zip.namelist())
+                else:
+                    # Interrompido sem fechar o ZIP: recomeça do zero
+                    os.replace(destino, destino + '.corrompido')
+                    print(f"⚠️  ZIP incompleto movido para {destino}.corrompido; o lote será refeito")
+            self._zip = zipfile.ZipFile(destino, 'a' if existentes else 'w', zipfile.ZIP_STORED)
+        else:
+            os.makedirs(destino, exist_ok=True)
+            existentes = None
+
+        self.concluidos = {}
+        if os.path.exists(self.progresso_path):
+            with open(self.progresso_path, encoding='utf-8') as progresso:
+                for texto in progresso:
+                    chave, _, nome = texto.rstrip('\n').partition('\t')
+                    presente = (nome in existentes if self.zip
+                                else os.path.exists(os.path.join(destino, nome)))
+                    if presente:
+                        self.concluidos[chave] = nome
+        self._progresso = open(self.progresso_path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def _zip_fechado(caminho):
+        """
+        Indica se o ZIP termina no registro de fim de diretório
+
+        Não basta o zipfile abrir: os DOCX armazenados sem compressão também
+        são ZIPs, e em um arquivo truncado o zipfile encontraria o fim de
+        diretório de um deles.
+        """
+        with open(caminho, 'rb') as arquivo:
+            arquivo.seek(0, os.SEEK_END)
+            tamanho = arquivo.tell()
+            if tamanho < zipfile.sizeEndCentDir:
+                return False
+            fim = tamanho - zipfile.sizeEndCentDir
+            arquivo.seek(fim)
+            registro = struct.unpack(zipfile.structEndArchive, arquivo.read(zipfile.sizeEndCentDir))
+            if registro[zipfile._ECD_SIGNATURE] != zipfile.stringEndArchive:
+                return False
+            offset, tamanho_diretorio = registro[zipfile._ECD_OFFSET], registro[zipfile._ECD_SIZE]
+            if offset == 0xFFFFFFFF:
+                # ZIP64: o localizador fica logo antes do fim de diretório
+                arquivo.seek(fim - zipfile.sizeEndCentDir64Locator)
+                return arquivo.read(4) == zipfile.stringEndArchive64Locator
+            # O fim de diretório de um DOCX interno aponta para outro lugar
+            return offset + tamanho_diretorio == fim
+
+    def gravar(self, chave, nome, conteudo):
+        if self.zip:
+            # DOCX já é comprimido: armazenar sem recomprimir
+            self._zip.writestr(nome, conteudo)
+        else:
+            caminho = os.path.join(self.destino, nome)
+            with open(caminho + '.tmp', 'wb') as arquivo:
+                arquivo.write(conteudo)
+            os.replace(caminho + '.tmp', caminho)
+        self.bytes_gravados += len(conteudo)
+        self._progresso.write(f"{chave}\t{nome}\n")
+        self._progresso.flush()
+
+    def fechar(self):
+        self._progresso.close()
+        if self.zip:
+            self._zip.close()
+
+
+def gerar_lote(entrada, destino, workers=None, executor='process', backend='stream', template_id=None):
+    """
+    Gera os contratos de todos os locatários do arquivo, sem interação
+
+    O template é compilado uma vez e os contratos são renderizados por um
+    pool de workers, com no máximo alguns registros por worker em memória.
+    Retorna o código de saída (0 = todos gerados)
+    """
+    import time
+    import logging
+    from concurrent.futures import wait, FIRST_COMPLETED
+    from contract_service import ContractService
+    from render_executor import create_render_executor
+
+    # O resumo por contrato do serviço poluiria a saída do lote; as falhas
+    # de cada registro são relatadas aqui mesmo
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('contract_service').setLevel(logging.CRITICAL)
+
+    workers = workers or os.cpu_count() or 1
+    servico = ContractService(render_backend=backend, render_executor='inline')
+    servico.render_executor = create_render_executor(executor, servico, workers)
+    saida = SaidaLote(destino)
+
+    inicio = ultimo_relatorio = time.perf_counter()
+    gerados = pulados = falhas = 0
+    pendentes = {}
+
+    def coletar(futuros):
+        nonlocal gerados, falhas
+        for futuro in futuros:
+            linha, chave, nome_base = pendentes.pop(futuro)
+            try:
+                _, conteudo = futuro.result()
+            except Exception as e:
+                falhas += 1
+                print(f"❌ Linha {linha}: {e}")
+                continue
+            saida.gravar(chave, nome_base, conteudo)
+            gerados += 1
+
+    def blocos(registros, tamanho=256):
+        # Registros ainda não gerados, em blocos normalizados coluna a coluna
+        nonlocal pulados
+        bloco = []
+        for linha, registro in registros:
+            chave = chave_registro(linha, registro)
+            if chave in saida.concluidos:
+                pulados += 1
+                continue
+            if template_id and not registro.get('template_id'):
+                registro['template_id'] = template_id
+            bloco.append((linha, chave, registro))
+            if len(bloco) >= tamanho:
+                yield bloco
+                bloco = []
+        if bloco:
+            yield bloco
+
+    try:
+        for bloco in blocos(ler_registros(entrada)):
+            normalizados, erros = servico.normalize_batch([registro for _, _, registro in bloco])
+            for erro in erros:
+                # Reserva inconsistente: rejeitada sem gastar renderização
+                falhas += 1
+                print(f"❌ Linha {bloco[erro['index']][0]}: {erro['error']}")
+
+            for (linha, chave, _), registro in zip(bloco, normalizados):
+                if registro is None:
+                    continue
+                nome = servico._sanitize_filename(str(registro.get('nome_do_locatario') or 'sem_nome'))
+                nome_arquivo = f"CONTRATO_{nome}_{linha}.docx"
+                pendentes[servico.render_executor.submit(registro)] = (linha, chave, nome_arquivo)
+
+                # Janela limitada: lê o arquivo em fluxo sem enfileirar tudo
+                if len(pendentes) >= workers * 4:
+                    concluidos, _ = wait(list(pendentes), return_when=FIRST_COMPLETED)
+                    coletar(concluidos)
+
+                if time.perf_counter() - ultimo_relatorio >= 2:
+                    ultimo_relatorio = time.perf_counter()
+                    print(f"  ... {gerados} gerados, {falhas} falhas")
+
+        coletar(wait(list(pendentes))[0])
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrompido; execute novamente para retomar")
+        coletar([futuro for futuro in list(pendentes) if futuro.done()])
+    finally:
+        saida.fechar()
+        servico.render_executor.shutdown()
+
+    duracao = time.perf_counter() - inicio
+    print("\n📊 RESUMO DO LOTE")
+    print(f"  Gerados: {gerados} | Já existentes (retomada): {pulados} | Falhas: {falhas}")
+    print(f"  Tempo: {duracao:.2f}s | {gerados / duracao if duracao else 0:.1f} contratos/s | "
+          f"{saida.bytes_gravados / (1024 * 1024):.1f} MB gravados em {destino}")
+    return 1 if falhas else 0
+
+
+def main_lote(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Geração de contratos em lote a partir de CSV, JSONL ou XLSX')
+    parser.add_argument('--lote', required=True, help='Arquivo com os locatários (.csv, .jsonl ou .xlsx)')
+    parser.add_argument('--saida', default='contratos', help='Diretório ou arquivo .zip de saída')
+    parser.add_argument('--workers', type=int, default=0, help='Workers de renderização (padrão: nº de CPUs)')
+    parser.add_argument('--executor', default='process', choices=('inline', 'thread', 'process'))
+    parser.add_argument('--backend', default='stream', choices=('docx', 'stream'))
+    parser.add_argument('--template-id', help='Template usado quando o registro não informar template_id')
+    args = parser.parse_args(argv)
+    return gerar_lote(args.lote, args.saida, args.workers or None, args.executor, args.backend, args.template_id)
+
 def main():
     template_contrato = "CONTRATO Casa da Ana.docx"
     
@@ -134,16 +413,19 @@ def main():
         print("Falha ao preencher o contrato DOCX.")
 
 if __name__ == "__main__":
+    import sys
     try:
         import docx
         import requests # Verificar também a dependência requests
+        if len(sys.argv) > 1:
+            # Modo em lote: python gerador_contrato.py --lote locatarios.csv --saida contratos.zip
+            sys.exit(main_lote(sys.argv[1:]))
         print("Dependências 'python-docx' e 'requests' já estão instaladas.")
         main()
     except ImportError:
         print("Uma ou mais dependências (python-docx, requests) não estão instaladas.")
         print("Tentando instalar dependências...")
         import subprocess
-        import sys
         try:
             subprocess.check_call([sys.executable, "-m", "pip", "install", "python-docx", "requests"])
             print("Dependências instaladas com sucesso. Por favor, execute o script novamente.")
@@ -0,0 +1,51 @@
+"""
+Configuração do gunicorn (gunicorn --config gunicorn.conf.py app:app)
+
+Com preload_app o app.py é importado uma única vez no processo mestre:
+Flask, python-docx/lxml e os templates compilados são carregados antes do
+fork e compartilhados pelos workers (copy-on-write). Um worker novo, em um
+deploy, autoscale ou reinício por max_requests, já nasce pronto.
+"""
+
+import gc
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+keepalive = 2
+# Conexões aguardando accept(); o excedente é recusado na hora em vez de
+# esperar invisível até o timeout (o controle de admissão vê só as aceitas)
+backlog = int(os.getenv('GUNICORN_BACKLOG', 2048))
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+
+def when_ready(server):
+    if preload_app:
+        # Objetos carregados no mestre saem das varreduras do GC: sem isso a
+        # primeira coleta em cada worker escreve nos cabeçalhos dos objetos e
+        # copia as páginas compartilhadas
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # O serviço herdado do mestre inicia neste worker as threads de segundo
+    # plano (spool), que não sobrevivem ao fork
+    application = sys.modules.get('app')
+    if application is not None and hasattr(application, 'contract_service'):
+        application.contract_service.start_background_workers()
+
+
+def child_exit(server, worker):
+    # Métricas do worker encerrado (max_requests, timeout, deploy) somadas ao
+    # arquivo dos processos mortos: um pid reciclado começa do zero e os
+    # arquivos de METRICS_DIR não se acumulam
+    if os.getenv('METRICS_DIR'):
+        from metrics import mark_process_dead
+        mark_process_dead(worker.pid)
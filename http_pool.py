@@ -0,0 +1,99 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def request_error_reason(error):
+    """
+    Motivo da falha de uma requisição, seguro para clientes e para o spool
+
+    A mensagem das exceções do requests traz a URL completa, que no webhook
+    contém o token; ela fica só no log. Retorna 'HTTP <status>', 'timeout',
+    'connection refused', 'connection error' ou o nome da exceção.
+    """
+    response = getattr(error, 'response', None)
+    if isinstance(error, requests.exceptions.HTTPError) and response is not None:
+        return f"HTTP {response.status_code}"
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return 'connection refused' if 'refused' in str(error).lower() else 'connection error'
+    return type(error).__name__
+
+
+class WebhookHttpPool:
+    """
+    Sessão HTTP compartilhada com pool de conexões keep-alive
+
+    Uma única instância atende todas as requisições e threads do worker, de
+    modo que entregas para o mesmo host reaproveitam a conexão TCP/TLS em vez
+    de pagar um novo handshake a cada contrato. O pool do urllib3 é seguro
+    para uso concorrente; pool_size limita as conexões mantidas por host.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=5.0, read_timeout=30.0):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._adapter = adapter
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Cria o pool a partir de WEBHOOK_POOL_SIZE, WEBHOOK_CONNECT_TIMEOUT e WEBHOOK_READ_TIMEOUT
+        """
+        return cls(
+            pool_size=int(os.getenv('WEBHOOK_POOL_SIZE', 10)),
+            connect_timeout=float(os.getenv('WEBHOOK_CONNECT_TIMEOUT', 5)),
+            read_timeout=float(os.getenv('WEBHOOK_READ_TIMEOUT', 30))
+        )
+
+    def post(self, url, **kwargs):
+        """
+        POST pelo pool; usa os timeouts (conexão, leitura) do pool se omitidos
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        with self._lock:
+            self._requests += 1
+        try:
+            return self.session.post(url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def stats(self):
+        """
+        Métricas de reaproveitamento de conexões
+        """
+        connections = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+        with self._lock:
+            requests_sent = self._requests
+            errors = self._errors
+        return {
+            'pool_size': self.pool_size,
+            'connect_timeout': self.timeout[0],
+            'read_timeout': self.timeout[1],
+            'requests': requests_sent,
+            'errors': errors,
+            'connections_opened': connections,
+            'connections_reused': max(requests_sent - connections, 0)
+        }
+
+    def close(self):
+        self.session.close()
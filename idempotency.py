@@ -0,0 +1,212 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class IdempotencyConflict(Exception):
+    """
+    Mesma Idempotency-Key reutilizada com dados diferentes
+    """
+
+
+class IdempotencyInFlight(Exception):
+    """
+    Requisição idêntica ainda em processamento após o tempo de espera
+    """
+
+
+def fingerprint(dados):
+    """
+    Hash do conteúdo normalizado dos dados (ordem de chaves e espaços ignorados)
+    """
+    normalized = {
+        key: value.strip() if isinstance(value, str) else value
+        for key, value in dados.items()
+    }
+    canonical = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _resolve(future):
+    # No event loop de quem espera; o future pode ter sido cancelado pelo prazo
+    if not future.done():
+        future.set_result(True)
+
+
+class _Entry:
+    __slots__ = ('fingerprint', 'value', 'final', 'expires_at', 'event', 'waiters')
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.value = None
+        self.final = False
+        self.expires_at = None
+        self.event = threading.Event()
+        # (loop, future) das corrotinas esperando esta execução
+        self.waiters = []
+
+    def wake(self):
+        """
+        Acorda quem espera a execução em andamento (threads e corrotinas)
+        """
+        self.event.set()
+        for loop, future in self.waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # Loop já encerrado
+                pass
+        self.waiters = []
+
+
+class IdempotencyCache:
+    """
+    Cache LRU com TTL de resultados por chave de idempotência
+
+    A primeira requisição de uma chave executa; requisições repetidas
+    enquanto ela roda esperam o resultado em vez de rodar em paralelo. Um
+    resultado marcado como final é devolvido sem executar de novo até
+    expirar; um resultado não final (ex.: envio que falhou) é guardado e
+    entregue à próxima execução, que pode reaproveitá-lo.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600.0, wait_timeout=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def run(self, key, func, content_fingerprint=None):
+        """
+        Executa func(valor_anterior) -> (valor, final) uma vez por chave
+
+        Retorna (valor, replayed)
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            claim = self._claim(key, content_fingerprint)
+            if claim[0] == 'replay':
+                return claim[1], True
+            if claim[0] == 'run':
+                break
+            # Outra requisição idêntica em andamento: espera por ela
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not claim[1].wait(remaining):
+                raise IdempotencyInFlight("Requisição idêntica ainda em processamento")
+
+        _, entry, previous = claim
+        try:
+            value, final = func(previous)
+        except BaseException:
+            self._abort(key, entry)
+            raise
+        self._complete(entry, value, final)
+        return value, False
+
+    async def run_async(self, key, func, content_fingerprint=None):
+        """
+        Versão para asyncio de run: func(valor_anterior) é uma corrotina
+
+        A espera por uma duplicata em andamento é um future do event loop,
+        resolvido quando a execução termina; nenhuma thread fica bloqueada
+        """
+        # Import local: só o modo ASGI usa asyncio
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            claim = self._claim(key, content_fingerprint, loop)
+            if claim[0] == 'replay':
+                return claim[1], True
+            if claim[0] == 'run':
+                break
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(claim[1], remaining)
+            except asyncio.TimeoutError:
+                raise IdempotencyInFlight("Requisição idêntica ainda em processamento")
+
+        _, entry, previous = claim
+        try:
+            value, final = await func(previous)
+        except BaseException:
+            self._abort(key, entry)
+            raise
+        self._complete(entry, value, final)
+        return value, False
+
+    def _claim(self, key, content_fingerprint, loop=None):
+        """
+        Decide o que fazer com a chave
+
+        Retorna ('run', entrada, valor anterior), ('replay', valor) ou
+        ('wait', evento da execução em andamento); com loop, a espera é um
+        future desse event loop em vez do evento
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at < time.monotonic():
+                del self._entries[key]
+                entry = None
+
+            if entry is not None and content_fingerprint and entry.fingerprint != content_fingerprint:
+                raise IdempotencyConflict("Idempotency-Key já utilizada com dados diferentes")
+
+            if entry is None:
+                entry = _Entry(content_fingerprint)
+                self._entries[key] = entry
+                self.misses += 1
+                return 'run', entry, None
+
+            self._entries.move_to_end(key)
+            if entry.event.is_set():
+                if entry.final:
+                    self.hits += 1
+                    return 'replay', entry.value
+                # Resultado anterior não final: esta requisição assume a execução
+                entry.event = threading.Event()
+                self.misses += 1
+                return 'run', entry, entry.value
+            if loop is not None:
+                future = loop.create_future()
+                entry.waiters.append((loop, future))
+                return 'wait', future
+            return 'wait', entry.event
+
+    def _abort(self, key, entry):
+        with self._lock:
+            if entry.value is None and self._entries.get(key) is entry:
+                del self._entries[key]
+            entry.wake()
+
+    def _complete(self, entry, value, final):
+        with self._lock:
+            entry.value = value
+            entry.final = final
+            entry.expires_at = time.monotonic() + self.ttl
+            entry.wake()
+            self._evict()
+
+    def _evict(self):
+        # Remove as entradas concluídas menos usadas acima do limite
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        for key in [key for key, entry in self._entries.items() if entry.event.is_set()][:excess]:
+            del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
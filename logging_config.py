@@ -0,0 +1,88 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+
+# Atributos padrão de um LogRecord; o que sobrar veio de extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_listener_args = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Uma linha JSON por registro, incluindo os campos passados em extra=
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _start_listener():
+    global _listener
+    if _listener_args is None:
+        return
+    log_queue, handlers = _listener_args
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Threads não sobrevivem ao fork: cada worker precisa do próprio listener
+os.register_at_fork(after_in_child=_start_listener)
+atexit.register(_stop_listener)
+
+
+def setup_logging():
+    """
+    Configura o logging do serviço a partir do ambiente
+
+    LOG_LEVEL define o nível (padrão INFO) e LOG_FORMAT escolhe 'text' ou
+    'json'. Com LOG_QUEUE=true (padrão) as threads das requisições só
+    enfileiram os registros; a escrita no stderr acontece em uma thread
+    separada (QueueListener), reiniciada nos processos filhos após fork.
+    """
+    global _listener_args
+    level = os.getenv('LOG_LEVEL', 'INFO').upper()
+    handler = logging.StreamHandler()
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s:%(name)s:%(message)s'))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.setLevel(level)
+
+    _stop_listener()
+    _listener_args = None
+
+    if os.getenv('LOG_QUEUE', 'True').lower() != 'true':
+        root.addHandler(handler)
+        return
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener_args = (log_queue, [handler])
+    _start_listener()
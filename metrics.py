@@ -0,0 +1,341 @@
+import os
+import json
+import glob
+import time
+import threading
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Etapas instrumentadas do processamento de um contrato
+STAGES = (
+    'validation',
+    'template_load',
+    'substitution',
+    'serialization',
+    'encode',
+    'http_delivery',
+    'cleanup'
+)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_HISTOGRAM = 'contract_stage_duration_seconds'
+
+HELP = {
+    STAGE_HISTOGRAM: 'Tempo gasto em cada etapa do processamento de um contrato',
+    'contract_substitutions_total': 'Variáveis substituídas nos contratos gerados',
+    'contract_missing_variables_total': 'Variáveis do template sem valor nos dados recebidos',
+    'contract_renders_total': 'Contratos renderizados, por backend e resultado',
+    'contract_deliveries_total': 'Entregas ao destino principal (webhook), por resultado',
+    'contract_sink_deliveries_total': 'Entregas por destino (DELIVERY_SINKS), por resultado',
+    'contract_output_bytes_total': 'Bytes dos DOCX gerados',
+    'contract_output_bytes_saved_total': 'Bytes economizados pelo otimizador de saída em relação ao python-docx padrão',
+    'webhook_body_bytes_saved_total': 'Bytes economizados pelo gzip no corpo do webhook',
+    'contract_admission_rejected_total': 'Requisições recusadas pelo controle de admissão, por limite e motivo',
+    'contract_archive_writes_total': 'Contratos arquivados, por resultado (stored ou deduplicated)',
+    'contract_archive_resends_total': 'Reenvios de contratos arquivados, por status da entrega'
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        key + '="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class StageTimer:
+    __slots__ = ('seconds',)
+
+    def __init__(self):
+        self.seconds = 0.0
+
+
+ARCHIVED_FILE = 'metrics_archived.json'
+
+
+def _write_snapshot(path, snapshot, tmp_path=None):
+    # Escrita atômica: quem lê nunca vê um arquivo pela metade
+    tmp_path = tmp_path or f'{path}.tmp'
+    with open(tmp_path, 'w') as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(tmp_path, path)
+
+
+def _merge_snapshots(total, snapshot):
+    """
+    Soma snapshot em total (mesmo formato de MetricsRegistry.snapshot)
+    """
+    counters = {(name, json.dumps(labels)): value for name, labels, value in total['counters']}
+    for name, labels, value in snapshot['counters']:
+        key = (name, json.dumps(labels))
+        counters[key] = counters.get(key, 0) + value
+    histograms = {(name, json.dumps(labels)): values for name, labels, values in total['histograms']}
+    for name, labels, values in snapshot['histograms']:
+        soma = histograms.setdefault((name, json.dumps(labels)), [0] * len(values))
+        for i, value in enumerate(values):
+            soma[i] += value
+    total['counters'] = [[name, json.loads(labels), value] for (name, labels), value in counters.items()]
+    total['histograms'] = [[name, json.loads(labels), values] for (name, labels), values in histograms.items()]
+    return total
+
+
+def mark_process_dead(pid, directory=None):
+    """
+    Incorpora as métricas de um processo encerrado em metrics_archived.json
+
+    Chamado pelo processo mestre (hook child_exit do gunicorn); os
+    contadores do worker continuam no total, mas o arquivo dele é removido.
+    """
+    directory = directory or os.getenv('METRICS_DIR')
+    if not directory:
+        return
+    archived_path = os.path.join(directory, ARCHIVED_FILE)
+    for path in glob.glob(os.path.join(directory, f'metrics_{pid}_*.json')):
+        try:
+            with open(path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            try:
+                with open(archived_path) as archived_file:
+                    archived = json.load(archived_file)
+            except FileNotFoundError:
+                archived = {'buckets': snapshot['buckets'], 'counters': [], 'histograms': []}
+            if archived['buckets'] == snapshot['buckets']:
+                _write_snapshot(archived_path, _merge_snapshots(archived, snapshot))
+            os.remove(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Não foi possível arquivar as métricas do processo {pid}: {e}")
+
+
+class MetricsRegistry:
+    """
+    Contadores e histogramas do serviço, no formato de texto do Prometheus
+
+    Cada processo acumula as próprias métricas em memória. Com directory
+    definido (METRICS_DIR), uma thread grava periodicamente o estado do
+    processo em metrics_<pid>_<início>.json e o /metrics soma os arquivos de
+    todos os processos, então qualquer worker do gunicorn responde com o
+    total. O início no nome impede que um pid reciclado sobrescreva o
+    arquivo de um worker morto; mark_process_dead (hook child_exit do
+    gunicorn) soma esse arquivo em metrics_archived.json e o remove, para
+    que os contadores não voltem atrás nem os arquivos se acumulem. Limpe o
+    diretório ao reiniciar o serviço.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0, buckets=DEFAULT_BUCKETS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._started = time.time_ns()
+        self._thread = None
+        self._reset()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            directory=os.getenv('METRICS_DIR') or None,
+            flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', 1.0))
+        )
+
+    def _reset(self):
+        # {(nome, labels): valor} e {(nome, labels): [contagens por bucket..., soma, total]}
+        self._counters = {}
+        self._histograms = {}
+        self._dirty = False
+
+    def _check_pid(self):
+        # Processo filho (fork) herda a memória do pai: recomeça do zero, pois
+        # o que foi herdado já está contabilizado no arquivo do pai
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._started = time.time_ns()
+            self._thread = None
+            self._reset()
+
+    def _ensure_flusher(self):
+        if not self.directory or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run_flusher, name='metrics-flush', daemon=True)
+        self._thread.start()
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Incrementa um contador
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._check_pid()
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+            self._ensure_flusher()
+
+    def observe(self, name, value, **labels):
+        """
+        Registra uma observação em um histograma
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._check_pid()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+            self._dirty = True
+            self._ensure_flusher()
+
+    def observe_stage(self, stage, seconds):
+        self.observe(STAGE_HISTOGRAM, seconds, stage=stage)
+
+    @contextmanager
+    def stage(self, stage):
+        """
+        Mede a duração do bloco como uma etapa do processamento
+
+        O objeto retornado recebe a duração em .seconds ao sair do bloco
+        """
+        timer = StageTimer()
+        inicio = time.perf_counter()
+        try:
+            yield timer
+        finally:
+            timer.seconds = time.perf_counter() - inicio
+            self.observe_stage(stage, timer.seconds)
+
+    def snapshot(self, reset=False):
+        """
+        Estado deste processo; com reset=True, zera depois de copiar
+        """
+        with self._lock:
+            self._check_pid()
+            snapshot = {
+                'buckets': list(self.buckets),
+                'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, labels, list(values)] for (name, labels), values in self._histograms.items()]
+            }
+            if reset:
+                self._reset()
+            return snapshot
+
+    def merge(self, snapshot):
+        """
+        Soma a este processo um snapshot de outro (ex.: processos de renderização)
+        """
+        if snapshot['buckets'] != list(self.buckets):
+            return
+        with self._lock:
+            self._check_pid()
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                histogram = self._histograms.setdefault((name, tuple(map(tuple, labels))), [0] * len(values))
+                for i, value in enumerate(values):
+                    histogram[i] += value
+            self._dirty = True
+            self._ensure_flusher()
+
+    def flush(self):
+        """
+        Grava o estado deste processo em METRICS_DIR (escrita atômica)
+        """
+        if not self.directory:
+            return
+        self._dirty = False
+        snapshot = self.snapshot()
+        path = os.path.join(self.directory, f'metrics_{self._pid}_{self._started}.json')
+        # Temporário por thread: o /metrics e a thread de gravação podem coincidir
+        _write_snapshot(path, snapshot, f'{path}.{threading.get_ident()}.tmp')
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if not self._dirty:
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Não foi possível gravar as métricas: {e}")
+
+    def _collect(self):
+        # Soma os snapshots de todos os processos (ou só o deste, sem diretório)
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Arquivo de métricas ignorado ({path}): {e}")
+        return snapshots
+
+    def render(self):
+        """
+        Métricas agregadas no formato de exposição de texto do Prometheus
+        """
+        counters = {}
+        histograms = {}
+        for snapshot in self._collect():
+            if snapshot.get('buckets') != list(self.buckets):
+                continue
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+
+        # Todas as etapas aparecem, mesmo antes da primeira observação
+        for stage in STAGES:
+            histograms.setdefault((STAGE_HISTOGRAM, (('stage', stage),)), [0] * (len(self.buckets) + 2))
+
+        lines = []
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f'# HELP {name} {HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                # Buckets cumulativos; o +Inf é o total de observações
+                acumulado = 0
+                for bound, count in zip(self.buckets, values):
+                    acumulado += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", _format_value(bound))])} {acumulado}')
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {values[-1]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-2])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f'# HELP {name} {HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,224 @@
+import re
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+CENTAVOS = Decimal('0.01')
+
+# 'R$ 1.000,50', '1000,50', '1.000' (milhares) ou '1000' — formato brasileiro
+_BRL_RE = re.compile(r'^(?:\d{1,3}(?:\.\d{3})+|\d+)(?:,\d{1,2})?$')
+# '1000.50': ponto como separador decimal (JSON, planilhas exportadas)
+_DOT_DECIMAL_RE = re.compile(r'^\d+\.\d{1,2}$')
+_DATE_RE = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})$')
+
+
+class NormalizedRecord(dict):
+    """
+    Dados de um contrato já normalizados, com os campos derivados calculados
+
+    derived guarda os valores das variáveis derivadas pelo nome da
+    transformação do manifesto (ex.: 'half_value'), calculados uma vez.
+    Normalizar de novo um NormalizedRecord não refaz nada.
+    """
+
+    def __init__(self, *args, derived=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.derived = derived or {}
+
+
+def parse_brl(valor):
+    """
+    Valor em reais como Decimal exato
+
+    Aceita 'R$ 1.000,50', '1000,50', '1.000', '1000.50' e números; levanta
+    ValueError para qualquer outro formato
+    """
+    if isinstance(valor, bool):
+        raise ValueError(f"Valor inválido: {valor!r}")
+    if isinstance(valor, Decimal):
+        return valor
+    if isinstance(valor, (int, float)):
+        return Decimal(str(valor))
+    if not isinstance(valor, str):
+        raise ValueError(f"Valor inválido: {valor!r}")
+
+    texto = valor.replace('R$', '').replace(' ', '').replace('\xa0', '')
+    if _BRL_RE.match(texto):
+        return Decimal(texto.replace('.', '').replace(',', '.'))
+    if _DOT_DECIMAL_RE.match(texto):
+        return Decimal(texto)
+    raise ValueError(f"Valor inválido: '{valor}' (use o formato R$ 1.000,00)")
+
+
+def format_brl(valor):
+    """
+    Decimal → 'R$ 1.000,50'
+    """
+    valor = valor.quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+    return f"R$ {valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def parse_date(valor):
+    """
+    Data no formato DD/MM/AAAA (ou date/datetime, vindos de planilhas)
+    """
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    match = _DATE_RE.match(valor.strip()) if isinstance(valor, str) else None
+    if match is None:
+        raise ValueError(f"Data inválida: {valor!r} (use DD/MM/AAAA)")
+    dia, mes, ano = (int(parte) for parte in match.groups())
+    try:
+        return date(ano, mes, dia)
+    except ValueError:
+        raise ValueError(f"Data inexistente: '{valor}'")
+
+
+def format_date(data):
+    return data.strftime('%d/%m/%Y')
+
+
+def parse_nights(valor):
+    """
+    Quantidade de noites como inteiro positivo ('7', 7 ou 7.0)
+    """
+    if isinstance(valor, bool):
+        raise ValueError(f"Quantidade de noites inválida: {valor!r}")
+    if isinstance(valor, str) and valor.strip().isdigit():
+        noites = int(valor.strip())
+    elif isinstance(valor, int):
+        noites = valor
+    elif isinstance(valor, float) and valor.is_integer():
+        noites = int(valor)
+    else:
+        raise ValueError(f"Quantidade de noites inválida: {valor!r}")
+    if noites <= 0:
+        raise ValueError(f"Quantidade de noites deve ser positiva: {valor!r}")
+    return noites
+
+
+# Campo de entrada → (conversão, formatação do valor canônico)
+COLUMNS = {
+    'valor_locacao': (parse_brl, format_brl),
+    'dia_inicio': (parse_date, format_date),
+    'dia_fim': (parse_date, format_date),
+    'qtd_noites': (parse_nights, int)
+}
+
+
+def _parse_column(registros, field, parse, errors):
+    """
+    Converte um campo de todos os registros de uma vez
+
+    Valores repetidos (datas de check-in, valores de tabela) são convertidos
+    uma única vez por lote. Retorna {índice: valor convertido}; as falhas
+    vão para errors.
+    """
+    parsed = {}
+    cache = {}
+    for index, dados in enumerate(registros):
+        if index in errors or isinstance(dados, NormalizedRecord):
+            continue
+        raw = dados.get(field)
+        if raw is None or raw == '':
+            continue
+        # Chave com o tipo: True e 1 convertem de formas diferentes
+        key = (type(raw), raw)
+        try:
+            result = cache[key]
+        except (KeyError, TypeError):
+            try:
+                result = parse(raw)
+            except ValueError as e:
+                result = e
+            try:
+                cache[key] = result
+            except TypeError:
+                # Listas/objetos no JSON: sem cache, e a conversão já falhou
+                pass
+        if isinstance(result, ValueError):
+            errors[index] = f"{field}: {result}"
+        else:
+            parsed[index] = result
+    return parsed
+
+
+def _check_booking(valor, inicio, fim, noites):
+    """
+    Consistência da reserva; retorna a quantidade de noites (informada ou calculada)
+    """
+    if valor is not None and valor <= 0:
+        raise ValueError("valor_locacao deve ser maior que zero")
+    if inicio is None or fim is None:
+        return noites
+    calculadas = (fim - inicio).days
+    if calculadas <= 0:
+        raise ValueError(f"dia_fim ({format_date(fim)}) deve ser posterior a dia_inicio ({format_date(inicio)})")
+    if noites is not None and noites != calculadas:
+        raise ValueError(f"qtd_noites ({noites}) não confere com o período "
+                         f"{format_date(inicio)} a {format_date(fim)} ({calculadas} noites)")
+    return calculadas
+
+
+def normalize_records(registros):
+    """
+    Normaliza uma lista de registros, coluna por coluna
+
+    Valores e datas são convertidos e reescritos no formato canônico
+    ('R$ 2.100,00', 'DD/MM/AAAA'); qtd_noites é calculada pelo período se
+    omitida; reservas inconsistentes (período invertido, noites que não
+    conferem, valor zerado) são rejeitadas antes de qualquer renderização.
+
+    Retorna (registros, erros): a lista com um NormalizedRecord por registro
+    válido (None nos inválidos) e [{'index': i, 'error': mensagem}].
+    """
+    errors = {}
+    for index, dados in enumerate(registros):
+        if not isinstance(dados, dict):
+            errors[index] = "Registro deve ser um objeto JSON"
+
+    columns = {
+        field: _parse_column(registros, field, parse, errors)
+        for field, (parse, _) in COLUMNS.items()
+    }
+
+    normalized = []
+    for index, dados in enumerate(registros):
+        if index in errors:
+            normalized.append(None)
+            continue
+        if isinstance(dados, NormalizedRecord):
+            normalized.append(dados)
+            continue
+        valores = {field: columns[field].get(index) for field in COLUMNS}
+        try:
+            valores['qtd_noites'] = _check_booking(
+                valores['valor_locacao'], valores['dia_inicio'], valores['dia_fim'], valores['qtd_noites']
+            )
+        except ValueError as e:
+            errors[index] = str(e)
+            normalized.append(None)
+            continue
+
+        record = NormalizedRecord(dados)
+        for field, (_, canonical) in COLUMNS.items():
+            if valores[field] is not None:
+                record[field] = canonical(valores[field])
+        if valores['valor_locacao'] is not None:
+            record.derived['half_value'] = format_brl(valores['valor_locacao'] / 2)
+        normalized.append(record)
+
+    return normalized, [{'index': index, 'error': errors[index]} for index in sorted(errors)]
+
+
+def normalize_record(dados):
+    """
+    Normaliza um único registro; levanta ValueError se for inválido
+    """
+    if isinstance(dados, NormalizedRecord):
+        return dados
+    (record,), errors = normalize_records([dados])
+    if errors:
+        raise ValueError(errors[0]['error'])
+    return record
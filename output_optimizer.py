@@ -0,0 +1,63 @@
+import os
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Partes que não fazem parte do conteúdo do contrato: a miniatura do
+# documento e os dados XML personalizados (metadados do SharePoint/Office)
+THUMBNAIL_RELTYPE = 'http://schemas.openxmlformats.org/package/2006/relationships/metadata/thumbnail'
+CUSTOM_XML_RELTYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/customXml'
+UNUSED_RELTYPES = (THUMBNAIL_RELTYPE, CUSTOM_XML_RELTYPE)
+
+
+class OutputOptimizer:
+    """
+    Como o DOCX de saída é escrito: nível de compressão e partes descartadas
+
+    As partes do template que não mudam entre contratos são comprimidas uma
+    única vez, na compilação, e copiadas byte a byte em cada contrato; só o
+    word/document.xml é comprimido por contrato, no nível configurado.
+    """
+
+    def __init__(self, compresslevel=zlib.Z_DEFAULT_COMPRESSION, strip_unused=True):
+        if not -1 <= compresslevel <= 9:
+            raise ValueError(f"DOCX_COMPRESSION_LEVEL inválido: {compresslevel} (use 0 a 9)")
+        self.compresslevel = compresslevel
+        self.strip_unused = strip_unused
+
+    @classmethod
+    def from_env(cls):
+        """
+        Cria o otimizador a partir de DOCX_COMPRESSION_LEVEL e DOCX_STRIP_UNUSED_PARTS
+        """
+        return cls(
+            compresslevel=int(os.getenv('DOCX_COMPRESSION_LEVEL', zlib.Z_DEFAULT_COMPRESSION)),
+            strip_unused=os.getenv('DOCX_STRIP_UNUSED_PARTS', 'True').lower() == 'true'
+        )
+
+    def strip(self, document):
+        """
+        Remove do documento as relações com partes não usadas
+
+        Sem a relação, o python-docx não grava a parte nem o seu content type.
+        Retorna os nomes das partes removidas.
+        """
+        if not self.strip_unused:
+            return []
+        removed = []
+        for rels in (document.part.package.rels, document.part.rels):
+            for rId, rel in list(rels.items()):
+                if rel.reltype in UNUSED_RELTYPES and not rel.is_external:
+                    removed.append(str(rel.target_part.partname).lstrip('/'))
+                    del rels[rId]
+                    rels.related_parts.pop(rId, None)
+        if removed:
+            logger.info(f"Partes removidas da saída: {', '.join(removed)}")
+        return removed
+
+    def stats(self):
+        return {
+            'compresslevel': self.compresslevel,
+            'strip_unused_parts': self.strip_unused
+        }
@@ -0,0 +1,185 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Serviço de renderização do processo filho, criado pelo initializer
+_worker_service = None
+
+# Recursos do worker que o filho não usa: só renderiza e devolve os bytes
+_PARENT_ONLY_ENV = ('METRICS_DIR', 'RETRY_SPOOL_PATH', 'CONTRACT_ARCHIVE_DIR', 'DELIVERY_SINKS')
+
+
+def _init_process_worker(render_backend):
+    """
+    Inicializa o processo de renderização e aquece o template
+
+    O filho nasce limpo (forkserver/spawn), sem as threads e locks do
+    worker; monta um serviço só para renderizar, com métricas em memória
+    que voltam ao worker a cada contrato.
+    """
+    global _worker_service
+    for name in _PARENT_ONLY_ENV:
+        os.environ.pop(name, None)
+    from logging_config import setup_logging
+    from metrics import MetricsRegistry
+    from contract_service import ContractService
+    setup_logging()
+    _worker_service = ContractService(render_backend=render_backend, render_executor='inline',
+                                      metrics=MetricsRegistry())
+    _worker_service.template_cache.get().streaming()
+
+
+def _render_in_process(dados_locatario):
+    # Só o dicionário de dados vai para o filho; volta (nome, bytes, métricas)
+    try:
+        return _worker_service.render_contract(dados_locatario), _worker_service.metrics.snapshot(reset=True)
+    except Exception as e:
+        e.metrics = _worker_service.metrics.snapshot(reset=True)
+        raise
+
+
+class InlineRenderExecutor:
+    """
+    Renderiza na própria thread da requisição (comportamento padrão)
+    """
+    name = 'inline'
+
+    def __init__(self, service, workers=None):
+        self.service = service
+
+    def submit(self, dados_locatario):
+        future = Future()
+        try:
+            future.set_result(self.service.render_contract(dados_locatario))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def render(self, dados_locatario):
+        return self.service.render_contract(dados_locatario)
+
+    def shutdown(self):
+        pass
+
+
+class ThreadRenderExecutor(InlineRenderExecutor):
+    """
+    Renderiza em um pool de threads, limitando renderizações simultâneas
+    """
+    name = 'thread'
+
+    def __init__(self, service, workers=None):
+        super().__init__(service)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='render')
+
+    def submit(self, dados_locatario):
+        return self._pool.submit(self.service.render_contract, dados_locatario)
+
+    def render(self, dados_locatario):
+        return self.submit(dados_locatario).result()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class ProcessRenderExecutor(InlineRenderExecutor):
+    """
+    Renderiza em processos filhos para usar todos os núcleos
+
+    A renderização é CPU pura e serializada pelo GIL dentro de um worker. Os
+    filhos vêm de um forkserver (spawn onde não houver), não de um fork do
+    worker: o worker já tem threads (métricas, spool, logging, entregas) e
+    um fork poderia herdar um lock ocupado por uma delas. Cada filho compila
+    o template uma vez no initializer; cada job envia só o dicionário de
+    dados e recebe os bytes do DOCX e as métricas da renderização, somadas
+    às do worker.
+    """
+    name = 'process'
+
+    def __init__(self, service, workers=None):
+        super().__init__(service)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Um pool por processo: não reutiliza o pool herdado de um fork
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = self._create_pool()
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _create_pool(self):
+        # Import local: multiprocessing só é carregado com RENDER_EXECUTOR=process
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            # O forkserver importa o serviço uma vez; cada filho sai dele já pronto
+            context.set_forkserver_preload(['contract_service'])
+        else:
+            context = multiprocessing.get_context('spawn')
+        pool = ProcessPoolExecutor(
+            self.workers, mp_context=context,
+            initializer=_init_process_worker, initargs=(self.service.render_backend,)
+        )
+        logger.info(f"Pool de renderização com {self.workers} processos iniciado ({context.get_start_method()})")
+        return pool
+
+    def _merge_metrics(self, snapshot):
+        if snapshot is not None:
+            self.service.metrics.merge(snapshot)
+
+    def submit(self, dados_locatario):
+        future = Future()
+
+        def done(job):
+            try:
+                result, snapshot = job.result()
+                error = None
+            except BaseException as e:
+                error, snapshot = e, getattr(e, 'metrics', None)
+            self._merge_metrics(snapshot)
+            # Cancelado por quem esperava (ex.: requisição ASGI encerrada)
+            if not future.set_running_or_notify_cancel():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        self._get_pool().submit(_render_in_process, dados_locatario).add_done_callback(done)
+        return future
+
+    def render(self, dados_locatario):
+        return self.submit(dados_locatario).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+RENDER_EXECUTORS = {
+    executor.name: executor
+    for executor in (InlineRenderExecutor, ThreadRenderExecutor, ProcessRenderExecutor)
+}
+
+
+def create_render_executor(name, service, workers=None):
+    """
+    Cria o executor de renderização pelo nome: inline, thread ou process
+    """
+    try:
+        executor_class = RENDER_EXECUTORS[name.lower()]
+    except KeyError:
+        raise ValueError(f"RENDER_EXECUTOR inválido: '{name}' (opções: {', '.join(RENDER_EXECUTORS)})")
+    return executor_class(service, workers)
@@ -0,0 +1,95 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+def contract_id(contract_bytes):
+    """
+    Identificador do contrato pelo conteúdo (também usado como ETag)
+
+    A renderização é determinística: os mesmos dados e o mesmo template geram
+    os mesmos bytes, e portanto o mesmo id.
+    """
+    return hashlib.sha256(contract_bytes).hexdigest()[:32]
+
+
+class RenderedContractStore:
+    """
+    Contratos renderizados para download (GET /contracts/<id>), em memória
+
+    LRU limitado por quantidade e por bytes, com TTL: guarda só o bastante
+    para o cliente baixar (ou pedir faixas) logo depois do POST
+    /render-contract, sem arquivo temporário. max_entries 0 desliga.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=64 * 1024 * 1024, ttl=900.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Cria o store a partir de RENDERED_CACHE_MAX_ENTRIES, RENDERED_CACHE_MAX_MB e RENDERED_CACHE_TTL
+        """
+        return cls(
+            max_entries=int(os.getenv('RENDERED_CACHE_MAX_ENTRIES', 64)),
+            max_bytes=int(float(os.getenv('RENDERED_CACHE_MAX_MB', 64)) * 1024 * 1024),
+            ttl=float(os.getenv('RENDERED_CACHE_TTL', 900))
+        )
+
+    def put(self, filename, contract_bytes):
+        """
+        Guarda o contrato; retorna o id
+        """
+        cid = contract_id(contract_bytes)
+        if not self.max_entries:
+            return cid
+        with self._lock:
+            anterior = self._entries.pop(cid, None)
+            if anterior is not None:
+                self._bytes -= len(anterior[1])
+            self._entries[cid] = (filename, contract_bytes, time.monotonic() + self.ttl)
+            self._bytes += len(contract_bytes)
+            self._evict()
+        return cid
+
+    def get(self, cid):
+        """
+        Retorna (nome do arquivo, bytes) ou None se desconhecido/expirado
+        """
+        with self._lock:
+            entry = self._entries.get(cid)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                del self._entries[cid]
+                self._bytes -= len(entry[1])
+                return None
+            self._entries.move_to_end(cid)
+            return entry[0], entry[1]
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, contract_bytes, _) = self._entries.popitem(last=False)
+            self._bytes -= len(contract_bytes)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl
+            }
@@ -0,0 +1,324 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Disjuntor simples para o webhook
+
+    Após failure_threshold falhas seguidas o circuito abre e nenhuma entrega é
+    tentada por reset_timeout segundos; depois disso uma única tentativa de
+    teste (meio-aberto) decide se fecha novamente ou volta a abrir. Enquanto
+    ela não termina, as demais continuam recusadas; um teste sem resultado
+    por mais de reset_timeout libera outro.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        # Início da tentativa de teste em andamento (meio-aberto)
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """
+        Indica se uma tentativa de entrega pode ser feita agora
+
+        No meio-aberto só a primeira chamada recebe True (a tentativa de
+        teste); quem recebe True deve chamar record_success ou record_failure
+        """
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'open':
+                return False
+            now = time.monotonic()
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                return False
+            self._probe_started = now
+            return True
+
+    def release(self):
+        """
+        Devolve a permissão de um allow() cuja entrega acabou não sendo tentada
+        """
+        with self._lock:
+            self._probe_started = None
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._probe_started = None
+            self._failures += 1
+            if self._state() == 'half_open' or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Circuito do webhook aberto após {self._failures} falhas seguidas")
+                self._opened_at = time.monotonic()
+
+
+class RetrySpool:
+    """
+    Spool em SQLite para entregas que falharam
+
+    Guarda os bytes do contrato já renderizado e os metadados do envio; uma
+    thread em segundo plano reenvia as entregas vencidas com backoff
+    exponencial com jitter. Entregas que esgotam max_attempts ficam com
+    status 'dead' para inspeção. Vários workers podem compartilhar o mesmo
+    arquivo: cada entrega é reservada (leased_until) com um UPDATE
+    condicional antes do envio, inclusive no drain; a reserva de quem caiu
+    no meio do envio vence após lease_timeout segundos.
+    """
+
+    def __init__(self, path, deliver, breaker=None, max_attempts=10, base_delay=30.0,
+                 max_delay=3600.0, poll_interval=5.0, lease_timeout=300.0):
+        # deliver(filename, contract_bytes, locatario) -> bool
+        self.path = path
+        self._deliver = deliver
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS deliveries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    filename TEXT NOT NULL,
+                    locatario TEXT NOT NULL,
+                    contract BLOB NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    leased_until REAL
+                )
+            ''')
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(deliveries)')]
+            if 'leased_until' not in columns:
+                # Spool criado por uma versão anterior
+                conn.execute('ALTER TABLE deliveries ADD COLUMN leased_until REAL')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_deliveries_due ON deliveries (status, next_attempt_at)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _backoff(self, attempts):
+        # Jitter "igual": metade fixa, metade aleatória
+        delay = min(self.max_delay, self.base_delay * (2 ** max(attempts - 1, 0)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def add(self, filename, contract_bytes, locatario, error=None):
+        """
+        Guarda uma entrega que falhou; retorna o id no spool
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO deliveries (filename, locatario, contract, attempts, next_attempt_at, '
+                'last_error, created_at, updated_at) VALUES (?, ?, ?, 1, ?, ?, ?, ?)',
+                (filename, locatario, sqlite3.Binary(contract_bytes), time.time() + self._backoff(1),
+                 error, now, now)
+            )
+            spool_id = cursor.lastrowid
+        logger.warning(f"Entrega de '{filename}' guardada no spool (id {spool_id}) para nova tentativa")
+        self.start()
+        return spool_id
+
+    def list(self, status=None, limit=100):
+        """
+        Entregas no spool, sem o conteúdo do contrato
+        """
+        query = ('SELECT id, filename, locatario, status, attempts, next_attempt_at, last_error, '
+                 'created_at, updated_at, length(contract) FROM deliveries')
+        params = []
+        if status:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY id LIMIT ?'
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [{
+            'id': row[0],
+            'filename': row[1],
+            'locatario': row[2],
+            'status': row[3],
+            'attempts': row[4],
+            'next_attempt_at': datetime.fromtimestamp(row[5]).isoformat(timespec='seconds'),
+            'last_error': row[6],
+            'created_at': row[7],
+            'updated_at': row[8],
+            'size': row[9]
+        } for row in rows]
+
+    def stats(self):
+        with self._connect() as conn:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM deliveries GROUP BY status').fetchall())
+        return {
+            'pending': counts.get('pending', 0),
+            'dead': counts.get('dead', 0),
+            'circuit': self.breaker.state
+        }
+
+    def start(self):
+        """
+        Inicia a thread de reenvio neste processo (idempotente, seguro após fork)
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='retry-spool', daemon=True)
+            self._thread.start()
+
+    def drain(self, include_dead=False):
+        """
+        Tenta reenviar agora todas as entregas pendentes, ignorando o backoff
+
+        Retorna a contagem de entregues e de falhas
+        """
+        statuses = ('pending', 'dead') if include_dead else ('pending',)
+        with self._connect() as conn:
+            ids = [row[0] for row in conn.execute(
+                f"SELECT id FROM deliveries WHERE status IN ({','.join('?' * len(statuses))}) ORDER BY id",
+                statuses
+            )]
+        result = {'delivered': 0, 'failed': 0}
+        for spool_id in ids:
+            outcome = self._attempt(spool_id, force=True)
+            if outcome is True:
+                result['delivered'] += 1
+            elif outcome is False:
+                result['failed'] += 1
+        return result
+
+    def _run(self):
+        while True:
+            try:
+                # Só consulta: allow() fica para cada entrega, que registra o resultado
+                if self.breaker.state != 'open':
+                    self._process_due()
+            except Exception as e:
+                logger.error(f"Erro no reenvio do spool: {str(e)}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _process_due(self):
+        with self._connect() as conn:
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM deliveries WHERE status = 'pending' AND next_attempt_at <= ? "
+                "AND (leased_until IS NULL OR leased_until < ?) ORDER BY next_attempt_at LIMIT 50",
+                (time.time(), time.time())
+            )]
+        for spool_id in ids:
+            if not self.breaker.allow():
+                break
+            if self._attempt(spool_id) is None:
+                # Reservada por outro worker: a permissão fica para a próxima
+                self.breaker.release()
+
+    def _attempt(self, spool_id, force=False):
+        """
+        Reserva e reenvia uma entrega; None se outro processo já a reservou
+
+        force (drain) ignora o backoff e reativa entregas 'dead', mas nunca
+        uma entrega com reserva válida de outro worker
+        """
+        now = time.time()
+        lease = now + self.lease_timeout
+        with self._connect() as conn:
+            if force:
+                claimed = conn.execute(
+                    "UPDATE deliveries SET leased_until = ?, status = 'pending' "
+                    "WHERE id = ? AND (leased_until IS NULL OR leased_until < ?)",
+                    (lease, spool_id, now)
+                ).rowcount
+            else:
+                claimed = conn.execute(
+                    "UPDATE deliveries SET leased_until = ? "
+                    "WHERE id = ? AND status = 'pending' AND next_attempt_at <= ? "
+                    "AND (leased_until IS NULL OR leased_until < ?)",
+                    (lease, spool_id, now, now)
+                ).rowcount
+            if not claimed:
+                return None
+            row = conn.execute(
+                'SELECT filename, contract, locatario, attempts FROM deliveries WHERE id = ?', (spool_id,)
+            ).fetchone()
+        filename, contract_bytes, locatario, attempts = row
+
+        try:
+            success = self._deliver(filename, bytes(contract_bytes), locatario)
+            error = None if success else 'Erro ao enviar contrato'
+        except Exception as e:
+            success = False
+            error = str(e)
+
+        now_iso = datetime.now().isoformat(timespec='seconds')
+        with self._connect() as conn:
+            if success:
+                conn.execute('DELETE FROM deliveries WHERE id = ?', (spool_id,))
+            else:
+                attempts += 1
+                status = 'dead' if attempts >= self.max_attempts else 'pending'
+                conn.execute(
+                    'UPDATE deliveries SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, '
+                    'updated_at = ?, leased_until = NULL WHERE id = ?',
+                    (status, attempts, time.time() + self._backoff(attempts), error, now_iso, spool_id)
+                )
+
+        if success:
+            self.breaker.record_success()
+            logger.info(f"Entrega {spool_id} do spool reenviada com sucesso")
+        else:
+            self.breaker.record_failure()
+            logger.warning(f"Reenvio {spool_id} do spool falhou (tentativa {attempts})")
+        return success
@@ -0,0 +1,118 @@
+import re
+from bisect import bisect_right
+from collections import Counter
+
+# Casa qualquer grafia de variável: {{x}}, {{ x }}, {{ nome do x }}, {{  x  }}
+PLACEHOLDER_RE = re.compile(r'\{\{\s*([^{}]+?)\s*\}\}')
+
+_SEPARATORS_RE = re.compile(r'[\s_]+')
+
+_XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+# Textos de runs diretas e de runs dentro de hyperlinks, em ordem de documento
+_TEXT_NODES_XPATH = './w:r/w:t | ./w:hyperlink/w:r/w:t'
+
+
+def normalize_placeholder(name):
+    """
+    Converte qualquer grafia de uma variável para o nome canônico
+
+    '{{ qtd noites }}', '{{qtd_noites}}' e 'QTD_NOITES' viram 'qtd_noites'
+    """
+    name = name.strip()
+    if name.startswith('{{') and name.endswith('}}'):
+        name = name[2:-2]
+    return _SEPARATORS_RE.sub('_', name.strip().lower())
+
+
+class SubstitutionEngine:
+    """
+    Substitui todas as variáveis de um parágrafo em uma única passada
+
+    O texto do parágrafo é tokenizado uma vez com um único padrão e cada
+    variável encontrada é resolvida por nome canônico, então o custo cresce
+    com o tamanho do documento e não com o número de chaves. O texto novo é
+    gravado nos próprios elementos <w:t>, preservando a formatação das runs:
+    a variável que atravessa várias runs recebe a formatação da primeira.
+    """
+
+    def __init__(self, values):
+        self.values = {normalize_placeholder(key): str(value) for key, value in values.items()}
+        self.substituted = Counter()
+        self.missing = set()
+
+    @property
+    def unused(self):
+        """
+        Variáveis fornecidas que não apareceram no documento
+        """
+        return [name for name in self.values if name not in self.substituted]
+
+    def _value(self, name, placeholder):
+        # placeholder: a variável como escrita no documento ('{{ qtd noites }}')
+        return self.values.get(name)
+
+    def substitute(self, paragraph):
+        """
+        Preenche o parágrafo (python-docx Paragraph ou elemento <w:p>)
+
+        Retorna a lista de (nome canônico, valor) substituídos
+        """
+        p = getattr(paragraph, '_p', paragraph)
+        nodes = p.xpath(_TEXT_NODES_XPATH)
+        texts = [node.text or '' for node in nodes]
+        full_text = ''.join(texts)
+        if '{{' not in full_text:
+            return []
+
+        replacements = []
+        for match in PLACEHOLDER_RE.finditer(full_text):
+            name = normalize_placeholder(match.group(1))
+            value = self._value(name, match.group(0))
+            if value is None:
+                self.missing.add(match.group(0))
+                continue
+            replacements.append((match.start(), match.end(), name, value))
+
+        if not replacements:
+            return []
+
+        # Offsets globais de início de cada <w:t>
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text)
+
+        pieces = [[] for _ in nodes]
+
+        def copy_range(begin, end):
+            # Copia o texto original [begin, end) para os nós que o contêm
+            while begin < end:
+                index = bisect_right(starts, begin) - 1
+                node_end = starts[index] + len(texts[index])
+                stop = min(end, node_end)
+                pieces[index].append(full_text[begin:stop])
+                begin = stop
+
+        position = 0
+        touched = set()
+        done = []
+        for start, end, name, value in replacements:
+            copy_range(position, start)
+            index = bisect_right(starts, start) - 1
+            pieces[index].append(value)
+            touched.update(range(index, bisect_right(starts, end - 1)))
+            position = end
+            self.substituted[name] += 1
+            done.append((name, value))
+        copy_range(position, len(full_text))
+
+        # Uma única reescrita por parágrafo, somente nos nós alterados
+        for index in sorted(touched):
+            node = nodes[index]
+            node.text = ''.join(pieces[index])
+            node.set(_XML_SPACE, 'preserve')
+
+        return done
+
@@ -0,0 +1,215 @@
+import io
+import os
+import re
+import copy
+import hashlib
+import zipfile
+import threading
+from docx import Document
+from docx_stream import StreamingTemplate
+from output_optimizer import OutputOptimizer
+from template_manifest import TemplateManifest, manifest_path
+import logging
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{[^}]+\}\}')
+
+# Memória aproximada de um template compilado por byte de XML descomprimido
+# (árvore lxml do documento mestre + renderizador stream)
+MEMORY_FACTOR = 5
+
+
+class PlaceholderLocation:
+    """
+    Posição de um parágrafo com variáveis dentro do template
+    """
+    __slots__ = ('path', 'placeholders')
+
+    def __init__(self, path, placeholders):
+        # path: ('paragrafo', i) ou ('tabela', t, linha, celula, i)
+        self.path = path
+        self.placeholders = placeholders
+
+    def describe(self):
+        if self.path[0] == 'paragrafo':
+            return f"Parágrafo {self.path[1]}"
+        _, t, linha, celula, i = self.path
+        return f"Tabela {t}, Linha {linha}, Célula {celula}, Parágrafo {i}"
+
+
+class CompiledTemplate:
+    """
+    Template DOCX carregado e pré-analisado uma única vez por worker
+    """
+
+    def __init__(self, path, data, mtime, size, digest, manifest=None, optimizer=None):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        if manifest is not None:
+            # Posições já conhecidas: não analisa o documento de novo
+            self.locations = [
+                PlaceholderLocation(tuple(paragraph['path']), paragraph['placeholders'])
+                for paragraph in manifest.paragraphs
+            ]
+        else:
+            self.locations = self.analyse_data(data)
+            manifest = TemplateManifest.from_locations(path, digest, self.locations)
+        self.manifest = manifest
+        # Documento mestre nunca é acessado diretamente: propriedades lazy do
+        # python-docx (ex.: document._body) guardam referências a subelementos
+        # que o deepcopy não remapeia e a cópia salvaria o XML errado
+        self._master = Document(io.BytesIO(data))
+        self.optimizer = optimizer or OutputOptimizer()
+        # Tamanho da saída padrão do python-docx, referência para os bytes economizados
+        baseline = io.BytesIO()
+        self._master.save(baseline)
+        self.baseline_size = baseline.tell()
+        self.removed_parts = self.optimizer.strip(self._master)
+        with zipfile.ZipFile(io.BytesIO(data)) as package:
+            xml_size = sum(info.file_size for info in package.infolist())
+        self.memory_estimate = len(data) + xml_size * MEMORY_FACTOR
+        self._streaming = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def analyse_data(cls, data):
+        """
+        Posições das variáveis a partir dos bytes do DOCX
+        """
+        return cls._analyse(Document(io.BytesIO(data)))
+
+    @staticmethod
+    def _analyse(document):
+        """
+        Registra onde cada variável {{ }} aparece nos parágrafos e tabelas
+        """
+        locations = []
+        for i, paragraph in enumerate(document.paragraphs):
+            text = paragraph.text
+            if '{{' in text:
+                locations.append(PlaceholderLocation(('paragrafo', i), PLACEHOLDER_PATTERN.findall(text)))
+
+        for t, table in enumerate(document.tables):
+            for linha, row in enumerate(table.rows):
+                for celula, cell in enumerate(row.cells):
+                    for i, paragraph in enumerate(cell.paragraphs):
+                        text = paragraph.text
+                        if '{{' in text:
+                            locations.append(PlaceholderLocation(
+                                ('tabela', t, linha, celula, i),
+                                PLACEHOLDER_PATTERN.findall(text)
+                            ))
+        return locations
+
+    def resolve_locations(self, document):
+        """
+        Gera (posição, parágrafo) de cada posição em uma cópia do documento
+
+        document.paragraphs, document.tables e as células de cada linha são
+        montados uma vez por documento, não uma vez por posição
+        """
+        paragraphs = None
+        tables = None
+        cells = {}
+        for location in self.locations:
+            if location.path[0] == 'paragrafo':
+                if paragraphs is None:
+                    paragraphs = document.paragraphs
+                yield location, paragraphs[location.path[1]]
+                continue
+            _, t, linha, celula, i = location.path
+            cell_paragraphs = cells.get((t, linha, celula))
+            if cell_paragraphs is None:
+                if tables is None:
+                    tables = document.tables
+                row_cells = cells.get((t, linha))
+                if row_cells is None:
+                    row_cells = cells[(t, linha)] = tables[t].rows[linha].cells
+                cell_paragraphs = cells[(t, linha, celula)] = row_cells[celula].paragraphs
+            yield location, cell_paragraphs[i]
+
+    @property
+    def placeholders(self):
+        """
+        Conjunto de variáveis encontradas no template
+        """
+        return {var for location in self.locations for var in location.placeholders}
+
+    def new_document(self):
+        """
+        Cópia em memória do documento pronta para ser preenchida
+        """
+        return copy.deepcopy(self._master)
+
+    def streaming(self):
+        """
+        Renderizador ZIP/XML direto, compilado na primeira utilização
+        """
+        if self._streaming is None:
+            with self._lock:
+                if self._streaming is None:
+                    self._streaming = StreamingTemplate(self)
+        return self._streaming
+
+
+class TemplateCache:
+    """
+    Mantém o template compilado em memória e o recarrega quando o arquivo muda
+    """
+
+    def __init__(self, template_path, optimizer=None):
+        self.template_path = template_path
+        self.optimizer = optimizer
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Retorna o template compilado, recarregando se mtime ou hash mudaram
+        """
+        stat = os.stat(self.template_path)
+        compiled = self._compiled
+        if compiled is not None and compiled.mtime == stat.st_mtime_ns and compiled.size == stat.st_size:
+            return compiled
+
+        with self._lock:
+            compiled = self._compiled
+            stat = os.stat(self.template_path)
+            if compiled is not None and compiled.mtime == stat.st_mtime_ns and compiled.size == stat.st_size:
+                return compiled
+
+            with open(self.template_path, 'rb') as template_file:
+                data = template_file.read()
+            digest = hashlib.sha256(data).hexdigest()
+
+            if compiled is not None and compiled.digest == digest:
+                # Arquivo tocado sem alteração de conteúdo
+                compiled.mtime = stat.st_mtime_ns
+                return compiled
+
+            path = manifest_path(self.template_path)
+            manifest = TemplateManifest.load(path, digest)
+            compiled = CompiledTemplate(self.template_path, data, stat.st_mtime_ns, stat.st_size, digest,
+                                        manifest, self.optimizer)
+            self._compiled = compiled
+            logger.info(f"Template '{self.template_path}' compilado ({digest[:12]}): "
+                        f"{len(compiled.locations)} parágrafos com variáveis"
+                        f"{' (manifesto)' if manifest is not None else ''}")
+
+            if manifest is None:
+                # Persiste a análise para as próximas cargas (e outros workers)
+                try:
+                    compiled.manifest.save(path)
+                except OSError as e:
+                    logger.warning(f"Não foi possível gravar o manifesto '{path}': {e}")
+            return compiled
+
+    def invalidate(self):
+        """
+        Descarta o template compilado
+        """
+        with self._lock:
+            self._compiled = None
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+"""
+Manifesto das variáveis de um template DOCX
+
+Gere na construção da imagem (ou deixe o serviço gerar na primeira carga):
+    python template_manifest.py "CONTRATO Casa da Ana.docx" templates/
+
+Sem argumentos, processa o template padrão e o diretório TEMPLATES_DIR.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from substitution import normalize_placeholder
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# Variáveis calculadas a partir de outro campo: sufixo no template → transformação
+DERIVED_SUFFIXES = {
+    '/2': 'half_value'
+}
+
+
+def manifest_path(template_path):
+    """
+    'CONTRATO Casa da Ana.docx' → 'CONTRATO Casa da Ana.manifest.json'
+    """
+    return os.path.splitext(template_path)[0] + '.manifest.json'
+
+
+def field_for(name):
+    """
+    Campo de entrada e transformação de uma variável pelo nome canônico
+
+    'nome_do_locatário' → ('nome_do_locatario', None), 'e-mail' → ('email', None),
+    'valor_locacao/2' → ('valor_locacao', 'half_value')
+    """
+    transform = None
+    for suffix, derived in DERIVED_SUFFIXES.items():
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            transform = derived
+            break
+    # Campos de entrada são ASCII, sem acentos nem hífens
+    field = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return field.replace('-', ''), transform
+
+
+class TemplateManifest:
+    """
+    Variáveis de um template: nome canônico, grafias, campo de entrada e posições
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.template = data['template']
+        self.sha256 = data['sha256']
+        self.placeholders = data['placeholders']
+        self.paragraphs = data['paragraphs']
+
+    @classmethod
+    def from_locations(cls, template_path, digest, locations):
+        """
+        Monta o manifesto a partir da análise do template (PlaceholderLocation)
+        """
+        placeholders = OrderedDict()
+        for location in locations:
+            for spelling in location.placeholders:
+                name = normalize_placeholder(spelling)
+                entry = placeholders.get(name)
+                if entry is None:
+                    field, transform = field_for(name)
+                    entry = placeholders[name] = {
+                        'name': name,
+                        'field': field,
+                        'transform': transform,
+                        'spellings': [],
+                        'locations': []
+                    }
+                if spelling not in entry['spellings']:
+                    entry['spellings'].append(spelling)
+                entry['locations'].append(list(location.path))
+
+        return cls({
+            'version': MANIFEST_VERSION,
+            'template': os.path.basename(template_path),
+            'sha256': digest,
+            'placeholders': list(placeholders.values()),
+            'paragraphs': [
+                {'path': list(location.path), 'placeholders': location.placeholders}
+                for location in locations
+            ]
+        })
+
+    @classmethod
+    def load(cls, path, digest=None):
+        """
+        Lê o manifesto; None se não existir, for de outra versão ou de outro conteúdo
+        """
+        try:
+            with open(path, encoding='utf-8') as manifest_file:
+                data = json.load(manifest_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Manifesto '{path}' ignorado: {e}")
+            return None
+        if data.get('version') != MANIFEST_VERSION or (digest and data.get('sha256') != digest):
+            logger.info(f"Manifesto '{path}' desatualizado, será regenerado")
+            return None
+        return cls(data)
+
+    def save(self, path):
+        """
+        Grava o manifesto (escrita atômica)
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump(self.data, manifest_file, indent=2, ensure_ascii=False)
+            manifest_file.write('\n')
+        os.replace(tmp_path, path)
+
+    @property
+    def fields(self):
+        """
+        Campos de entrada usados pelo template, na ordem em que aparecem
+        """
+        return list(OrderedDict.fromkeys(entry['field'] for entry in self.placeholders))
+
+    def build_values(self, dados, transforms):
+        """
+        Valores das variáveis por nome canônico a partir dos dados de entrada
+
+        transforms: {'half_value': func} para as variáveis derivadas; cada
+        transformação é calculada uma vez por contrato, ou reaproveitada de
+        dados.derived quando os dados já vêm normalizados
+        """
+        derived = getattr(dados, 'derived', {})
+        values = {}
+        for entry in self.placeholders:
+            value = dados.get(entry['field'])
+            if value is None:
+                continue
+            transform = entry['transform']
+            if transform in derived:
+                value = derived[transform]
+            elif transform:
+                value = transforms[transform](value)
+            values[entry['name']] = str(value)
+        return values
+
+
+def build_manifest(template_path):
+    """
+    Analisa o template e retorna o manifesto
+    """
+    # Import local: template_cache importa este módulo
+    from template_cache import CompiledTemplate
+
+    with open(template_path, 'rb') as template_file:
+        data = template_file.read()
+    digest = hashlib.sha256(data).hexdigest()
+    return TemplateManifest.from_locations(template_path, digest, CompiledTemplate.analyse_data(data))
+
+
+def main(argv):
+    templates = argv or ["CONTRATO Casa da Ana.docx", os.getenv('TEMPLATES_DIR', 'templates')]
+    paths = []
+    for template_path in templates:
+        if os.path.isdir(template_path):
+            # Diretório de templates: todos os .docx dele
+            paths.extend(
+                os.path.join(template_path, filename) for filename in sorted(os.listdir(template_path))
+                if filename.lower().endswith('.docx') and not filename.startswith(('.', '~$'))
+            )
+        elif os.path.exists(template_path) or argv:
+            paths.append(template_path)
+
+    for template_path in paths:
+        manifest = build_manifest(template_path)
+        path = manifest_path(template_path)
+        manifest.save(path)
+        print(f"✅ {path}: {len(manifest.placeholders)} variáveis, campos: {', '.join(manifest.fields)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,153 @@
+import os
+import threading
+from collections import OrderedDict
+from template_cache import TemplateCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE_ID = 'default'
+
+
+class TemplateNotFound(ValueError):
+    """
+    template_id sem arquivo correspondente no diretório de templates
+    """
+
+
+class TemplateRegistry:
+    """
+    Templates disponíveis por template_id, compilados sob demanda
+
+    O template padrão responde por 'default' (e quando template_id é
+    omitido); cada arquivo .docx em templates_dir responde pelo nome do
+    arquivo sem extensão. A forma compilada de cada template é carregada no
+    primeiro uso e mantida em um LRU limitado por quantidade e por memória
+    estimada; os templates menos usados são descartados (e recompilados se
+    voltarem a ser pedidos), então adicionar templates não aumenta o RSS
+    dos workers sem limite.
+    """
+
+    def __init__(self, default_path, templates_dir=None, max_entries=8, max_bytes=256 * 1024 * 1024,
+                 optimizer=None):
+        self.default_path = default_path
+        self.templates_dir = templates_dir
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        # OutputOptimizer aplicado a todos os templates (compressão, partes removidas)
+        self.optimizer = optimizer
+        self.default_cache = TemplateCache(default_path, optimizer)
+        self._paths = {}
+        self._caches = {DEFAULT_TEMPLATE_ID: self.default_cache}
+        # template_id -> bytes estimados, em ordem de uso (mais recente no fim)
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self._scan()
+
+    @classmethod
+    def from_env(cls, default_path, optimizer=None):
+        return cls(
+            default_path,
+            templates_dir=os.getenv('TEMPLATES_DIR', 'templates'),
+            max_entries=int(os.getenv('TEMPLATE_CACHE_MAX_ENTRIES', 8)),
+            max_bytes=int(float(os.getenv('TEMPLATE_CACHE_MAX_MB', 256)) * 1024 * 1024),
+            optimizer=optimizer
+        )
+
+    def _scan(self):
+        # Mapeia os .docx do diretório; chamado de novo quando um id é desconhecido
+        paths = {}
+        if self.templates_dir and os.path.isdir(self.templates_dir):
+            for filename in sorted(os.listdir(self.templates_dir)):
+                template_id, ext = os.path.splitext(filename)
+                if ext.lower() == '.docx' and not filename.startswith(('.', '~$')):
+                    paths[template_id] = os.path.join(self.templates_dir, filename)
+        self._paths = paths
+
+    def available(self):
+        """
+        Ids de todos os templates disponíveis
+        """
+        with self._lock:
+            self._scan()
+            return [DEFAULT_TEMPLATE_ID] + [template_id for template_id in self._paths
+                                            if template_id != DEFAULT_TEMPLATE_ID]
+
+    def cache_for(self, template_id=None):
+        """
+        TemplateCache do template; levanta TemplateNotFound se o id não existir
+        """
+        template_id = template_id or DEFAULT_TEMPLATE_ID
+        cache = self._caches.get(template_id)
+        if cache is not None:
+            return cache
+        with self._lock:
+            cache = self._caches.get(template_id)
+            if cache is not None:
+                return cache
+            if template_id not in self._paths:
+                self._scan()
+            path = self._paths.get(template_id)
+            if path is None:
+                raise TemplateNotFound(f"Template '{template_id}' não encontrado")
+            cache = self._caches[template_id] = TemplateCache(path, self.optimizer)
+            return cache
+
+    def get(self, template_id=None):
+        """
+        Template compilado pelo id, carregando sob demanda e aplicando o LRU
+        """
+        template_id = template_id or DEFAULT_TEMPLATE_ID
+        compiled = self.cache_for(template_id).get()
+        with self._lock:
+            if self._loaded.get(template_id) != compiled.memory_estimate:
+                self._loaded[template_id] = compiled.memory_estimate
+            self._loaded.move_to_end(template_id)
+            self._evict(keep=template_id)
+        return compiled
+
+    def _evict(self, keep):
+        # Descarta os menos usados acima dos limites, nunca o que acabou de ser pedido
+        while len(self._loaded) > 1 and (
+                len(self._loaded) > self.max_entries or sum(self._loaded.values()) > self.max_bytes):
+            template_id = next(iter(self._loaded))
+            if template_id == keep:
+                break
+            del self._loaded[template_id]
+            self._caches[template_id].invalidate()
+            self.evictions += 1
+            logger.info(f"Template '{template_id}' descartado do cache")
+
+    def warmup(self, template_ids=None):
+        """
+        Compila antecipadamente os templates indicados ('*' = todos, até o limite)
+
+        Retorna os ids carregados
+        """
+        if template_ids in (None, '', '*'):
+            template_ids = self.available() if template_ids == '*' else [DEFAULT_TEMPLATE_ID]
+        elif isinstance(template_ids, str):
+            template_ids = [template_id.strip() for template_id in template_ids.split(',') if template_id.strip()]
+
+        loaded = []
+        for template_id in template_ids[:self.max_entries]:
+            try:
+                self.get(template_id)
+                loaded.append(template_id)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Não foi possível pré-carregar o template '{template_id}': {e}")
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            loaded = list(self._loaded)
+            memory = sum(self._loaded.values())
+        return {
+            'available': self.available(),
+            'loaded': loaded,
+            'estimated_memory_mb': round(memory / (1024 * 1024), 2),
+            'max_entries': self.max_entries,
+            'max_memory_mb': round(self.max_bytes / (1024 * 1024), 2),
+            'evictions': self.evictions
+        }
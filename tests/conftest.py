@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import pathlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+@pytest.fixture
+def root_dir():
+    return pathlib.Path(ROOT_DIR)
+
+
+@pytest.fixture(autouse=True)
+def _root_dir(monkeypatch):
+    # O serviço procura o template padrão no diretório atual
+    monkeypatch.chdir(ROOT_DIR)
+
+
+@pytest.fixture
+def dados():
+    return {
+        'nome_do_locatario': 'João da Silva',
+        'estado_civil': 'Solteiro',
+        'nacionalidade': 'Brasileira',
+        'profissao': 'Engenheiro',
+        'numero_do_rg': '12.345.678-9',
+        'numero_do_cpf': '123.456.789-00',
+        'telefone_celular': '(61) 99999-9999',
+        'email': 'joao@email.com',
+        'endereco': 'Rua das Flores, 123, Brasília-DF',
+        'qtd_noites': 7,
+        'dia_inicio': '15/01/2024',
+        'dia_fim': '22/01/2024',
+        'valor_locacao': 'R$ 2.100,00'
+    }
+
+
+@pytest.fixture
+def service(monkeypatch):
+    for name in ('CONTRACT_ARCHIVE_DIR', 'RETRY_SPOOL_PATH', 'METRICS_DIR', 'DELIVERY_SINKS'):
+        monkeypatch.delenv(name, raising=False)
+    from contract_service import ContractService
+    service = ContractService(webhook_url='http://127.0.0.1:9/webhook')
+    yield service
+    service.render_executor.shutdown()
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    """
+    Cliente de teste do app Flask servido pelo serviço da fixture service
+    """
+    monkeypatch.setenv('LOG_LEVEL', os.getenv('LOG_LEVEL', 'WARNING'))
+    import app as app_module
+    monkeypatch.setattr(app_module, 'contract_service', service)
+    return app_module.app.test_client()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, como um webhook real
+    protocol_version = 'HTTP/1.1'
+    status = 500
+
+    def do_POST(self):
+        body = b''
+        if self.headers.get('Content-Length'):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+        elif self.headers.get('Transfer-Encoding') == 'chunked':
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                body += self.rfile.read(size + 2)[:size]
+                if not size:
+                    break
+        self.server.bodies.append(body)
+        self.server.chunked.append(self.headers.get('Transfer-Encoding') == 'chunked')
+        self.server.connections.add(self.client_address)
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.status = 500
+    server.bodies = []
+    server.chunked = []
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
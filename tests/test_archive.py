@@ -0,0 +1,49 @@
+import mmap
+from contract_archive import ContractArchive
+from contract_service import ContractService
+
+
+def test_contrato_real_e_lido_por_mmap(service, dados, tmp_path):
+    filename, contract = service.render_contract(dados)
+    archive = ContractArchive(str(tmp_path), compact_interval=0)
+    object_id, _ = archive.put(filename, contract)
+
+    conteudo = archive.read(object_id)
+    assert isinstance(conteudo, mmap.mmap)
+    assert conteudo[:] == contract
+    conteudo.close()
+
+
+def test_objeto_menor_que_uma_pagina_e_lido_direto(tmp_path):
+    archive = ContractArchive(str(tmp_path), compact_interval=0)
+    object_id, _ = archive.put('pequeno.docx', b'PK pequeno')
+    assert archive.read(object_id) == b'PK pequeno'
+
+
+def test_reenvio_e_spool_a_partir_do_mmap(monkeypatch, webhook, dados, tmp_path):
+    for name in ('METRICS_DIR', 'DELIVERY_SINKS'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('CONTRACT_ARCHIVE_DIR', str(tmp_path / 'archive'))
+    monkeypatch.setenv('ARCHIVE_COMPACT_INTERVAL', '0')
+    monkeypatch.setenv('RETRY_SPOOL_PATH', str(tmp_path / 'spool.db'))
+    monkeypatch.setenv('RETRY_BASE_DELAY', '3600')
+    service = ContractService(webhook_url=f"http://127.0.0.1:{webhook.server_port}/webhook")
+    try:
+        filename, contract = service.render_contract(dados)
+        object_id = service._archive_contract(filename, contract, dados)
+        assert isinstance(service.archive.read(object_id), mmap.mmap)
+
+        webhook.status = 200
+        resultado = service.resend_archived(object_id)
+        assert resultado['success'] and resultado['id'] == object_id
+        assert len(webhook.bodies) == 1 and len(webhook.bodies[0]) >= len(contract) // 2
+
+        # Falha: o spool guarda uma cópia dos bytes, não o mapeamento
+        webhook.status = 500
+        resultado = service.resend_archived(object_id)
+        assert resultado['spooled'] is True
+        webhook.status = 200
+        assert service.retry_spool.drain() == {'delivered': 1, 'failed': 0}
+        assert webhook.bodies[-1] == webhook.bodies[0]
+    finally:
+        service.render_executor.shutdown()
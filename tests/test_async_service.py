@@ -0,0 +1,30 @@
+import asyncio
+import threading
+from async_service import AsyncContractService
+
+
+def test_idempotency_key_is_computed_off_the_event_loop(service, dados, webhook, monkeypatch):
+    webhook.status = 200
+    service.webhook_url = f"http://127.0.0.1:{webhook.server_port}/webhook"
+    threads = []
+    idempotency_key = service._idempotency_key
+
+    def registrar(*args):
+        threads.append(threading.current_thread())
+        return idempotency_key(*args)
+
+    monkeypatch.setattr(service, '_idempotency_key', registrar)
+
+    async def main():
+        async_service = AsyncContractService(service)
+        try:
+            primeira = await async_service.process_contract(dados)
+            segunda = await async_service.process_contract(dict(dados, qtd_noites='7'))
+        finally:
+            await async_service.close()
+        return primeira, segunda, threading.current_thread()
+
+    primeira, segunda, loop_thread = asyncio.run(main())
+    assert primeira['success'] and segunda.get('replayed') is True
+    assert len(webhook.bodies) == 1
+    assert threads and loop_thread not in threads
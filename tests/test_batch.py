@@ -0,0 +1,35 @@
+from contract_service import ContractService
+
+
+def test_process_batch_more_records_than_delivery_workers(service, dados, monkeypatch):
+    entregues = []
+
+    def deliver(self, contract_filename, contract_bytes, nome_locatario):
+        entregues.append(nome_locatario)
+        return 'delivered', [{'sink': 'webhook', 'success': True}]
+
+    monkeypatch.setattr(ContractService, '_deliver_or_spool', deliver)
+    registros = [dict(dados, nome_do_locatario=f"Locatário {i}") for i in range(12)]
+
+    resultados = list(service.process_batch(registros, render_workers=2, delivery_workers=2))
+
+    assert sorted(r['index'] for r in resultados) == list(range(12))
+    assert all(r['status'] == 'delivered' for r in resultados)
+    assert all(r['deliveries'] == [{'sink': 'webhook', 'success': True}] for r in resultados)
+    assert len(entregues) == 12
+
+
+def test_process_batch_delivery_error_does_not_stop_batch(service, dados, monkeypatch):
+    def deliver(self, contract_filename, contract_bytes, nome_locatario):
+        if nome_locatario.endswith('3'):
+            raise RuntimeError('falha')
+        return 'delivered', []
+
+    monkeypatch.setattr(ContractService, '_deliver_or_spool', deliver)
+    registros = [dict(dados, nome_do_locatario=f"Locatário {i}") for i in range(8)]
+
+    resultados = {r['index']: r for r in service.process_batch(registros, render_workers=2, delivery_workers=1)}
+
+    assert len(resultados) == 8
+    assert resultados[3]['status'] == 'failed' and resultados[3]['deliveries'] is None
+    assert resultados[0]['status'] == 'delivered'
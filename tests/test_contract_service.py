@@ -0,0 +1,76 @@
+import os
+import json
+import base64
+import logging
+import pytest
+from contract_service import ContractService
+
+
+def test_equivalent_submissions_share_idempotency_key(service, dados):
+    equivalente = dict(dados, qtd_noites='7', valor_locacao='2100', dia_inicio='15/1/2024', email=' joao@email.com ')
+    assert service._idempotency_key('sync', dados) == service._idempotency_key('sync', equivalente)
+    assert service._idempotency_key('sync', dados) != service._idempotency_key('sync', dict(dados, qtd_noites=6,
+                                                                                        dia_fim='21/01/2024'))
+
+
+def test_equivalent_submission_is_replayed_not_delivered_twice(service, dados, monkeypatch):
+    entregas = []
+
+    def deliver(self, contract_filename, contract_bytes, nome_locatario):
+        entregas.append(contract_filename)
+        return 'delivered', []
+
+    monkeypatch.setattr(ContractService, '_deliver_or_spool', deliver)
+    primeira = service.process_contract(dados)
+    segunda = service.process_contract(dict(dados, qtd_noites='7', valor_locacao='R$ 2100,00'))
+
+    assert primeira['success'] and segunda['success']
+    assert segunda.get('replayed') is True
+    assert len(entregas) == 1
+
+
+def test_invalid_data_still_gets_a_key(service, dados):
+    invalido = dict(dados, dia_inicio='ontem')
+    chave, conteudo = service._idempotency_key('sync', invalido, 'cliente-1')
+    assert chave == 'sync:key:cliente-1' and conteudo
+
+
+def test_delivery_path_never_writes_a_temp_file(service, dados, webhook, monkeypatch, root_dir):
+    webhook.status = 200
+    service.webhook_url = f"http://127.0.0.1:{webhook.server_port}/webhook"
+    saidas = []
+    render = service._render
+
+    def registrar(dados_template, output_filename, output=None, template=None):
+        saidas.append(output)
+        return render(dados_template, output_filename, output, template)
+
+    monkeypatch.setattr(service, '_render', registrar)
+    monkeypatch.setattr(os, 'remove', lambda path: pytest.fail(f"arquivo removido: {path}"))
+    antes = set(os.listdir(root_dir))
+
+    resultado = service.process_contract(dados)
+    assert resultado['success']
+    assert saidas and all(output is not None for output in saidas)
+    assert set(os.listdir(root_dir)) == antes
+    corpo = json.loads(webhook.bodies[0])
+    assert base64.b64decode(corpo['base64']).startswith(b'PK')
+
+
+@pytest.mark.parametrize('backend', ['docx', 'stream'])
+def test_render_logs_one_summary_unless_sampled(service, dados, caplog, backend):
+    service.render_backend = backend
+    caplog.set_level(logging.INFO, logger='contract_service')
+
+    service.render_log_sample_rate = 0
+    service.render_contract(dados)
+    registros = [record for record in caplog.records if record.name == 'contract_service']
+    assert [record.getMessage().split(':')[0] for record in registros] == ['Contrato gerado']
+    assert registros[0].substitutions > 0 and set(registros[0].timings_ms)
+
+    caplog.clear()
+    service.render_log_sample_rate = 1
+    service.render_contract(dados)
+    detalhes = [record for record in caplog.records if record.getMessage().startswith('Substituído')]
+    assert detalhes and all(record.levelno == logging.INFO for record in detalhes)
+    assert "'João da Silva'" in ' '.join(record.getMessage() for record in detalhes)
@@ -0,0 +1,111 @@
+import time
+import asyncio
+import httpx
+import requests
+from async_http_pool import request_error_reason as async_request_error_reason
+from async_service import AsyncContractService
+from contract_service import ContractService
+from delivery_sinks import DeliveryFanout, DeliverySink, create_sink
+from http_pool import request_error_reason
+
+
+def _service(monkeypatch, url, **env):
+    for name in ('CONTRACT_ARCHIVE_DIR', 'METRICS_DIR', 'DELIVERY_SINKS', 'RETRY_SPOOL_PATH'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return ContractService(webhook_url=url)
+
+
+def test_sink_result_carries_http_status(monkeypatch, webhook, dados):
+    service = _service(monkeypatch, f"http://127.0.0.1:{webhook.server_port}/webhook")
+    status, deliveries = service._deliver_or_spool('c.docx', b'PK docx', 'Fulano')
+    assert status == 'failed'
+    assert deliveries[0]['error'] == 'HTTP 500'
+
+    webhook.status = 202
+    _, deliveries = service._deliver_or_spool('c.docx', b'PK docx', 'Fulano')
+    assert deliveries[0]['error'] == 'HTTP 202'
+
+    webhook.status = 200
+    status, deliveries = service._deliver_or_spool('c.docx', b'PK docx', 'Fulano')
+    assert status == 'delivered' and deliveries[0]['error'] is None
+    assert service.send_contract_via_webhook(b'PK docx', 'Fulano', 'c.docx') is True
+
+
+def test_sink_result_carries_connection_error(monkeypatch, tmp_path):
+    # O token do webhook (na URL) não pode chegar ao cliente nem ao spool
+    service = _service(monkeypatch, 'http://127.0.0.1:9/webhook/token-secreto',
+                       RETRY_SPOOL_PATH=str(tmp_path / 'spool.db'), RETRY_BASE_DELAY='3600')
+    _, deliveries = service._deliver_or_spool('c.docx', b'PK docx', 'Fulano')
+    assert deliveries[0]['error'] == 'connection refused'
+    assert service.retry_spool.list()[0]['last_error'] == 'connection refused'
+    assert service.send_contract_via_webhook(b'PK docx', 'Fulano', 'c.docx') is False
+
+
+def test_request_error_reason_hides_the_url():
+    url = 'http://exemplo.com/webhook/token-secreto'
+    response = requests.Response()
+    response.status_code = 502
+    assert request_error_reason(requests.exceptions.HTTPError(url, response=response)) == 'HTTP 502'
+    assert request_error_reason(requests.exceptions.ReadTimeout(url)) == 'timeout'
+    assert request_error_reason(requests.exceptions.ConnectionError(url)) == 'connection error'
+    assert request_error_reason(requests.exceptions.InvalidURL(url)) == 'InvalidURL'
+
+    request = httpx.Request('POST', url)
+    erro = httpx.HTTPStatusError(url, request=request, response=httpx.Response(503, request=request))
+    assert async_request_error_reason(erro) == 'HTTP 503'
+    assert async_request_error_reason(httpx.ReadTimeout(url)) == 'timeout'
+    assert async_request_error_reason(httpx.ConnectError('[Errno 111] Connection refused')) == 'connection refused'
+
+
+def test_spool_keeps_the_failure_reason(monkeypatch, webhook, tmp_path):
+    service = _service(monkeypatch, f"http://127.0.0.1:{webhook.server_port}/webhook",
+                       RETRY_SPOOL_PATH=str(tmp_path / 'spool.db'), RETRY_BASE_DELAY='3600')
+    status, _ = service._deliver_or_spool('c.docx', b'PK docx', 'Fulano')
+    assert status == 'spooled'
+    assert service.retry_spool.list()[0]['last_error'] == 'HTTP 500'
+
+    webhook.status = 503
+    service.retry_spool.drain()
+    assert service.retry_spool.list()[0]['last_error'] == 'HTTP 503'
+
+
+class _SlowSink(DeliverySink):
+    kind = 'lento'
+
+    def __init__(self, delay, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+
+    def deliver(self, payload):
+        time.sleep(self.delay)
+        return True
+
+
+def test_secondary_sink_is_bounded_by_its_deadline():
+    primary = _SlowSink(0, name='principal')
+    fanout = DeliveryFanout([primary, _SlowSink(1, name='lento', deadline=0.2), _SlowSink(0, name='rapido')])
+    payload = fanout.payload('c.docx', b'PK docx', 'Fulano')
+
+    inicio = time.monotonic()
+    results = fanout.collect(fanout.dispatch(payload))
+    assert time.monotonic() - inicio < 0.8
+    assert [(r.sink, r.success, r.error) for r in results] == [('lento', False, 'timeout'), ('rapido', True, None)]
+
+    async def main():
+        async_service = AsyncContractService.__new__(AsyncContractService)
+        return await asyncio.gather(*(async_service._collect_secondary(p) for p in fanout.dispatch(payload)))
+
+    results = asyncio.run(main())
+    assert [(r.sink, r.success, r.error) for r in results] == [('lento', False, 'timeout'), ('rapido', True, None)]
+
+
+def test_default_deadline_covers_every_attempt(service, monkeypatch):
+    monkeypatch.setenv('SINK_ARCHIVE_RETRIES', '2')
+    monkeypatch.setenv('SINK_ARCHIVE_BACKOFF', '1')
+    service.archive = object()
+    connect, read = service.http_pool.timeout
+    assert create_sink('archive', service).deadline == (connect + read) * 3 + 3
+    monkeypatch.setenv('SINK_ARCHIVE_DEADLINE', '7')
+    assert create_sink('archive', service).deadline == 7
@@ -0,0 +1,44 @@
+import time
+import pytest
+
+
+@pytest.fixture
+def async_client(client, service, webhook, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'ASYNC_DELIVERY', True)
+    service.webhook_url = f"http://127.0.0.1:{webhook.server_port}/webhook"
+    return client
+
+
+def _aguardar_job(client, status_url, timeout=5):
+    limite = time.monotonic() + timeout
+    while True:
+        job = client.get(status_url).get_json()
+        if job['status'] not in ('queued', 'sending') or time.monotonic() > limite:
+            return job
+        time.sleep(0.02)
+
+
+def test_generate_contract_returns_202_and_job_reports_delivery(async_client, webhook, dados):
+    webhook.status = 200
+    resposta = async_client.post('/generate-contract', json=dados)
+    assert resposta.status_code == 202
+    corpo = resposta.get_json()
+    assert corpo['success'] and corpo['status_url'] == f"/jobs/{corpo['job_id']}"
+
+    job = _aguardar_job(async_client, corpo['status_url'])
+    assert job['status'] == 'delivered'
+    assert job['deliveries'][0]['success'] is True
+    assert len(webhook.bodies) == 1
+
+
+def test_failed_delivery_is_reported_on_the_job(async_client, webhook, dados):
+    webhook.status = 500
+    corpo = async_client.post('/generate-contract', json=dados).get_json()
+    job = _aguardar_job(async_client, corpo['status_url'])
+    assert job['status'] == 'failed'
+    assert job['deliveries'][0]['error'] == 'HTTP 500'
+
+
+def test_unknown_job_is_404(async_client):
+    assert async_client.get('/jobs/naoexiste').status_code == 404
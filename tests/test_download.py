@@ -0,0 +1,44 @@
+from contract_archive import ContractArchive
+from rendered_store import RenderedContractStore
+
+
+def test_render_contract_is_downloaded_with_etag_and_range(client, dados):
+    resposta = client.post('/render-contract', json=dados)
+    assert resposta.status_code == 200
+    contrato = resposta.data
+    etag = resposta.headers['ETag']
+    contract_id = etag.strip('"')
+    assert contrato.startswith(b'PK') and resposta.headers['Content-Location'] == f"/contracts/{contract_id}"
+    assert 'private' in resposta.headers['Cache-Control']
+
+    download = client.get(f"/contracts/{contract_id}")
+    assert download.status_code == 200 and download.data == contrato and download.headers['ETag'] == etag
+
+    assert client.get(f"/contracts/{contract_id}", headers={'If-None-Match': etag}).status_code == 304
+
+    faixa = client.get(f"/contracts/{contract_id}", headers={'Range': 'bytes=10-99'})
+    assert faixa.status_code == 206
+    assert faixa.data == contrato[10:100]
+    assert faixa.headers['Content-Range'] == f"bytes 10-99/{len(contrato)}"
+
+    assert client.get(f"/contracts/{contract_id}", headers={'Range': f"bytes={len(contrato)}-"}).status_code == 416
+
+
+def test_unknown_or_expired_contract_is_404(client, service, dados):
+    assert client.get('/contracts/desconhecido').status_code == 404
+
+    service.rendered_store = RenderedContractStore(ttl=0)
+    contract_id = client.post('/render-contract', json=dados).headers['ETag'].strip('"')
+    resposta = client.get(f"/contracts/{contract_id}")
+    assert resposta.status_code == 404 and resposta.get_json()['success'] is False
+
+
+def test_expired_contract_is_served_from_the_archive(client, service, dados, tmp_path):
+    service.rendered_store = RenderedContractStore(max_entries=0)
+    service.archive = ContractArchive(str(tmp_path), compact_interval=0)
+    contrato = client.post('/render-contract', json=dados)
+    contract_id = contrato.headers['ETag'].strip('"')
+
+    resposta = client.get(f"/contracts/{contract_id}", headers={'Range': 'bytes=0-1'})
+    assert resposta.status_code == 206 and resposta.data == b'PK'
+    assert client.get(f"/contracts/{contract_id}").data == contrato.data
@@ -0,0 +1,34 @@
+import threading
+from http_pool import WebhookHttpPool
+
+
+def test_sequential_deliveries_reuse_one_connection(service, webhook):
+    webhook.status = 200
+    service.webhook_url = f"http://127.0.0.1:{webhook.server_port}/webhook"
+    for i in range(3):
+        assert service.send_contract_via_webhook(b'PK docx', f'Locatario {i}', 'c.docx')
+
+    stats = service.http_pool.stats()
+    assert stats['requests'] == 3 and stats['errors'] == 0
+    assert stats['connections_opened'] == 1 and stats['connections_reused'] == 2
+    assert len(webhook.connections) == 1
+
+
+def test_concurrent_threads_share_pooled_connections(webhook):
+    webhook.status = 200
+    pool = WebhookHttpPool(pool_size=2)
+    url = f"http://127.0.0.1:{webhook.server_port}/webhook"
+
+    def enviar():
+        for _ in range(5):
+            pool.post(url, data=b'{}').raise_for_status()
+
+    threads = [threading.Thread(target=enviar) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+    assert pool.stats()['requests'] == 20
+    # Conexões além do pool são descartadas; as mantidas são reaproveitadas
+    assert len(webhook.connections) < 20
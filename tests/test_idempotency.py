@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import pytest
+from idempotency import IdempotencyCache, IdempotencyConflict, IdempotencyInFlight
+
+
+def test_duplicate_waits_for_in_flight_run_and_replays():
+    cache = IdempotencyCache(wait_timeout=5)
+    liberar = threading.Event()
+    execucoes = []
+
+    def executar(anterior):
+        execucoes.append(anterior)
+        liberar.wait(5)
+        return 'resultado', True
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(cache.run('k', executar))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    liberar.set()
+    for thread in threads:
+        thread.join()
+
+    assert execucoes == [None]
+    assert sorted(resultados) == [('resultado', False), ('resultado', True), ('resultado', True)]
+
+
+def test_non_final_result_is_handed_to_next_run():
+    cache = IdempotencyCache()
+    assert cache.run('k', lambda anterior: ('falhou', False)) == ('falhou', False)
+    assert cache.run('k', lambda anterior: (f"de novo após {anterior}", True)) == ('de novo após falhou', False)
+    assert cache.run('k', lambda anterior: ('não executa', True)) == ('de novo após falhou', True)
+
+
+def test_same_key_with_different_data_conflicts():
+    cache = IdempotencyCache()
+    cache.run('k', lambda anterior: ('ok', True), 'fp1')
+    with pytest.raises(IdempotencyConflict):
+        cache.run('k', lambda anterior: ('ok', True), 'fp2')
+
+
+def test_wait_timeout_raises_in_flight():
+    cache = IdempotencyCache(wait_timeout=0.05)
+    liberar = threading.Event()
+    thread = threading.Thread(target=cache.run, args=('k', lambda anterior: (liberar.wait(5), True)))
+    thread.start()
+    try:
+        with pytest.raises(IdempotencyInFlight):
+            cache.run('k', lambda anterior: ('não executa', True))
+    finally:
+        liberar.set()
+        thread.join()
+
+
+def test_async_duplicates_wait_without_threads():
+    cache = IdempotencyCache(wait_timeout=5)
+    execucoes = []
+
+    async def executar(anterior):
+        execucoes.append(anterior)
+        await asyncio.sleep(0.05)
+        return 'resultado', True
+
+    async def main():
+        threads_antes = threading.active_count()
+        tarefas = [asyncio.create_task(cache.run_async('k', executar)) for _ in range(20)]
+        await asyncio.sleep(0.01)
+        # Quem espera a duplicata não ocupa thread do executor padrão
+        assert threading.active_count() == threads_antes
+        return await asyncio.gather(*tarefas)
+
+    resultados = asyncio.run(main())
+    assert execucoes == [None]
+    assert resultados.count(('resultado', False)) == 1
+    assert resultados.count(('resultado', True)) == 19
+
+
+def test_async_wait_timeout_raises_in_flight():
+    cache = IdempotencyCache(wait_timeout=0.05)
+
+    async def lento(anterior):
+        await asyncio.sleep(0.5)
+        return 'ok', True
+
+    async def main():
+        primeira = asyncio.create_task(cache.run_async('k', lento))
+        await asyncio.sleep(0)
+        with pytest.raises(IdempotencyInFlight):
+            await cache.run_async('k', lento)
+        return await primeira
+
+    assert asyncio.run(main()) == ('ok', False)
+
+
+def test_async_waiter_is_woken_by_sync_run_in_thread():
+    cache = IdempotencyCache(wait_timeout=5)
+    liberar = threading.Event()
+    thread = threading.Thread(target=cache.run, args=('k', lambda anterior: (liberar.wait(5) and 'ok', True)))
+    thread.start()
+    while cache.stats()['entries'] == 0:
+        threading.Event().wait(0.001)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, liberar.set)
+        return await cache.run_async('k', None)
+
+    try:
+        assert asyncio.run(main()) == ('ok', True)
+    finally:
+        liberar.set()
+        thread.join()
@@ -0,0 +1,41 @@
+from datetime import date, datetime
+from gerador_contrato import _valor_celula
+from normalization import normalize_record
+
+
+def test_valor_celula_keeps_types_normalization_accepts():
+    assert _valor_celula(None) == ''
+    assert _valor_celula(datetime(2024, 1, 15)) == datetime(2024, 1, 15)
+    assert _valor_celula(date(2024, 1, 15)) == date(2024, 1, 15)
+    assert _valor_celula(7) == 7
+    assert _valor_celula(7.0) == 7 and isinstance(_valor_celula(7.0), int)
+    assert _valor_celula(2100.5) == 2100.5
+    assert _valor_celula('Solteiro') == 'Solteiro'
+    assert _valor_celula(True) == 'True'
+
+
+def test_xlsx_cells_normalize(dados):
+    celulas = {
+        'qtd_noites': 7.0,
+        'dia_inicio': datetime(2024, 1, 15),
+        'dia_fim': datetime(2024, 1, 22),
+        'valor_locacao': 2100.0,
+        'numero_do_cpf': 12345678900.0
+    }
+    registro = normalize_record(dict(dados, **{campo: _valor_celula(valor) for campo, valor in celulas.items()}))
+    assert registro['qtd_noites'] == 7
+    assert registro['dia_inicio'] == '15/01/2024'
+    assert registro['valor_locacao'] == 'R$ 2.100,00'
+
+
+def test_xlsx_cells_render(service, dados):
+    registro = dict(dados, numero_do_cpf=_valor_celula(12345678900.0), qtd_noites=_valor_celula(7.0),
+                    dia_inicio=_valor_celula(datetime(2024, 1, 15)), dia_fim=_valor_celula(datetime(2024, 1, 22)))
+    filename, contract_bytes = service.render_contract(registro)
+    assert contract_bytes.startswith(b'PK')
+
+
+def test_xlsx_float_cells_are_not_read_as_brl_text(dados):
+    assert normalize_record(dict(dados, valor_locacao=_valor_celula(2100.5)))['valor_locacao'] == 'R$ 2.100,50'
+    # 2.125 é dois reais e pouco, não R$ 2.125,00
+    assert normalize_record(dict(dados, valor_locacao=_valor_celula(2.125)))['valor_locacao'] == 'R$ 2,13'
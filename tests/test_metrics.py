@@ -0,0 +1,44 @@
+import os
+import glob
+
+from metrics import MetricsRegistry, mark_process_dead, ARCHIVED_FILE
+
+
+def _total(registry, name):
+    for line in registry.render().splitlines():
+        if line.startswith(name):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+
+def test_pid_reciclado_nao_sobrescreve_arquivo_anterior(tmp_path):
+    # Mesmo pid, processos diferentes (max_requests): cada um tem seu arquivo
+    antigo = MetricsRegistry(directory=str(tmp_path))
+    antigo.inc('contract_renders_total', 3)
+    antigo.flush()
+    novo = MetricsRegistry(directory=str(tmp_path))
+    novo.inc('contract_renders_total', 2)
+    novo.flush()
+
+    assert len(glob.glob(os.path.join(tmp_path, 'metrics_*.json'))) == 2
+    assert _total(novo, 'contract_renders_total') == 5
+
+
+def test_mark_process_dead_arquiva_e_remove(tmp_path):
+    morto = MetricsRegistry(directory=str(tmp_path))
+    morto.inc('contract_renders_total', 3)
+    morto.observe_stage('validation', 0.002)
+    morto.flush()
+
+    mark_process_dead(os.getpid(), str(tmp_path))
+    assert os.listdir(tmp_path) == [ARCHIVED_FILE]
+
+    vivo = MetricsRegistry(directory=str(tmp_path))
+    vivo.inc('contract_renders_total', 1)
+    assert _total(vivo, 'contract_renders_total') == 4
+    assert _total(vivo, 'contract_stage_duration_seconds_count{stage="validation"}') == 1
+
+    # Segundo worker morto se soma ao arquivo existente
+    mark_process_dead(os.getpid(), str(tmp_path))
+    assert os.listdir(tmp_path) == [ARCHIVED_FILE]
+    assert _total(MetricsRegistry(directory=str(tmp_path)), 'contract_renders_total') == 4
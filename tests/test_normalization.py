@@ -0,0 +1,77 @@
+from datetime import date, datetime
+from decimal import Decimal
+import pytest
+from normalization import (
+    NormalizedRecord, format_brl, normalize_record, normalize_records, parse_brl, parse_date, parse_nights
+)
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('R$ 2.100,00', Decimal('2100.00')),
+    ('R$\xa01.000,5', Decimal('1000.5')),
+    ('1.000', Decimal('1000')),
+    ('1000,50', Decimal('1000.50')),
+    ('1000.50', Decimal('1000.50')),
+    (2100, Decimal('2100')),
+    (0.1, Decimal('0.1')),
+])
+def test_parse_brl(valor, esperado):
+    assert parse_brl(valor) == esperado
+
+
+@pytest.mark.parametrize('valor', ['1,000.50', '10.00.00', 'abc', '', True, None, [1]])
+def test_parse_brl_rejeita(valor):
+    with pytest.raises(ValueError):
+        parse_brl(valor)
+
+
+def test_format_brl_arredonda_meio_para_cima():
+    assert format_brl(Decimal('1050.005')) == 'R$ 1.050,01'
+    assert format_brl(parse_brl('R$ 2.100,00') / 2) == 'R$ 1.050,00'
+
+
+def test_parse_date():
+    assert parse_date(' 5/1/2024 ') == date(2024, 1, 5)
+    assert parse_date(datetime(2024, 1, 5, 14, 0)) == date(2024, 1, 5)
+    for valor in ('2024-01-05', '31/02/2024', 20240105):
+        with pytest.raises(ValueError):
+            parse_date(valor)
+
+
+def test_parse_nights():
+    assert parse_nights(' 7 ') == parse_nights(7) == parse_nights(7.0) == 7
+    for valor in (0, -1, '7.5', 7.5, True, '', None):
+        with pytest.raises(ValueError):
+            parse_nights(valor)
+
+
+def test_normalize_record_canonico_e_derivados(dados):
+    record = normalize_record(dict(dados, qtd_noites='7', valor_locacao='2100', dia_inicio='15/1/2024'))
+    assert isinstance(record, NormalizedRecord)
+    assert record['valor_locacao'] == 'R$ 2.100,00'
+    assert record['dia_inicio'] == '15/01/2024' and record['qtd_noites'] == 7
+    assert record.derived['half_value'] == 'R$ 1.050,00'
+    assert normalize_record(record) is record
+
+
+def test_normalize_record_calcula_noites(dados):
+    del dados['qtd_noites']
+    assert normalize_record(dados)['qtd_noites'] == 7
+
+
+@pytest.mark.parametrize('alteracao, mensagem', [
+    ({'qtd_noites': 6}, 'não confere'),
+    ({'dia_fim': '15/01/2024'}, 'posterior'),
+    ({'valor_locacao': 'R$ 0,00'}, 'maior que zero'),
+    ({'dia_inicio': 'ontem'}, 'dia_inicio'),
+])
+def test_normalize_record_rejeita_reserva_inconsistente(dados, alteracao, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        normalize_record(dict(dados, **alteracao))
+
+
+def test_normalize_records_indica_o_registro_invalido(dados):
+    registros, erros = normalize_records([dados, 'texto', dict(dados, qtd_noites='x')])
+    assert registros[0] is not None and registros[1] is None and registros[2] is None
+    assert [erro['index'] for erro in erros] == [1, 2]
+    assert erros[1]['error'].startswith('qtd_noites:')
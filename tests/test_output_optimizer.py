@@ -0,0 +1,62 @@
+import io
+import zipfile
+import pytest
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.opc.part import Part
+from output_optimizer import OutputOptimizer
+from template_registry import TemplateRegistry
+
+CUSTOM_XML = '<?xml version="1.0"?><metadados>' + 'x' * 20000 + '</metadados>'
+
+
+@pytest.fixture
+def template(tmp_path):
+    document = Document()
+    for i in range(200):
+        document.add_paragraph(f'Cláusula {i}: {{{{ nome do locatario }}}} ' + 'texto repetido ' * 10)
+    part = Part(PackURI('/customXml/item9.xml'), 'application/xml', CUSTOM_XML.encode(), document.part.package)
+    document.part.relate_to(part, RT.CUSTOM_XML)
+    path = tmp_path / 'contrato.docx'
+    document.save(path)
+    return str(path)
+
+
+def _render(service, template, optimizer, backend='docx'):
+    service.render_backend = backend
+    service.template_registry = TemplateRegistry(template, optimizer=optimizer)
+    _, contract_bytes = service.render_contract({'nome_do_locatario': 'Ana'})
+    return zipfile.ZipFile(io.BytesIO(contract_bytes))
+
+
+@pytest.mark.parametrize('backend', ['docx', 'stream'])
+def test_unused_parts_are_stripped(service, template, backend):
+    mantido = _render(service, template, OutputOptimizer(strip_unused=False), backend)
+    assert {'customXml/item9.xml', 'docProps/thumbnail.jpeg'} <= set(mantido.namelist())
+
+    saida = _render(service, template, OutputOptimizer(), backend)
+    removidas = {'docProps/thumbnail.jpeg', 'customXml/item1.xml', 'customXml/item9.xml'}
+    assert not [name for name in saida.namelist() if name.startswith('customXml/') or 'thumbnail' in name]
+    assert set(service.template_registry.get().removed_parts) == removidas
+    assert b'customXml' not in saida.read('word/_rels/document.xml.rels')
+    assert b'thumbnail' not in saida.read('_rels/.rels')
+    assert Document(io.BytesIO(saida.fp.getvalue())).paragraphs[0].text.startswith('Cláusula 0: Ana ')
+
+
+@pytest.mark.parametrize('backend', ['docx', 'stream'])
+def test_compression_level_applies_to_the_document(service, template, backend):
+    sem = _render(service, template, OutputOptimizer(compresslevel=0), backend).getinfo('word/document.xml')
+    maximo = _render(service, template, OutputOptimizer(compresslevel=9), backend).getinfo('word/document.xml')
+    assert sem.file_size == maximo.file_size
+    assert sem.compress_size >= sem.file_size
+    assert maximo.compress_size < sem.file_size / 5
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv('DOCX_COMPRESSION_LEVEL', '9')
+    monkeypatch.setenv('DOCX_STRIP_UNUSED_PARTS', 'false')
+    assert OutputOptimizer.from_env().stats() == {'compresslevel': 9, 'strip_unused_parts': False}
+    monkeypatch.setenv('DOCX_COMPRESSION_LEVEL', '12')
+    with pytest.raises(ValueError):
+        OutputOptimizer.from_env()
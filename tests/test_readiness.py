@@ -0,0 +1,45 @@
+import shutil
+import time
+from contract_service import ContractService
+
+
+def _aguardar(condicao, timeout=5):
+    limite = time.monotonic() + timeout
+    while not condicao() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicao()
+
+
+def test_ready_is_503_before_warmup_and_200_after(client, service):
+    service.warmup_result = None
+    resposta = client.get('/ready')
+    assert resposta.status_code == 503 and resposta.get_json()['status'] == 'starting'
+
+    service.warmup()
+    resposta = client.get('/ready')
+    assert resposta.status_code == 200
+    assert resposta.get_json()['templates'] == ['default']
+
+
+def test_failed_warmup_is_retried_in_background_at_most_once_per_interval(monkeypatch, tmp_path, root_dir):
+    for name in ('CONTRACT_ARCHIVE_DIR', 'RETRY_SPOOL_PATH', 'METRICS_DIR', 'DELIVERY_SINKS'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.chdir(tmp_path)
+    service = ContractService(webhook_url='http://127.0.0.1:9/webhook')
+    assert service.warmup() is None
+    assert service.readiness()[0] is False
+
+    chamadas = []
+    warmup = service.warmup
+    monkeypatch.setattr(service, 'warmup', lambda *args: chamadas.append(args) or warmup(*args))
+
+    # Dentro do intervalo: o probe não recompila
+    assert service.retry_warmup() is False
+    assert chamadas == []
+
+    shutil.copy(root_dir / service.template_path, tmp_path / service.template_path)
+    service.warmup_retry_interval = 0
+    assert service.retry_warmup() is True
+    assert _aguardar(lambda: service.readiness()[0])
+    assert len(chamadas) == 1
+    assert service.retry_warmup() is False
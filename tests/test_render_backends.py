@@ -0,0 +1,42 @@
+import io
+import zipfile
+import pytest
+from docx import Document
+from contract_service import ContractService
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    for name in ('CONTRACT_ARCHIVE_DIR', 'RETRY_SPOOL_PATH', 'METRICS_DIR', 'DELIVERY_SINKS'):
+        monkeypatch.delenv(name, raising=False)
+    return {backend: ContractService(webhook_url='http://127.0.0.1:9/webhook', render_backend=backend)
+            for backend in ContractService.RENDER_BACKENDS}
+
+
+def _render(service, dados_template):
+    buffer = io.BytesIO()
+    assert service._render(dados_template, 'c.docx', buffer, service.template_registry.get())
+    return buffer.getvalue()
+
+
+def test_stream_and_docx_backends_write_the_same_bytes(backends, dados):
+    # Caracteres que precisam de escape no XML
+    dados = dict(dados, nome_do_locatario='Ana & João <Silva> "Jr."', endereco="Rua D'Ajuda, 1")
+    saidas = {backend: service.render_contract(dados)[1] for backend, service in backends.items()}
+    assert saidas['stream'] == saidas['docx']
+    with zipfile.ZipFile(io.BytesIO(saidas['stream'])) as package:
+        assert 'Ana &amp; João &lt;Silva&gt;' in package.read('word/document.xml').decode()
+
+
+def test_missing_variable_keeps_its_spelling_in_both_backends(backends, dados, caplog):
+    dados_template = backends['docx']._prepare_contract(dados)[0]
+    del dados_template['numero_do_cpf']
+    textos = {}
+    for backend, service in backends.items():
+        caplog.clear()
+        documento = Document(io.BytesIO(_render(service, dict(dados_template))))
+        textos[backend] = [paragraph.text for paragraph in documento.paragraphs]
+        assert "sem valor: ['{{ numero do cpf }}']" in caplog.text
+    # Mesmo texto; as runs da variável não preenchida podem diferir
+    assert textos['stream'] == textos['docx']
+    assert any('{{ numero do cpf }}' in texto for texto in textos['docx'])
@@ -0,0 +1,39 @@
+import os
+import threading
+import pytest
+from contract_service import ContractService
+
+
+@pytest.fixture
+def process_service(monkeypatch, tmp_path):
+    for name in ('CONTRACT_ARCHIVE_DIR', 'RETRY_SPOOL_PATH', 'DELIVERY_SINKS'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('METRICS_DIR', str(tmp_path))
+    monkeypatch.setenv('RENDER_WORKERS', '2')
+    service = ContractService(webhook_url='http://127.0.0.1:9/webhook', render_executor='process')
+    yield service
+    service.render_executor.shutdown()
+
+
+def test_pool_unico_com_requisicoes_concorrentes(process_service):
+    pools = []
+    threads = [threading.Thread(target=lambda: pools.append(process_service.render_executor._get_pool()))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(pool) for pool in pools}) == 1
+
+
+def test_metricas_dos_filhos_ficam_no_worker(process_service, dados, tmp_path):
+    filename, contract = process_service.render_executor.render(dados)
+    assert contract.startswith(b'PK') and filename.endswith('.docx')
+    with pytest.raises(ValueError):
+        process_service.render_executor.render({})
+
+    metrics = process_service.metrics.render()
+    assert 'contract_renders_total{backend="docx",result="success"} 1' in metrics
+    assert 'contract_stage_duration_seconds_count{stage="substitution"} 1' in metrics
+    # Só o worker grava em METRICS_DIR; os filhos não deixam arquivos
+    assert {name.split('_')[1] for name in os.listdir(tmp_path)} == {str(os.getpid())}
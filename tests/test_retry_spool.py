@@ -0,0 +1,121 @@
+import sqlite3
+import threading
+import pytest
+from retry_spool import CircuitBreaker, RetrySpool
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr('retry_spool.time.monotonic', lambda: agora[0])
+    return agora
+
+
+def test_half_open_allows_a_single_probe(relogio):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    relogio[0] += 10
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not any(breaker.allow() for _ in range(10))
+
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    relogio[0] += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert all(breaker.allow() for _ in range(10))
+
+
+def test_unresolved_probe_expires(relogio):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    relogio[0] += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    relogio[0] += 10
+    assert breaker.allow()
+
+
+def test_released_probe_can_be_taken_again(relogio):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    relogio[0] += 10
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_concurrent_drains_send_each_row_once(tmp_path):
+    enviados = []
+    lock = threading.Lock()
+    barreira = threading.Barrier(2)
+
+    def deliver(filename, contract_bytes, locatario):
+        with lock:
+            enviados.append(filename)
+        return True
+
+    caminho = str(tmp_path / 'spool.db')
+    spools = [RetrySpool(caminho, deliver, base_delay=3600) for _ in range(2)]
+    for i in range(20):
+        spools[0].add(f"c{i}.docx", b'PK', 'Fulano')
+
+    resultados = []
+
+    def drenar(spool):
+        barreira.wait()
+        resultados.append(spool.drain())
+
+    threads = [threading.Thread(target=drenar, args=(spool,)) for spool in spools]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(enviados) == sorted(f"c{i}.docx" for i in range(20))
+    assert sum(r['delivered'] for r in resultados) == 20
+    assert spools[0].stats()['pending'] == 0
+
+
+def test_drain_skips_rows_leased_by_another_worker(tmp_path):
+    spool = RetrySpool(str(tmp_path / 'spool.db'), lambda *args: True, base_delay=3600)
+    spool_id = spool.add('c.docx', b'PK', 'Fulano')
+    assert spool._attempt(spool_id, force=True) is True
+
+    outro = spool.add('d.docx', b'PK', 'Fulano')
+    with sqlite3.connect(spool.path) as conn:
+        conn.execute('UPDATE deliveries SET leased_until = 9e18 WHERE id = ?', (outro,))
+    assert spool.drain() == {'delivered': 0, 'failed': 0}
+    assert spool.stats()['pending'] == 1
+
+
+def test_failed_attempt_clears_the_lease(tmp_path):
+    spool = RetrySpool(str(tmp_path / 'spool.db'), lambda *args: False, base_delay=3600)
+    spool_id = spool.add('c.docx', b'PK', 'Fulano')
+    assert spool._attempt(spool_id, force=True) is False
+    with sqlite3.connect(spool.path) as conn:
+        assert conn.execute('SELECT leased_until, attempts FROM deliveries').fetchone() == (None, 2)
+    assert spool._attempt(spool_id, force=True) is False
+
+
+def test_old_spool_files_get_the_lease_column(tmp_path):
+    caminho = str(tmp_path / 'spool.db')
+    with sqlite3.connect(caminho) as conn:
+        conn.execute('''
+            CREATE TABLE deliveries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT NOT NULL, locatario TEXT NOT NULL,
+                contract BLOB NOT NULL, status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, last_error TEXT,
+                created_at TEXT NOT NULL, updated_at TEXT NOT NULL
+            )
+        ''')
+    spool = RetrySpool(caminho, lambda *args: True)
+    spool_id = spool.add('c.docx', b'PK', 'Fulano')
+    assert spool._attempt(spool_id, force=True) is True
@@ -0,0 +1,59 @@
+import io
+import json
+import gzip
+import base64
+import pytest
+from streaming_payload import Base64Field, GzipBody, iter_json_body
+
+
+def _esperado(dados, extra):
+    return json.dumps(dict(extra, base64=base64.b64encode(dados).decode())).encode()
+
+
+@pytest.mark.parametrize('tamanho', [0, 1, 2, 3, 47, 48, 49, 1000])
+@pytest.mark.parametrize('origem', ['bytes', 'memoryview', 'arquivo', 'codificado'])
+def test_chunked_body_equals_json_dumps(tamanho, origem):
+    dados = bytes(range(256)) * 4
+    dados = dados[:tamanho]
+    fonte = {
+        'bytes': lambda: dados,
+        'memoryview': lambda: memoryview(dados),
+        'arquivo': lambda: io.BytesIO(dados),
+        'codificado': lambda: b''
+    }[origem]()
+    encoded = base64.b64encode(dados) if origem == 'codificado' else None
+    extra = {'filename': 'Contrato "João".docx', 'locatario': 'Zoë\n'}
+    campos = dict(extra, base64=Base64Field(fonte, chunk_size=48, encoded=encoded))
+
+    pedacos = list(iter_json_body(campos))
+    assert b''.join(pedacos) == _esperado(dados, extra)
+    assert len(pedacos) > 3 or tamanho <= 48
+
+
+def test_gzip_body_decompresses_to_the_json(service):
+    dados = b'PK' + bytes(5000)
+    body = GzipBody(iter_json_body({'base64': Base64Field(dados, chunk_size=300)}))
+    comprimido = b''.join(body)
+    assert gzip.decompress(comprimido) == _esperado(dados, {})
+    assert body.size == len(comprimido) and body.raw_size == len(_esperado(dados, {}))
+
+
+def test_webhook_receives_the_same_json_chunked(service, webhook):
+    webhook.status = 200
+    service.webhook_url = f"http://127.0.0.1:{webhook.server_port}/webhook"
+    service.webhook_chunk_size = 300
+    contrato = bytes(range(256)) * 20
+    assert service.webhook_streaming
+    assert service.send_contract_via_webhook(contrato, 'Fulano', 'c.docx')
+
+    service.webhook_streaming = False
+    assert service.send_contract_via_webhook(contrato, 'Fulano', 'c.docx')
+    assert webhook.chunked == [True, False]
+    assert webhook.bodies[0] == webhook.bodies[1]
+    assert json.loads(webhook.bodies[0]) == {
+        'filename': 'c.docx',
+        'base64': base64.b64encode(contrato).decode(),
+        'locatario': 'Fulano',
+        'caption': 'Contrato Casa da Ana x Fulano',
+        'mimetype': 'document/docx'
+    }
@@ -0,0 +1,43 @@
+from docx import Document
+from substitution import SubstitutionEngine, normalize_placeholder
+
+
+def _paragrafo(*textos):
+    paragraph = Document().add_paragraph()
+    for texto in textos:
+        paragraph.add_run(texto)
+    return paragraph
+
+
+def test_normalize_placeholder():
+    assert normalize_placeholder('{{ qtd noites }}') == 'qtd_noites'
+    assert normalize_placeholder('QTD__NOITES') == 'qtd_noites'
+
+
+def test_variavel_dividida_entre_runs():
+    paragraph = _paragrafo('Locatário: {{ nome', ' do_loca', 'tario }}, ', 'CPF {{cpf}}.')
+    paragraph.runs[0].bold = True
+    engine = SubstitutionEngine({'nome_do_locatario': 'João', 'CPF': '123'})
+
+    assert engine.substitute(paragraph) == [('nome_do_locatario', 'João'), ('cpf', '123')]
+    assert paragraph.text == 'Locatário: João, CPF 123.'
+    # O valor fica na primeira run da variável (e com a formatação dela)
+    assert [run.text for run in paragraph.runs] == ['Locatário: João', '', ', ', 'CPF 123.']
+    assert paragraph.runs[0].bold
+
+
+def test_variaveis_faltantes_e_nao_usadas():
+    paragraph = _paragrafo('{{ a }}{{', ' b }} e {{c}}')
+    engine = SubstitutionEngine({'a': 1, 'c': 3, 'd': 4})
+
+    engine.substitute(paragraph)
+    assert paragraph.text == '1{{ b }} e 3'
+    assert engine.missing == {'{{ b }}'}
+    assert engine.unused == ['d']
+    assert engine.substituted == {'a': 1, 'c': 1}
+
+
+def test_paragrafo_sem_variaveis_nao_e_alterado():
+    paragraph = _paragrafo('Sem ', 'variáveis')
+    assert SubstitutionEngine({'a': 1}).substitute(paragraph) == []
+    assert [run.text for run in paragraph.runs] == ['Sem ', 'variáveis']
@@ -0,0 +1,61 @@
+import os
+import docx.document
+import docx.table
+from docx import Document
+from template_cache import TemplateCache
+
+
+def _template(path, nome='{{ nome do locatario }}'):
+    document = Document()
+    document.add_paragraph('Sem variáveis')
+    document.add_paragraph(f'Locatário: {nome}')
+    document.add_paragraph('Período: {{dia_inicio}} a {{dia_fim}}')
+    table = document.add_table(rows=2, cols=2)
+    table.cell(1, 1).paragraphs[0].add_run('Valor: {{ valor_locacao }}')
+    document.save(path)
+
+
+def test_template_is_reloaded_only_when_content_changes(tmp_path):
+    path = tmp_path / 'contrato.docx'
+    _template(path)
+    cache = TemplateCache(str(path))
+    primeiro = cache.get()
+    assert cache.get() is primeiro
+    assert (tmp_path / 'contrato.manifest.json').exists()
+
+    # mtime novo, mesmo conteúdo: só atualiza o mtime
+    os.utime(path, ns=(primeiro.mtime + 10 ** 9, primeiro.mtime + 10 ** 9))
+    assert cache.get() is primeiro
+
+    _template(path, '{{ cpf }}')
+    os.utime(path, ns=(primeiro.mtime + 2 * 10 ** 9, primeiro.mtime + 2 * 10 ** 9))
+    segundo = cache.get()
+    assert segundo is not primeiro and segundo.digest != primeiro.digest
+    assert '{{ cpf }}' in segundo.placeholders and '{{ nome do locatario }}' not in segundo.placeholders
+
+
+def test_locations_are_resolved_in_a_single_pass(tmp_path, monkeypatch):
+    path = tmp_path / 'contrato.docx'
+    _template(path)
+    compiled = TemplateCache(str(path)).get()
+    assert [location.path for location in compiled.locations] == [
+        ('paragrafo', 1), ('paragrafo', 2), ('tabela', 0, 1, 1, 0)
+    ]
+
+    acessos = {'paragraphs': 0, 'cells': 0}
+
+    def contar(cls, name):
+        original = getattr(cls, name)
+
+        def wrapper(self):
+            acessos[name] += 1
+            return original.fget(self)
+        monkeypatch.setattr(cls, name, property(wrapper))
+
+    contar(docx.document.Document, 'paragraphs')
+    contar(docx.table._Row, 'cells')
+    resolved = list(compiled.resolve_locations(compiled.new_document()))
+    assert acessos == {'paragraphs': 1, 'cells': 1}
+    assert [paragraph.text for _, paragraph in resolved] == [
+        'Locatário: {{ nome do locatario }}', 'Período: {{dia_inicio}} a {{dia_fim}}', 'Valor: {{ valor_locacao }}'
+    ]
@@ -0,0 +1,51 @@
+import pytest
+from docx import Document
+from template_manifest import TemplateManifest, build_manifest, field_for
+from template_registry import TemplateRegistry
+
+
+def _template(path, *linhas):
+    document = Document()
+    for linha in linhas:
+        document.add_paragraph(linha)
+    document.save(path)
+
+
+@pytest.fixture
+def curto(service, tmp_path):
+    _template(tmp_path / 'curto.docx', 'Locatário: {{ nome do locatário }}', 'E-mail: {{ e-mail }}',
+              'Metade: {{ valor_locacao/2 }}')
+    service.template_registry = TemplateRegistry(service.template_registry.default_path, str(tmp_path))
+    return service
+
+
+def test_manifest_maps_spellings_to_fields(tmp_path):
+    _template(tmp_path / 'curto.docx', '{{ nome do locatário }} e {{nome do locatário}}', '{{ valor_locacao/2 }}')
+    manifest = build_manifest(str(tmp_path / 'curto.docx'))
+    assert manifest.fields == ['nome_do_locatario', 'valor_locacao']
+    assert manifest.placeholders[0]['spellings'] == ['{{ nome do locatário }}', '{{nome do locatário}}']
+    assert field_for('valor_locacao/2') == ('valor_locacao', 'half_value')
+
+    manifest.save(str(tmp_path / 'curto.manifest.json'))
+    carregado = TemplateManifest.load(str(tmp_path / 'curto.manifest.json'), manifest.sha256)
+    assert carregado.data == manifest.data
+    assert TemplateManifest.load(str(tmp_path / 'curto.manifest.json'), 'outro') is None
+
+
+def test_required_fields_come_from_the_template(curto):
+    assert curto.required_fields('curto') == ['nome_do_locatario', 'email', 'valor_locacao']
+    assert 'numero_do_cpf' in curto.required_fields()
+
+    dados = curto.normalize_contract_data({
+        'template_id': 'curto', 'nome_do_locatario': 'Ana', 'email': 'ana@email.com', 'valor_locacao': '300'
+    })
+    valores = curto.template_registry.get('curto').manifest.build_values(dados, {
+        'half_value': curto._calculate_half_value
+    })
+    assert valores == {'nome_do_locatário': 'Ana', 'e-mail': 'ana@email.com', 'valor_locacao/2': 'R$ 150,00'}
+
+
+def test_missing_template_fields_are_listed(curto):
+    with pytest.raises(ValueError) as erro:
+        curto.normalize_contract_data({'template_id': 'curto', 'nome_do_locatario': 'Ana'})
+    assert str(erro.value) == "Campos obrigatórios não fornecidos: email, valor_locacao"
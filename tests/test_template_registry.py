@@ -0,0 +1,47 @@
+import pytest
+from docx import Document
+from template_registry import TemplateNotFound, TemplateRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    for template_id in ('a', 'b', 'c'):
+        document = Document()
+        document.add_paragraph(f'Template {template_id}: {{{{ nome do locatario }}}}')
+        document.save(tmp_path / f'{template_id}.docx')
+    return TemplateRegistry('CONTRATO Casa da Ana.docx', str(tmp_path), max_entries=2)
+
+
+def test_least_recently_used_template_is_evicted(registry):
+    a = registry.get('a')
+    registry.get('b')
+    assert registry.get('a') is a
+    registry.get('c')
+
+    stats = registry.stats()
+    assert stats['loaded'] == ['a', 'c'] and stats['evictions'] == 1
+    assert registry.cache_for('b')._compiled is None
+    assert registry.get('a') is a
+
+    # Descartado é recompilado no próximo pedido
+    b = registry.get('b')
+    assert b.placeholders == {'{{ nome do locatario }}'}
+    assert registry.stats()['loaded'] == ['a', 'b'] and registry.evictions == 2
+
+
+def test_memory_limit_keeps_only_the_requested_template(registry):
+    registry.max_entries = 8
+    registry.max_bytes = registry.get('a').memory_estimate
+    registry.get('b')
+    assert registry.stats()['loaded'] == ['b']
+    registry.max_bytes = 1
+    registry.get('c')
+    assert registry.stats()['loaded'] == ['c']
+
+
+def test_warmup_respects_the_limit_and_unknown_ids(registry):
+    assert registry.available() == ['default', 'a', 'b', 'c']
+    assert registry.warmup('a, nenhum') == ['a']
+    assert registry.warmup('*') == ['default', 'a']
+    with pytest.raises(TemplateNotFound):
+        registry.get('nenhum')